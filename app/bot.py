@@ -0,0 +1,150 @@
+import os
+
+import httpx
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+
+from app.handlers import account_router, place_router, main_router
+from app.middlewares import (
+    DBMiddleware,
+    HandlerMetricsMiddleware,
+    SendQueueMiddleware,
+    StageMetricsMiddleware,
+    TelegramMetricsMiddleware,
+    UpdateMetricsMiddleware,
+)
+from app.services import (
+    DBService,
+    IconService,
+    KeyboardService,
+    SubscriptionScheduler,
+    WeatherService,
+    create_http_client,
+    start_metrics_server,
+)
+from app.states import SQLiteStorage
+
+# All routers of the bot, in the order they are checked
+ROUTERS = (account_router, place_router, main_router)
+
+# Measure handlers (registered once and last, so it wraps only the handler)
+for _router in ROUTERS:
+    _router.message.middleware(HandlerMetricsMiddleware())
+    _router.callback_query.middleware(HandlerMetricsMiddleware())
+
+
+def create_bot() -> Bot:
+    # Bot token can be obtained via https://t.me/BotFather
+    token = os.getenv("BOT_TOKEN")
+
+    # Initialize Bot instance with default bot properties which will be passed to all API calls
+    bot = Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+    # Messages wait for the Telegram rate limits
+    bot.session.middleware(SendQueueMiddleware())
+
+    # Measure Telegram API calls (without the time in the send queue)
+    bot.session.middleware(TelegramMetricsMiddleware())
+
+    return bot
+
+
+def get_allowed_updates() -> list[str]:
+    """
+    Update types handled by the bot routers
+    """
+    return sorted({update_type for router in ROUTERS for update_type in router.resolve_used_update_types()})
+
+
+def create_dispatcher(
+        worker_index: int = 0,
+        http_client: httpx.AsyncClient | None = None,
+        db_path: str | None = None,
+        weather_api_url: str | None = None,
+) -> Dispatcher:
+    """
+    This function creates the Dispatcher with routers and services.
+    Connections are opened on Dispatcher startup and closed on shutdown,
+    a passed http_client is owned (and closed) by the caller.
+    Every worker process serves metrics on METRICS_PORT + worker_index,
+    subscriptions are pushed only by the first worker
+    """
+    # Database connection shared by all updates
+    db = DBService()
+
+    # All handlers should be attached to the Router (or Dispatcher).
+    # FSM states are kept in the database and survive restarts
+    dp = Dispatcher(storage=SQLiteStorage(db))
+
+    # Shared HTTP client with keep-alive connection pool
+    owns_http_client = http_client is None
+    http_client = http_client or create_http_client()
+
+    # Metrics server (started if METRICS_PORT is set)
+    metrics_port = os.getenv("METRICS_PORT")
+    metrics_runners = []
+
+    # Measure the whole update
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+
+    # Add db to the data of every update
+    dp.update.outer_middleware(StageMetricsMiddleware(DBMiddleware(db)))
+
+    # Router, moved from a Dispatcher built before in this process (e.g. a benchmark or test run)
+    for router in ROUTERS:
+        if router.parent_router is not None:
+            router.parent_router.sub_routers.remove(router)
+            router._parent_router = None
+
+    dp.include_routers(*ROUTERS)
+
+    # Services available in all handlers
+    weather_service = WeatherService(client=http_client, api_url=weather_api_url)
+    dp["weather_service"] = weather_service
+
+    # Telegram file_id of weather icons
+    icon_service = IconService(db)
+    dp["icon_service"] = icon_service
+
+    # Places keyboards by user
+    dp["keyboard_service"] = KeyboardService(db)
+
+    # Scheduled weather pushes (disabled with SCHEDULER_ENABLED=0)
+    scheduler = SubscriptionScheduler(db=db, weather_service=weather_service, icon_service=icon_service)
+    scheduler_enabled = worker_index == 0 and os.getenv("SCHEDULER_ENABLED", "1") != "0"
+
+    @dp.startup()
+    async def on_startup(bot: Bot) -> None:
+        await db.connect(db_path)
+
+        # Apply pending schema migrations
+        await db.setup()
+
+        if metrics_port:
+            metrics_runners.append(
+                await start_metrics_server(
+                    host=os.getenv("METRICS_HOST", "127.0.0.1"),
+                    port=int(metrics_port) + worker_index,
+                )
+            )
+
+        if scheduler_enabled:
+            scheduler.start(bot)
+
+    @dp.shutdown()
+    async def on_shutdown() -> None:
+        await scheduler.stop()
+
+        for runner in metrics_runners:
+            await runner.cleanup()
+
+        # Write pending FSM changes while the database is open
+        await dp.storage.close()
+
+        if owns_http_client:
+            await http_client.aclose()
+
+        await db.close()
+
+    return dp
@@ -0,0 +1,41 @@
+import pytest
+import pytest_asyncio
+
+from app.services import DBService
+
+
+# --- Fake clock for controlling time in tests ---
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fake_clock() -> FakeClock:
+    """
+    Fixture to yield a clock that stands still until the test moves its now.
+    """
+    return FakeClock()
+
+
+# --- Fixture for In-Memory Database Service ---
+
+@pytest_asyncio.fixture
+async def db_service() -> DBService:
+    """
+    Fixture to yield a migrated in-memory DBService.
+    Test modules that need data override it with a fixture of the same name that seeds this one.
+    """
+    db = DBService()
+
+    try:
+        await db.connect(":memory:")
+        await db.setup()
+
+        yield db
+    finally:
+        await db.close()
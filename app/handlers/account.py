@@ -3,18 +3,16 @@ from aiogram import Router
 from aiogram.types import Message
 
 import app.keyboards as kb
-from app.middlewares import DBMiddleware, AuthMiddleware
-from app.services import DBService, DBError
+from app.middlewares import AuthMiddleware, StageMetricsMiddleware
+from app.services import DBService, DBError, KeyboardService
 from app.texts import Messages, Buttons, Errors
 
 # Router
 account_router = Router()
 
 # Known Handlers
-account_router.message.middleware(DBMiddleware())
-account_router.callback_query.middleware(DBMiddleware())
-account_router.message.middleware(AuthMiddleware())
-account_router.callback_query.middleware(AuthMiddleware())
+account_router.message.middleware(StageMetricsMiddleware(AuthMiddleware()))
+account_router.callback_query.middleware(StageMetricsMiddleware(AuthMiddleware()))
 
 
 @account_router.message(F.contact)
@@ -40,12 +38,15 @@ async def account_create_handler(message: Message, db: DBService) -> None:
 
 
 @account_router.message(F.text == Buttons.ACCOUNT_DELETE)
-async def account_delete_handler(message: Message, db: DBService) -> None:
+async def account_delete_handler(
+        message: Message, db: DBService, keyboard_service: KeyboardService
+) -> None:
     tg_id = message.from_user.id
 
     try:
         # Delete User
         await db.delete_user(tg_id)
+        keyboard_service.invalidate_places(tg_id)
 
         # Reply
         await message.answer(
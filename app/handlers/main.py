@@ -5,15 +5,14 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 
 import app.keyboards as kb
-from app.middlewares import DBMiddleware, AuthMiddleware
+from app.middlewares import AuthMiddleware, StageMetricsMiddleware
 from app.texts import Messages, Buttons, Callbacks
 
 # Router
 main_router = Router()
 
 # Known Handlers
-main_router.message.middleware(DBMiddleware())
-main_router.message.middleware(AuthMiddleware())
+main_router.message.middleware(StageMetricsMiddleware(AuthMiddleware()))
 
 
 @main_router.message(CommandStart())
@@ -1,10 +1,15 @@
+import time
+
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 
 import app.keyboards as kb
-from app.middlewares import DBMiddleware, AuthMiddleware
-from app.services import WeatherService, DBService, DBError
+from app.keyboards import PlaceAction, PlaceCallback, PlacesPageCallback
+from app.middlewares import AuthMiddleware, StageMetricsMiddleware
+from app.services import (
+    WeatherService, DBService, DBError, IconService, KeyboardService, SUBSCRIPTION_PERIODS
+)
 from app.states import PlaceEdit, PlaceCreate, PlacesList, save_callback_and_message
 from app.texts import Callbacks, Buttons
 from app.texts import Errors
@@ -14,15 +19,15 @@ from app.texts import Messages
 place_router = Router()
 
 # Known Handlers
-place_router.message.middleware(DBMiddleware())
-place_router.callback_query.middleware(DBMiddleware())
-place_router.message.middleware(AuthMiddleware())
-place_router.callback_query.middleware(AuthMiddleware())
+place_router.message.middleware(StageMetricsMiddleware(AuthMiddleware()))
+place_router.callback_query.middleware(StageMetricsMiddleware(AuthMiddleware()))
 
 
-@place_router.callback_query(F.data.startswith(Callbacks.PLACE_ADD))
-async def place_add_first_handler(callback: CallbackQuery, state: FSMContext) -> None:
-    lat, lon = list(map(float, callback.data.split("?")[1].split("|")))
+@place_router.callback_query(PlaceCallback.filter(F.action == PlaceAction.ADD))
+async def place_add_first_handler(
+        callback: CallbackQuery, callback_data: PlaceCallback, state: FSMContext
+) -> None:
+    lat, lon = callback_data.latitude, callback_data.longitude
 
     # Toggle State to name
     await state.set_state(PlaceCreate.name)
@@ -43,7 +48,9 @@ async def place_add_first_handler(callback: CallbackQuery, state: FSMContext) ->
 
 
 @place_router.message(PlaceCreate.name)
-async def place_add_second_handler(message: Message, state: FSMContext, db: DBService) -> None:
+async def place_add_second_handler(
+        message: Message, state: FSMContext, db: DBService, keyboard_service: KeyboardService
+) -> None:
     name = message.text
 
     if name:
@@ -69,6 +76,7 @@ async def place_add_second_handler(message: Message, state: FSMContext, db: DBSe
                     lat=data["lat"],
                     user_id=tg_id,
                 )
+                keyboard_service.invalidate_places(tg_id)
 
                 # Get new caption
                 caption = data["message_caption"] + "\n\n" + f"*{name}*"
@@ -94,13 +102,16 @@ async def place_add_second_handler(message: Message, state: FSMContext, db: DBSe
         )
 
 
-@place_router.callback_query(F.data.startswith(Callbacks.PLACE_DELETE))
-async def place_delete_handler(callback: CallbackQuery, db: DBService) -> None:
-    lat, lon, place_id = callback.data.split("?")[1].split("|")
+@place_router.callback_query(PlaceCallback.filter(F.action == PlaceAction.DELETE))
+async def place_delete_handler(
+        callback: CallbackQuery, callback_data: PlaceCallback, db: DBService, keyboard_service: KeyboardService
+) -> None:
+    lat, lon = callback_data.latitude, callback_data.longitude
 
     try:
         # Delete Place
-        await db.delete_place(place_id=int(place_id))
+        await db.delete_place(place_id=callback_data.place_id)
+        keyboard_service.invalidate_places(callback.from_user.id)
 
         # Get new caption
         caption = "\n\n".join(callback.message.caption.split("\n\n")[:-1])
@@ -108,25 +119,64 @@ async def place_delete_handler(callback: CallbackQuery, db: DBService) -> None:
         await callback.answer(Messages.PLACES_DELETE_SUCCESS)
         await callback.message.edit_caption(
             caption=caption,
-            reply_markup=kb.location(lat=float(lat), lon=float(lon), place_id=None),
+            reply_markup=kb.location(lat=lat, lon=lon, place_id=None),
         )
         await callback.message.answer(text=Messages.LOCATION_SEND, reply_markup=kb.main)
     except DBError:
         await callback.message.answer(Errors.PLACE_DELETE)
 
 
-@place_router.callback_query(F.data.startswith(Callbacks.PLACE_RENAME))
+@place_router.callback_query(PlaceCallback.filter(F.action == PlaceAction.SUBSCRIBE))
+async def place_subscribe_handler(callback: CallbackQuery, callback_data: PlaceCallback, db: DBService) -> None:
+    place_id, period_name = callback_data.place_id, callback_data.period or "daily"
+    period = SUBSCRIPTION_PERIODS[period_name]
+
+    try:
+        place = await db.get_place(place_id=place_id)
+
+        # Only the owner can subscribe to the place
+        if not place or place[6] != callback.from_user.id:
+            await callback.answer(Errors.PLACE_NAME_NO_EXIST)
+
+            return
+
+        # First push after one period
+        await db.create_subscription(
+            place_id=place_id, period=period, next_run_at=int(time.time()) + period
+        )
+
+        await callback.answer(Messages.PLACES_SUBSCRIBE_SUCCESS.format(period=period_name))
+    except DBError:
+        await callback.answer(Errors.PLACE_SUBSCRIBE)
+
+
+@place_router.callback_query(PlaceCallback.filter(F.action == PlaceAction.UNSUBSCRIBE))
+async def place_unsubscribe_handler(callback: CallbackQuery, callback_data: PlaceCallback, db: DBService) -> None:
+    place_id = callback_data.place_id
+
+    try:
+        place = await db.get_place(place_id=place_id)
+
+        if place and place[6] == callback.from_user.id:
+            await db.delete_subscription(place_id=place_id)
+
+        await callback.answer(Messages.PLACES_UNSUBSCRIBE_SUCCESS)
+    except DBError:
+        await callback.answer(Errors.PLACE_SUBSCRIBE)
+
+
+@place_router.callback_query(PlaceCallback.filter(F.action == PlaceAction.RENAME))
 async def place_rename_first_handler(
-        callback: CallbackQuery, state: FSMContext
+        callback: CallbackQuery, callback_data: PlaceCallback, state: FSMContext
 ) -> None:
-    lat, lon, place_id = callback.data.split("?")[1].split("|")
+    lat, lon, place_id = callback_data.latitude, callback_data.longitude, callback_data.place_id
 
     # Toggle State to name
     await state.set_state(PlaceEdit.name)
 
     # Set id, lat, lon to State
     await state.update_data({
-        "id": int(place_id),
+        "id": place_id,
         "lat": lat,
         "lon": lon,
     })
@@ -142,7 +192,7 @@ async def place_rename_first_handler(
 
 @place_router.message(PlaceEdit.name)
 async def place_rename_second_handler(
-        message: Message, state: FSMContext, db: DBService
+        message: Message, state: FSMContext, db: DBService, keyboard_service: KeyboardService
 ) -> None:
     name = message.text
 
@@ -165,6 +215,7 @@ async def place_rename_second_handler(
             try:
                 # Rename Place
                 await db.update_place(place_id=data["id"], name=name)
+                keyboard_service.invalidate_places(tg_id)
 
                 # Get new caption
                 caption = data["message_caption"].split("\n\n")[:-1]
@@ -190,18 +241,28 @@ async def place_rename_second_handler(
 
 
 @place_router.message(F.text == Buttons.PLACES_SEE)
-async def place_see_handler(message: Message, state: FSMContext, db: DBService) -> None:
+async def place_see_handler(
+        message: Message, state: FSMContext, keyboard_service: KeyboardService
+) -> None:
     tg_id = message.from_user.id
 
     try:
-        places = await db.get_user_places(user_id=tg_id)
+        # Cached until the user's places change
+        markups = await keyboard_service.get_places(user_id=tg_id)
+
+        if markups:
+            markup, browser = markups
 
-        if places and len(places):
             await state.set_state(PlacesList.name)
+            await state.update_data({"prefix": None})
 
             await message.answer(
-                Messages.PLACES_SELECT, reply_markup=kb.places(places=places)
+                Messages.PLACES_SELECT, reply_markup=markup
             )
+
+            # Places beyond the first page are browsed page by page
+            if browser:
+                await message.answer(Messages.PLACES_BROWSE, reply_markup=browser)
         else:
             await message.answer(
                 Messages.PLACES_EMPTY, reply_markup=kb.main
@@ -210,8 +271,87 @@ async def place_see_handler(message: Message, state: FSMContext, db: DBService)
         await message.answer(Errors.PLACE_LIST)
 
 
+@place_router.message(F.text == Buttons.PLACES_WEATHER_ALL)
+async def places_weather_handler(
+        message: Message, db: DBService, weather_service: WeatherService
+) -> None:
+    """
+    This handler sends the weather of all favorite places in one message
+    """
+    try:
+        places = await db.get_user_places(user_id=message.from_user.id)
+    except DBError:
+        await message.answer(Errors.PLACE_LIST)
+
+        return
+
+    if not places:
+        await message.answer(Messages.PLACES_EMPTY, reply_markup=kb.main)
+
+        return
+
+    # Fetch all places concurrently, places in one cell share one request
+    weathers = await weather_service.get_many_weather_data(
+        [(place[2], place[3]) for place in places]
+    )
+
+    if not any(weathers):
+        await message.answer(Errors.PLACES_WEATHER_ALL)
+
+        return
+
+    lines = Messages.get_places_weather_text(
+        [(place[1], *(weather or (None, False))) for place, weather in zip(places, weathers)]
+    )
+
+    # Reply, a very long list is split by the Telegram message limit
+    for text in Messages.join_lines(lines):
+        await message.answer(text, parse_mode="HTML")
+
+
+async def _answer_place_weather(
+        message: Message,
+        place: tuple,
+        weather_service: WeatherService,
+        icon_service: IconService,
+        reply: bool = True,
+) -> None:
+    place_id, name, lat, lon, *rest = place
+
+    # Get weather description
+    weather = await weather_service.get_weather(lon=lon, lat=lat)
+
+    if weather["error"]:
+        await message.answer(Errors.PLACE_SELECT)
+
+        return
+
+    # Get caption
+    caption = weather["text"] + "\n\n" + f"*{name}*"
+
+    send_photo = message.reply_photo if reply else message.answer_photo
+
+    # Reply, the icon is sent by its Telegram file_id when known
+    await icon_service.send(
+        lambda photo: send_photo(
+            photo=photo,
+            caption=caption,
+            parse_mode="Markdown",
+            reply_markup=kb.location(lat=lat, lon=lon, place_id=place_id),
+        ),
+        weather["photo"],
+    )
+
+
 @place_router.message(PlacesList.name, F.text != Buttons.BACK_TO_MAIN_MENU)
-async def place_select_handler(message: Message, db: DBService) -> None:
+async def place_select_handler(
+        message: Message,
+        state: FSMContext,
+        db: DBService,
+        weather_service: WeatherService,
+        icon_service: IconService,
+        keyboard_service: KeyboardService,
+) -> None:
     if message.text:
         # Get Place
         place = await db.get_place_by_name(
@@ -219,39 +359,89 @@ async def place_select_handler(message: Message, db: DBService) -> None:
         )
 
         if place:
-            place_id, name, lat, lon, *rest = place or [None, None, None, None, None]
-
-            # Create instance
-            w_s = WeatherService()
+            await _answer_place_weather(message, place, weather_service, icon_service)
+        else:
+            # Not a full name, find the places that start with it
+            try:
+                browser = await keyboard_service.get_places_page(
+                    user_id=message.from_user.id, prefix=message.text
+                )
+            except DBError:
+                browser = None
 
-            # Get weather description
-            weather = await w_s.get_weather(lon=lon, lat=lat)
+            if browser:
+                await state.update_data({"prefix": message.text})
 
-            if weather["error"]:
-                await message.answer(Errors.PLACE_SELECT)
+                await message.answer(Messages.PLACES_BROWSE, reply_markup=browser)
             else:
-                # Get caption
-                caption = weather["text"] + "\n\n" + f"*{name}*"
-
-                # Reply
-                await message.reply_photo(
-                    photo=weather["photo"],
-                    caption=caption,
-                    parse_mode="Markdown",
-                    reply_markup=kb.location(lat=lat, lon=lon, place_id=place_id),
+                await message.answer(
+                    Errors.PLACE_NAME_NO_EXIST
                 )
-        else:
-            await message.answer(
-                Errors.PLACE_NAME_NO_EXIST
-            )
     else:
         await message.answer(
             Errors.PLACE_NAME_INVALID
         )
 
 
+@place_router.callback_query(PlacesPageCallback.filter())
+async def places_page_handler(
+        callback: CallbackQuery,
+        callback_data: PlacesPageCallback,
+        state: FSMContext,
+        keyboard_service: KeyboardService,
+) -> None:
+    direction, place_id = callback_data.direction, callback_data.place_id
+
+    # Name filter typed by the user, if any
+    data = await state.get_data()
+
+    try:
+        browser = await keyboard_service.get_places_page(
+            user_id=callback.from_user.id,
+            after=place_id if direction == "next" else None,
+            before=place_id if direction == "previous" else None,
+            prefix=data.get("prefix"),
+        )
+    except DBError:
+        await callback.answer(Errors.PLACE_LIST)
+
+        return
+
+    if browser:
+        await callback.answer()
+        await callback.message.edit_reply_markup(reply_markup=browser)
+    else:
+        # All places were deleted meanwhile
+        await callback.answer(Messages.PLACES_EMPTY)
+
+
+@place_router.callback_query(PlaceCallback.filter(F.action == PlaceAction.SELECT))
+async def place_browse_select_handler(
+        callback: CallbackQuery,
+        callback_data: PlaceCallback,
+        db: DBService,
+        weather_service: WeatherService,
+        icon_service: IconService,
+) -> None:
+    try:
+        place = await db.get_place(place_id=callback_data.place_id)
+    except DBError:
+        place = None
+
+    # Only the owner can see the place
+    if not place or place[6] != callback.from_user.id:
+        await callback.answer(Errors.PLACE_NAME_NO_EXIST)
+
+        return
+
+    await callback.answer()
+    await _answer_place_weather(callback.message, place, weather_service, icon_service, reply=False)
+
+
 @place_router.message(F.location)
-async def place_location_handler(message: Message, db: DBService) -> None:
+async def place_location_handler(
+        message: Message, db: DBService, weather_service: WeatherService, icon_service: IconService
+) -> None:
     """
     This handler receives messages with location data
     """
@@ -259,11 +449,8 @@ async def place_location_handler(message: Message, db: DBService) -> None:
     lat = message.location.latitude
     lon = message.location.longitude
 
-    # Create instance
-    w_s = WeatherService()
-
     # Get weather description
-    weather = await w_s.get_weather(lon=lon, lat=lat)
+    weather = await weather_service.get_weather(lon=lon, lat=lat)
 
     if weather["error"]:
         await message.answer(Errors.PLACE_SELECT)
@@ -276,13 +463,26 @@ async def place_location_handler(message: Message, db: DBService) -> None:
         # Get caption
         caption = weather["text"] + "\n\n" + f"*{name}*" if name else weather["text"]
 
-        # Reply
-        await message.reply_photo(
-            photo=weather["photo"],
-            caption=caption,
-            parse_mode="Markdown",
-            reply_markup=kb.location(
-                lat=lat, lon=lon, place_id=place_id
+        # Reply, the icon is sent by its Telegram file_id when known
+        await icon_service.send(
+            lambda photo: message.reply_photo(
+                photo=photo,
+                caption=caption,
+                parse_mode="Markdown",
+                reply_markup=kb.location(
+                    lat=lat, lon=lon, place_id=place_id
+                ),
             ),
+            weather["photo"],
         )
         await message.answer(text=Messages.LOCATION_SEND, reply_markup=kb.main)
+
+
+@place_router.callback_query(
+    F.data.startswith((Callbacks.PLACE_LEGACY, f"{PlaceCallback.__prefix__}:", f"{PlacesPageCallback.__prefix__}:"))
+)
+async def place_outdated_handler(callback: CallbackQuery) -> None:
+    """
+    This handler answers the place buttons of an older format or with invalid data
+    """
+    await callback.answer(Errors.CALLBACK_OUTDATED)
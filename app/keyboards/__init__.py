@@ -1,3 +1,4 @@
+from .callbacks import *
 from .cancel import *
 from .location import *
 from .main import *
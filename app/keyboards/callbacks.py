@@ -0,0 +1,89 @@
+from enum import Enum
+from typing import Literal
+
+from aiogram.filters.callback_data import CallbackData
+from pydantic import Field, field_validator
+
+# Format version of the callback data, buttons of an older format are rejected
+CALLBACK_VERSION = 1
+
+# Coordinates are packed as integer micro degrees, Telegram locations have 6 decimal places
+COORDINATE_SCALE = 10 ** 6
+
+Latitude = Field(default=None, ge=-90 * COORDINATE_SCALE, le=90 * COORDINATE_SCALE)
+Longitude = Field(default=None, ge=-180 * COORDINATE_SCALE, le=180 * COORDINATE_SCALE)
+
+
+def to_fixed(value: int | float | str) -> int:
+    return round(float(value) * COORDINATE_SCALE)
+
+
+def from_fixed(value: int) -> float:
+    return value / COORDINATE_SCALE
+
+
+class PlaceAction(str, Enum):
+    ADD = "add"
+    RENAME = "ren"
+    DELETE = "del"
+    SUBSCRIBE = "sub"
+    UNSUBSCRIBE = "unsub"
+    SELECT = "sel"
+
+
+class VersionedCallbackData(CallbackData, prefix="v"):
+    version: int = CALLBACK_VERSION
+
+    @field_validator("version")
+    @classmethod
+    def check_version(cls, version: int) -> int:
+        if version != CALLBACK_VERSION:
+            raise ValueError(f"Unsupported callback data version: {version}")
+
+        return version
+
+
+class PlaceCallback(VersionedCallbackData, prefix="pl"):
+    """
+    Callback data of the place buttons, e.g. "pl:1:ren:42:50450123:30523456:"
+    """
+
+    action: PlaceAction
+    place_id: int | None = Field(default=None, gt=0)
+    lat: int | None = Latitude
+    lon: int | None = Longitude
+    period: Literal["daily", "hourly"] | None = None
+
+    @classmethod
+    def create(
+            cls,
+            action: PlaceAction,
+            place_id: int | None = None,
+            lat: int | float | str | None = None,
+            lon: int | float | str | None = None,
+            period: str | None = None,
+    ) -> "PlaceCallback":
+        return cls(
+            action=action,
+            place_id=place_id,
+            lat=to_fixed(lat) if lat is not None else None,
+            lon=to_fixed(lon) if lon is not None else None,
+            period=period,
+        )
+
+    @property
+    def latitude(self) -> float | None:
+        return from_fixed(self.lat) if self.lat is not None else None
+
+    @property
+    def longitude(self) -> float | None:
+        return from_fixed(self.lon) if self.lon is not None else None
+
+
+class PlacesPageCallback(VersionedCallbackData, prefix="pp"):
+    """
+    Callback data of the places browser navigation, e.g. "pp:1:next:42"
+    """
+
+    direction: Literal["next", "previous"]
+    place_id: int = Field(gt=0)
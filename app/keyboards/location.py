@@ -1,12 +1,17 @@
+from functools import lru_cache
+
 from aiogram.types import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
 )
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from app.texts import Callbacks, Buttons
+from app.keyboards.callbacks import PlaceAction, PlaceCallback
+from app.texts import Buttons
 
 
+# Markups are shared, they must not be modified by the caller
+@lru_cache(maxsize=4096)
 def location(
         lat: int | float | None = None,
         lon: int | float | None = None,
@@ -18,13 +23,31 @@ def location(
         kb.add(
             InlineKeyboardButton(
                 text=Buttons.PLACES_RENAME,
-                callback_data=f"{Callbacks.PLACE_RENAME}?{lat}|{lon}|{place_id}",
+                callback_data=PlaceCallback.create(PlaceAction.RENAME, place_id, lat, lon).pack(),
             )
         )
         kb.add(
             InlineKeyboardButton(
                 text=Buttons.PLACES_DELETE,
-                callback_data=f"{Callbacks.PLACE_DELETE}?{lat}|{lon}|{place_id}",
+                callback_data=PlaceCallback.create(PlaceAction.DELETE, place_id, lat, lon).pack(),
+            )
+        )
+        kb.add(
+            InlineKeyboardButton(
+                text=Buttons.PLACES_SUBSCRIBE_DAILY,
+                callback_data=PlaceCallback.create(PlaceAction.SUBSCRIBE, place_id, period="daily").pack(),
+            )
+        )
+        kb.add(
+            InlineKeyboardButton(
+                text=Buttons.PLACES_SUBSCRIBE_HOURLY,
+                callback_data=PlaceCallback.create(PlaceAction.SUBSCRIBE, place_id, period="hourly").pack(),
+            )
+        )
+        kb.add(
+            InlineKeyboardButton(
+                text=Buttons.PLACES_UNSUBSCRIBE,
+                callback_data=PlaceCallback.create(PlaceAction.UNSUBSCRIBE, place_id).pack(),
             )
         )
 
@@ -32,7 +55,7 @@ def location(
         kb.add(
             InlineKeyboardButton(
                 text=Buttons.PLACES_ADD,
-                callback_data=f"{Callbacks.PLACE_ADD}?{lat}|{lon}",
+                callback_data=PlaceCallback.create(PlaceAction.ADD, lat=lat, lon=lon).pack(),
             )
         )
 
@@ -1,9 +1,12 @@
 from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
     ReplyKeyboardMarkup,
     KeyboardButton,
 )
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
+from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
+from app.keyboards.callbacks import PlaceAction, PlaceCallback, PlacesPageCallback
 from app.texts import Buttons
 
 
@@ -19,6 +22,12 @@ def places(
             )
         )
 
+    kb.add(
+        KeyboardButton(
+            text=Buttons.PLACES_WEATHER_ALL,
+        )
+    )
+
     kb.add(
         KeyboardButton(
             text=Buttons.BACK_TO_MAIN_MENU,
@@ -26,3 +35,43 @@ def places(
     )
 
     return kb.adjust(2).as_markup(resize_keyboard=True)
+
+
+def places_page(
+        places: list,
+        has_previous: bool = False,
+        has_next: bool = False,
+) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
+
+    for place in places:
+        kb.row(
+            InlineKeyboardButton(
+                text=place[1],
+                callback_data=PlaceCallback.create(PlaceAction.SELECT, place[0]).pack(),
+            )
+        )
+
+    # Navigation, the cursor is the first or last place of the page
+    navigation = []
+
+    if has_previous:
+        navigation.append(
+            InlineKeyboardButton(
+                text=Buttons.PLACES_PREVIOUS,
+                callback_data=PlacesPageCallback(direction="previous", place_id=places[0][0]).pack(),
+            )
+        )
+
+    if has_next:
+        navigation.append(
+            InlineKeyboardButton(
+                text=Buttons.PLACES_NEXT,
+                callback_data=PlacesPageCallback(direction="next", place_id=places[-1][0]).pack(),
+            )
+        )
+
+    if navigation:
+        kb.row(*navigation)
+
+    return kb.as_markup()
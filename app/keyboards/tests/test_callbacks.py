@@ -0,0 +1,68 @@
+import pytest
+
+from app.keyboards import (
+    CALLBACK_VERSION,
+    PlaceAction,
+    PlaceCallback,
+    PlacesPageCallback,
+)
+
+# --- Pytest Test Cases for the callback data codec ---
+
+def test_place_callback_round_trip():
+    """
+    Tests that packed place callback data is parsed back to the same values.
+    1. Packs full precision coordinates.
+    2. Asserts that they come back with 6 decimal places, and the data fits the Telegram limit.
+    """
+    data = PlaceCallback.create(PlaceAction.RENAME, 123456, 50.45012345678901, -30.523456789012345).pack()
+
+    assert data == f"pl:{CALLBACK_VERSION}:ren:123456:50450123:-30523457:"
+    assert len(data.encode()) <= 64
+
+    callback_data = PlaceCallback.unpack(data)
+
+    assert callback_data.action == PlaceAction.RENAME
+    assert callback_data.place_id == 123456
+    assert (callback_data.latitude, callback_data.longitude) == (50.450123, -30.523457)
+    assert callback_data.period is None
+
+
+def test_place_callback_keeps_telegram_coordinates():
+    """
+    Tests that coordinates with 6 decimal places, as Telegram sends them, are kept exactly.
+    """
+    for lat, lon in [(50.450001, 30.523333), (-33.868820, 151.209296), (90, -180)]:
+        callback_data = PlaceCallback.unpack(PlaceCallback.create(PlaceAction.ADD, lat=lat, lon=lon).pack())
+
+        assert (callback_data.latitude, callback_data.longitude) == (lat, lon)
+
+
+def test_places_page_callback_round_trip():
+    data = PlacesPageCallback(direction="previous", place_id=42).pack()
+
+    assert PlacesPageCallback.unpack(data) == PlacesPageCallback(direction="previous", place_id=42)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "favorite_place_rename?50.45|30.52|1",
+        f"pl:{CALLBACK_VERSION + 1}:ren:1:50450000:30520000:",
+        f"pl:{CALLBACK_VERSION}:ren:1:50450000",
+        f"pl:{CALLBACK_VERSION}:move:1:::",
+        f"pl:{CALLBACK_VERSION}:ren:0:::",
+        f"pl:{CALLBACK_VERSION}:ren:1:90000001::",
+        f"pl:{CALLBACK_VERSION}:sub:1:::weekly",
+        f"pp:{CALLBACK_VERSION}:up:1",
+    ],
+)
+def test_invalid_callback_data_is_rejected(data: str):
+    """
+    Tests that callback data of an older version, another format or with invalid values is rejected.
+    The aiogram filter treats these errors as a mismatch.
+    """
+    callback_class = PlacesPageCallback if data.startswith("pp:") else PlaceCallback
+
+    with pytest.raises((TypeError, ValueError)):
+        callback_class.unpack(data)
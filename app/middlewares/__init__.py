@@ -1,2 +1,4 @@
 from .auth import *
 from .db import *
+from .metrics import *
+from .send_queue import *
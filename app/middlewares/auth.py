@@ -18,11 +18,11 @@ class AuthMiddleware(BaseMiddleware):
 
         tg_id = event.from_user.id
 
-        # Get User data by tg_id
-        user = await db.get_user(tg_id)
+        # Check User by tg_id
+        is_user = await db.user_exists(tg_id)
 
         # Reply
-        if user or (isinstance(event, Message) and event.contact):
+        if is_user or (isinstance(event, Message) and event.contact):
             # Authenticated User
             return await handler(event, data)
         else:
@@ -7,8 +7,9 @@ from app.services import DBService
 
 
 class DBMiddleware(BaseMiddleware):
-    def __init__(self):
-        self.__db = DBService()
+    def __init__(self, db: DBService):
+        # Connected once at startup and shared by all updates
+        self.__db = db
 
     async def __call__(
             self,
@@ -16,23 +17,8 @@ class DBMiddleware(BaseMiddleware):
             event: TelegramObject,
             data: dict[str, Any],
     ) -> Any:
-        # print("Actions before handler", event.from_user.id)
-
-        # Connect to DB
-        await self.__db.connect()
-
-        # Create Tables if they do not exist
-        await self.__db.setup()
-
         # Add db to data
         data["db"] = self.__db
 
         # Run handler
-        result = await handler(event, data)
-
-        # Disconnect with DB
-        await self.__db.close()
-
-        # print("Actions after handler")
-
-        return result
+        return await handler(event, data)
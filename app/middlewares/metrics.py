@@ -0,0 +1,95 @@
+import time
+from typing import Callable, Awaitable, Any
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType, Response
+from aiogram.types import TelegramObject, Update
+
+from app.services.metrics import UPDATE_DURATION, HANDLER_DURATION, MIDDLEWARE_DURATION, track_call
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Outer Dispatcher middleware that measures the whole processing of an update
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+
+        with UPDATE_DURATION.time(type=update_type):
+            return await handler(event, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner Router middleware that measures the handler, it must be registered last
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+
+        with HANDLER_DURATION.time(handler=name):
+            return await handler(event, data)
+
+
+class StageMetricsMiddleware(BaseMiddleware):
+    """
+    Wrapper that measures the time spent in a middleware without the handlers it calls
+    """
+
+    def __init__(self, middleware: BaseMiddleware, name: str | None = None):
+        self.middleware = middleware
+        self.name = name or type(middleware).__name__
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        downstream = 0.0
+
+        async def timed_handler(event: TelegramObject, data: dict[str, Any]) -> Any:
+            nonlocal downstream
+
+            start = time.perf_counter()
+
+            try:
+                return await handler(event, data)
+            finally:
+                downstream += time.perf_counter() - start
+
+        start = time.perf_counter()
+
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            MIDDLEWARE_DURATION.observe(time.perf_counter() - start - downstream, middleware=self.name)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Bot session middleware that measures Telegram API calls
+    """
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with track_call("telegram", method.__api_method__):
+            return await make_request(bot, method)
@@ -0,0 +1,29 @@
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType, Response
+
+from app.services import SendQueue
+
+
+class SendQueueMiddleware(BaseRequestMiddleware):
+    """
+    Bot session middleware that sends the messages to chats through the send queue.
+    Calls without a chat (e.g. getUpdates, answerCallbackQuery) are made at once
+    """
+
+    def __init__(self, queue: SendQueue | None = None):
+        self.queue = queue or SendQueue()
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        return await self.queue.send(chat_id, lambda: make_request(bot, method))
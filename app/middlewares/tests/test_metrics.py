@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+from aiogram import BaseMiddleware
+
+from app.middlewares.metrics import StageMetricsMiddleware
+from app.services.metrics import MIDDLEWARE_DURATION
+
+
+# --- Middleware that spends time before calling the handler ---
+
+class SlowMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        await asyncio.sleep(0.01)
+
+        return await handler(event, data)
+
+
+# --- Pytest Test Cases for StageMetricsMiddleware ---
+
+@pytest.mark.asyncio
+async def test_stage_time_excludes_handler():
+    """
+    Tests that the middleware stage is measured without the time of the handler it calls.
+    """
+
+    async def slow_handler(event, data):
+        await asyncio.sleep(0.2)
+
+        return "result"
+
+    middleware = StageMetricsMiddleware(SlowMiddleware(), name="test_slow")
+
+    result = await middleware(slow_handler, object(), {})
+
+    assert result == "result"
+    assert MIDDLEWARE_DURATION.get_count(middleware="test_slow") == 1
+
+    # Only the 10 ms of the middleware itself are recorded, not the 200 ms of the handler
+    _, total, _ = MIDDLEWARE_DURATION._values[("test_slow",)]
+    assert 0.01 <= total < 0.1
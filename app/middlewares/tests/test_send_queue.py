@@ -0,0 +1,42 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Bot
+from aiogram.methods import AnswerCallbackQuery, GetUpdates, SendMessage
+
+from app.middlewares.send_queue import SendQueueMiddleware
+from app.services import SendQueue
+
+TEST_TOKEN = "42:TEST"
+
+
+# --- Pytest Test Cases for SendQueueMiddleware ---
+
+@pytest.mark.asyncio
+async def test_messages_to_chats_go_through_the_queue():
+    """
+    Tests that only calls with a chat wait in the send queue.
+    1. Makes a sendMessage call and two calls without a chat.
+    2. Asserts that the queue got the chat of the message only, and all calls were made.
+    """
+    async def send(chat_id, call):
+        return await call()
+
+    queue = SendQueue(rate=1000, chat_rate=1000)
+    queue.send = AsyncMock(side_effect=send)
+    middleware = SendQueueMiddleware(queue)
+
+    bot = Bot(token=TEST_TOKEN)
+    make_request = AsyncMock(return_value="result")
+
+    for method in [
+        SendMessage(chat_id=42, text="Weather"),
+        GetUpdates(timeout=30),
+        AnswerCallbackQuery(callback_query_id="1"),
+    ]:
+        assert await middleware(make_request, bot, method) == "result"
+
+    assert [call.args[0] for call in queue.send.await_args_list] == [42]
+    assert make_request.await_count == 3
+
+    await bot.session.close()
@@ -0,0 +1,4 @@
+from .lanes import *
+from .polling import *
+from .supervisor import *
+from .webhook import *
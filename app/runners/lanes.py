@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
+
+from app.services.metrics import REGISTRY
+
+LANES_IN_FLIGHT = REGISTRY.gauge(
+    "bot_lanes_in_flight", "Updates accepted and not processed yet (running or waiting in their lane)", ("runner",)
+)
+LANES_INTAKE_WAIT = REGISTRY.histogram(
+    "bot_lanes_intake_wait_seconds", "Time the intake waited for a free slot (backpressure)", ("runner",)
+)
+
+T = TypeVar("T")
+
+
+def get_update_user_id(update: dict | Update) -> int | None:
+    """
+    Telegram ID of the user who caused the update (raw or parsed), if any
+    """
+    if isinstance(update, Update):
+        try:
+            event = update.event
+        except UpdateTypeLookupError:
+            return None
+
+        # Most events have "from", poll answers and reactions have "user"
+        user = getattr(event, "from_user", None) or getattr(event, "user", None)
+
+        return user.id if user else None
+
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+
+        # Most events have "from", poll answers and reactions have "user"
+        user = event.get("from") or event.get("user")
+
+        if isinstance(user, dict):
+            return user.get("id")
+
+    return None
+
+
+class UserLanes(Generic[T]):
+    """
+    Executor with a lane per user: updates of different users run concurrently,
+    updates of one user run one after another in arrival order, so FSM steps are never reordered.
+    At most max_in_flight updates are accepted and at most concurrency of them run at the same time.
+    submit waits for a free slot, which slows down the intake (polling or webhook) under load
+    """
+
+    def __init__(
+            self,
+            process: Callable[[T], Awaitable[object]],
+            key: Callable[[T], Hashable | None] = get_update_user_id,
+            max_in_flight: int = 1000,
+            concurrency: int | None = None,
+            name: str = "default",
+    ):
+        self.name = name
+
+        self._process = process
+        self._key = key
+
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._running = asyncio.Semaphore(concurrency or max_in_flight)
+
+        # Waiting updates by user, a lane exists while its task runs
+        self._lanes: dict[Hashable, deque[T]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def __len__(self) -> int:
+        return self._in_flight
+
+    @property
+    def lanes_count(self) -> int:
+        return len(self._lanes)
+
+    async def submit(self, item: T) -> None:
+        """
+        Accept the update, waiting while max_in_flight updates are not processed yet
+        """
+        start = time.perf_counter()
+
+        await self._slots.acquire()
+
+        LANES_INTAKE_WAIT.observe(time.perf_counter() - start, runner=self.name)
+
+        self._in_flight += 1
+        self._idle.clear()
+        LANES_IN_FLIGHT.inc(runner=self.name)
+
+        key = self._key(item)
+
+        # Updates without a user do not need ordering
+        if key is None:
+            key = object()
+
+        lane = self._lanes.get(key)
+
+        if lane is not None:
+            lane.append(item)
+
+            return
+
+        self._lanes[key] = deque([item])
+
+        task = asyncio.create_task(self._run_lane(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _done(self) -> None:
+        self._in_flight -= 1
+        LANES_IN_FLIGHT.dec(runner=self.name)
+        self._slots.release()
+
+        if not self._in_flight:
+            self._idle.set()
+
+    async def _run_lane(self, key: Hashable) -> None:
+        lane = self._lanes[key]
+
+        try:
+            while lane:
+                item = lane.popleft()
+
+                try:
+                    async with self._running:
+                        await self._process(item)
+                except Exception as e:
+                    logging.exception("Failed to process update: %s", e)
+                finally:
+                    self._done()
+        finally:
+            # Cancelled with updates left in the lane
+            for _ in lane:
+                self._done()
+
+            del self._lanes[key]
+
+    async def join(self) -> None:
+        """
+        Wait until all accepted updates are processed
+        """
+        await self._idle.wait()
+
+    async def cancel(self) -> None:
+        """
+        Stop processing, the updates left in the lanes are dropped
+        """
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
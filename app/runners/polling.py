@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import signal
+from typing import Any, Awaitable, TypeVar
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+from app.runners.lanes import UserLanes
+
+_POLLING_TIMEOUT = 30
+
+T = TypeVar("T")
+
+
+async def _until_stopped(awaitable: Awaitable[T], stop: asyncio.Event) -> T | None:
+    """
+    Await the result, None if the stop event is set first (the awaitable is then cancelled)
+    """
+    task = asyncio.ensure_future(awaitable)
+    stopped = asyncio.ensure_future(stop.wait())
+
+    try:
+        await asyncio.wait({task, stopped}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopped.cancel()
+
+        if not task.done():
+            task.cancel()
+
+            await asyncio.gather(task, return_exceptions=True)
+
+    # Cancelled here because of the stop
+    if task.cancelled() and stop.is_set():
+        return None
+
+    return task.result()
+
+
+async def start_polling(dp: Dispatcher, bot: Bot, handle_signals: bool = True, **kwargs: Any) -> None:
+    """
+    Poll updates until cancelled or stopped by SIGTERM/SIGINT (with handle_signals).
+    Updates of different users are processed concurrently, updates of one user in the order they were received
+    (see UserLanes). Polling waits while BOT_MAX_IN_FLIGHT updates are not processed yet.
+    On stop the accepted updates are finished and the shutdown hooks run
+    """
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data, **kwargs}
+
+    async def feed_update(update: Update) -> None:
+        result = await dp.feed_update(bot=bot, update=update, **kwargs)
+
+        if isinstance(result, TelegramMethod):
+            await dp.silent_call_request(bot=bot, result=result)
+
+    lanes = UserLanes(
+        process=feed_update,
+        max_in_flight=int(os.getenv("BOT_MAX_IN_FLIGHT", 1000)),
+        concurrency=int(os.getenv("BOT_CONCURRENCY", 100)),
+        name="polling",
+    )
+
+    # Polling does not work while a webhook is set
+    await bot.delete_webhook()
+
+    await dp.emit_startup(bot=bot, **workflow_data)
+
+    offset = None
+    backoff = 1
+    allowed_updates = dp.resolve_used_update_types()
+
+    # Like Dispatcher.start_polling, a stop signal ends polling gracefully instead of killing the process
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = (signal.SIGTERM, signal.SIGINT) if handle_signals else ()
+
+    for signal_number in signals:
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except NotImplementedError:
+            # Not supported on Windows
+            pass
+
+    try:
+        while not stop.is_set():
+            try:
+                updates = await _until_stopped(
+                    bot.get_updates(
+                        offset=offset,
+                        timeout=_POLLING_TIMEOUT,
+                        allowed_updates=allowed_updates,
+                        request_timeout=_POLLING_TIMEOUT + 10,
+                    ),
+                    stop,
+                )
+                backoff = 1
+            except Exception as e:
+                logging.warning("Failed to get updates: %s. Retry in %s s", e, backoff)
+
+                await _until_stopped(asyncio.sleep(backoff), stop)
+                backoff = min(backoff * 2, 30)
+
+                continue
+
+            if updates is None:
+                logging.info("Polling stopped by a signal")
+
+                break
+
+            for update in updates:
+                # Waits for a free slot, so a busy bot stops taking updates from Telegram
+                await lanes.submit(update)
+
+                offset = update.update_id + 1
+    finally:
+        for signal_number in signals:
+            try:
+                loop.remove_signal_handler(signal_number)
+            except NotImplementedError:
+                pass
+
+        # Finish accepted updates, the next polling starts after them
+        await lanes.join()
+
+        try:
+            await dp.emit_shutdown(bot=bot, **workflow_data)
+        finally:
+            await bot.session.close()
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import secrets
+import sys
+import time
+from typing import Any
+
+import httpx
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiohttp import web
+
+from app.bot import create_bot, create_dispatcher, get_allowed_updates
+from app.runners.lanes import UserLanes, get_update_user_id
+from app.runners.webhook import WebhookSettings, serve
+from app.services import create_http_client
+
+
+def get_worker_index(update: dict, workers: int) -> int:
+    user_id = get_update_user_id(update)
+
+    # Updates without a user are spread by their ID
+    key = user_id if user_id is not None else update.get("update_id", 0)
+
+    return key % workers
+
+
+async def _feed_update(dp: Dispatcher, bot: Bot, update: dict) -> None:
+    result = await dp.feed_raw_update(bot=bot, update=update)
+
+    if isinstance(result, TelegramMethod):
+        await dp.silent_call_request(bot=bot, result=result)
+
+
+async def _run_worker(index: int, updates: multiprocessing.Queue) -> None:
+    bot = create_bot()
+    dp = create_dispatcher(worker_index=index)
+
+    loop = asyncio.get_running_loop()
+
+    # Updates of one user are processed in the order they were received,
+    # a bounded number of updates is taken from the queue at the same time
+    lanes = UserLanes(
+        process=lambda update: _feed_update(dp, bot, update),
+        max_in_flight=int(os.getenv("BOT_WORKER_CONCURRENCY", 100)),
+        name=f"worker_{index}",
+    )
+
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+
+    await dp.emit_startup(bot=bot, **workflow_data)
+
+    logging.info("Worker %s started", index)
+
+    try:
+        while True:
+            update = await loop.run_in_executor(None, updates.get)
+
+            # Stop signal from the Supervisor
+            if update is None:
+                break
+
+            await lanes.submit(update)
+
+        await lanes.join()
+    finally:
+        try:
+            await dp.emit_shutdown(bot=bot, **workflow_data)
+        finally:
+            await bot.session.close()
+
+        logging.info("Worker %s stopped", index)
+
+
+def run_worker(index: int, updates: multiprocessing.Queue) -> None:
+    """
+    Entry point of a worker process
+    """
+    if os.getenv("IS_DEBUG"):
+        logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+
+    try:
+        asyncio.run(_run_worker(index, updates))
+    except KeyboardInterrupt:
+        pass
+
+
+class Supervisor:
+    """
+    Supervisor receives updates (polling or webhook) and routes them to worker processes.
+    Updates of one user always go to the same worker, so their order and FSM state stay in one process
+    """
+
+    _API_URL = "https://api.telegram.org/bot{token}/{method}"
+    _POLLING_TIMEOUT = 30
+
+    def __init__(self, workers: int, queue_size: int | None = None):
+        self._workers_count = workers
+        self._queue_size = queue_size or int(os.getenv("BOT_WORKER_QUEUE_SIZE", 1000))
+        self._context = multiprocessing.get_context("spawn")
+        self._queues: list[multiprocessing.Queue] = []
+        self._processes: list[multiprocessing.Process | None] = []
+
+    def _start_worker(self, index: int) -> None:
+        process = self._context.Process(
+            target=run_worker,
+            args=(index, self._queues[index]),
+            name=f"bot-worker-{index}",
+        )
+        process.start()
+
+        self._processes[index] = process
+
+    def start(self) -> None:
+        self._queues = [self._context.Queue(maxsize=self._queue_size) for _ in range(self._workers_count)]
+        self._processes = [None] * self._workers_count
+
+        for index in range(self._workers_count):
+            self._start_worker(index)
+
+    def stop(self, timeout: float = 30) -> None:
+        """
+        Ask the workers to finish the queued updates and stop, the ones not stopped within the timeout are terminated
+        """
+        deadline = time.monotonic() + timeout
+
+        for worker_queue, process in zip(self._queues, self._processes):
+            # Nobody reads the queue of a dead worker
+            if process is None or not process.is_alive():
+                continue
+
+            try:
+                worker_queue.put(None, timeout=max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                logging.warning("Worker %s does not take updates, terminating it", process.name)
+
+                process.terminate()
+
+        for worker_queue, process in zip(self._queues, self._processes):
+            if process is None:
+                continue
+
+            process.join(max(deadline - time.monotonic(), 0))
+
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+            # Updates left in the queue of a stopped worker must not keep the Supervisor from exiting
+            worker_queue.cancel_join_thread()
+
+    async def dispatch(self, update: dict) -> None:
+        index = get_worker_index(update, self._workers_count)
+
+        if not self._processes[index].is_alive():
+            logging.warning("Worker %s is not running, restarting it", index)
+
+            self._start_worker(index)
+
+        worker_queue = self._queues[index]
+
+        try:
+            worker_queue.put_nowait(update)
+        except queue.Full:
+            # Stop receiving updates until the worker catches up
+            await asyncio.to_thread(worker_queue.put, update)
+
+    async def _call(self, client: httpx.AsyncClient, method: str, **params: Any) -> Any:
+        url = self._API_URL.format(token=os.getenv("BOT_TOKEN"), method=method)
+
+        # Omit unset parameters
+        params = {key: value for key, value in params.items() if value is not None}
+
+        response = await client.post(url, json=params)
+        response.raise_for_status()
+
+        return response.json()["result"]
+
+    async def run_polling(self) -> None:
+        offset = None
+        backoff = 1
+        allowed_updates = get_allowed_updates()
+
+        async with create_http_client(timeout=self._POLLING_TIMEOUT + 10) as client:
+            # Polling does not work while a webhook is set
+            await self._call(client, "deleteWebhook")
+
+            while True:
+                try:
+                    updates = await self._call(
+                        client,
+                        "getUpdates",
+                        offset=offset,
+                        timeout=self._POLLING_TIMEOUT,
+                        allowed_updates=allowed_updates,
+                    )
+                    backoff = 1
+                except (httpx.HTTPError, ValueError, KeyError) as e:
+                    logging.warning("Failed to get updates: %s. Retry in %s s", e, backoff)
+
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30)
+
+                    continue
+
+                for update in updates:
+                    await self.dispatch(update)
+
+                    offset = update["update_id"] + 1
+
+    async def run_webhook(self) -> None:
+        settings = WebhookSettings.from_env()
+
+        async def handle(request: web.Request) -> web.Response:
+            if settings.secret_token and not secrets.compare_digest(
+                    request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), settings.secret_token
+            ):
+                return web.Response(body="Unauthorized", status=401)
+
+            await self.dispatch(await request.json())
+
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_post(settings.path, handle)
+
+        async with create_http_client() as client:
+            await self._call(
+                client,
+                "setWebhook",
+                url=settings.webhook_url,
+                secret_token=settings.secret_token,
+                allowed_updates=get_allowed_updates(),
+            )
+
+        await serve(app, host=settings.host, port=settings.port)
+
+    def run(self) -> None:
+        self.start()
+
+        try:
+            if os.getenv("BOT_MODE", "polling") == "webhook":
+                asyncio.run(self.run_webhook())
+            else:
+                asyncio.run(self.run_polling())
+        finally:
+            self.stop()
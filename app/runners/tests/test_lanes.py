@@ -0,0 +1,214 @@
+import asyncio
+import os
+import signal
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message, Update
+
+from app.runners.lanes import UserLanes, get_update_user_id
+from app.runners.polling import start_polling
+
+# --- Constants for Testing ---
+
+TEST_TOKEN = "42:TEST"
+
+
+def create_update(update_id: int, user_id: int | None, text: str = "") -> dict:
+    update = {"update_id": update_id}
+
+    if user_id is not None:
+        update["message"] = {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "text": text,
+        }
+
+    return update
+
+
+# --- Pytest Test Cases for UserLanes ---
+
+def test_get_update_user_id_of_parsed_update():
+    """
+    Tests that the user is found in parsed updates too.
+    """
+    assert get_update_user_id(Update.model_validate(create_update(1, 7))) == 7
+    assert get_update_user_id(Update(update_id=2)) is None
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_user_keep_their_order():
+    """
+    Tests that a slow update delays the next updates of its user only.
+    1. User 1 sends a slow update and a fast one, user 2 sends a fast update.
+    2. Asserts that user 2 is not blocked and user 1's updates are processed in order.
+    """
+    finished = []
+
+    async def process(update: dict) -> None:
+        if update["update_id"] == 1:
+            await asyncio.sleep(0.05)
+
+        finished.append(update["update_id"])
+
+    lanes = UserLanes(process=process, max_in_flight=10)
+
+    for update in [create_update(1, 1), create_update(2, 1), create_update(3, 2)]:
+        await lanes.submit(update)
+
+    await lanes.join()
+
+    assert finished == [3, 1, 2]
+    assert lanes.lanes_count == 0
+    assert len(lanes) == 0
+
+
+@pytest.mark.asyncio
+async def test_submit_waits_for_free_slot():
+    """
+    Tests the backpressure: submit waits while max_in_flight updates are not processed.
+    """
+    release = asyncio.Event()
+
+    async def process(update: dict) -> None:
+        await release.wait()
+
+    lanes = UserLanes(process=process, max_in_flight=2)
+
+    await lanes.submit(create_update(1, 1))
+    await lanes.submit(create_update(2, 2))
+
+    # 1. The third update does not fit
+    submit = asyncio.create_task(lanes.submit(create_update(3, 3)))
+    await asyncio.sleep(0.01)
+
+    assert not submit.done()
+
+    # 2. It is accepted once the others are processed
+    release.set()
+    await submit
+    await lanes.join()
+
+    assert len(lanes) == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    """
+    Tests that no more than concurrency updates run at the same time, whatever the number of users.
+    """
+    running = 0
+    max_running = 0
+
+    async def process(update: dict) -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    lanes = UserLanes(process=process, max_in_flight=100, concurrency=3)
+
+    for index in range(12):
+        await lanes.submit(create_update(index, index if index % 2 else None))
+
+    await lanes.join()
+
+    assert max_running == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_update_does_not_stop_the_lane():
+    """
+    Tests that the next updates of a user are processed after a failed one.
+    """
+    processed = []
+
+    async def process(update: dict) -> None:
+        if update["update_id"] == 1:
+            raise ValueError("Handler failed")
+
+        processed.append(update["update_id"])
+
+    lanes = UserLanes(process=process)
+
+    await lanes.submit(create_update(1, 1))
+    await lanes.submit(create_update(2, 1))
+    await lanes.join()
+
+    assert processed == [2]
+
+
+# --- Pytest Test Cases for start_polling ---
+
+@pytest.mark.asyncio
+async def test_polling_keeps_fsm_steps_of_user_in_order(monkeypatch):
+    """
+    Tests that polled updates of one user reach the handlers in order while other users run concurrently.
+    1. Polls one batch of updates, then polling is cancelled.
+    2. Asserts the order in which the handlers finished.
+    """
+    finished = []
+
+    dp = Dispatcher()
+
+    @dp.message()
+    async def handler(message: Message) -> None:
+        # The first step of user 1 is slow, like a weather lookup
+        if message.text == "slow":
+            await asyncio.sleep(0.05)
+
+        finished.append((message.from_user.id, message.text))
+
+    bot = Bot(token=TEST_TOKEN)
+    updates = [
+        Update.model_validate(create_update(1, 1, "slow")),
+        Update.model_validate(create_update(2, 1, "name")),
+        Update.model_validate(create_update(3, 2, "other")),
+    ]
+
+    monkeypatch.setattr(bot, "delete_webhook", AsyncMock())
+    monkeypatch.setattr(bot, "get_updates", AsyncMock(side_effect=[updates, asyncio.CancelledError()]))
+
+    with pytest.raises(asyncio.CancelledError):
+        await start_polling(dp, bot)
+
+    assert finished == [(2, "other"), (1, "slow"), (1, "name")]
+    assert bot.get_updates.await_args_list[1].kwargs["offset"] == 4
+
+
+@pytest.mark.asyncio
+async def test_polling_runs_shutdown_on_sigterm(monkeypatch):
+    """
+    Tests that SIGTERM stops a waiting getUpdates and polling ends with the shutdown hooks, like aiogram does.
+    """
+    dp = Dispatcher()
+    bot = Bot(token=TEST_TOKEN)
+    polling = asyncio.Event()
+    shutdown = []
+
+    @dp.shutdown()
+    async def on_shutdown() -> None:
+        shutdown.append(True)
+
+    async def get_updates(**kwargs):
+        polling.set()
+
+        # Long polling without updates
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(bot, "delete_webhook", AsyncMock())
+    monkeypatch.setattr(bot, "get_updates", AsyncMock(side_effect=get_updates))
+
+    task = asyncio.create_task(start_polling(dp, bot))
+    await polling.wait()
+
+    os.kill(os.getpid(), signal.SIGTERM)
+
+    await asyncio.wait_for(task, 1)
+
+    assert shutdown == [True]
@@ -0,0 +1,117 @@
+import queue
+from unittest.mock import Mock
+
+import pytest
+
+from app.runners.supervisor import Supervisor, get_update_user_id, get_worker_index
+
+# --- Mock Updates ---
+
+MESSAGE_UPDATE = {
+    "update_id": 10,
+    "message": {"message_id": 1, "date": 0, "chat": {"id": 7, "type": "private"}, "from": {"id": 7}},
+}
+CALLBACK_UPDATE = {
+    "update_id": 11,
+    "callback_query": {"id": "1", "chat_instance": "1", "from": {"id": 8}},
+}
+POLL_ANSWER_UPDATE = {
+    "update_id": 12,
+    "poll_answer": {"poll_id": "1", "option_ids": [0], "user": {"id": 9}},
+}
+POLL_UPDATE = {
+    "update_id": 13,
+    "poll": {"id": "1", "question": "?", "options": []},
+}
+
+
+# --- Pytest Test Cases for update routing ---
+
+def test_get_update_user_id():
+    """
+    Tests that the user is found in different kinds of updates.
+    """
+    assert get_update_user_id(MESSAGE_UPDATE) == 7
+    assert get_update_user_id(CALLBACK_UPDATE) == 8
+    assert get_update_user_id(POLL_ANSWER_UPDATE) == 9
+    assert get_update_user_id(POLL_UPDATE) is None
+
+
+def test_get_worker_index_is_stable_per_user():
+    """
+    Tests that all updates of one user go to the same worker.
+    """
+    other_message = {**MESSAGE_UPDATE, "update_id": 99}
+
+    assert get_worker_index(MESSAGE_UPDATE, 4) == get_worker_index(other_message, 4) == 7 % 4
+    assert get_worker_index(CALLBACK_UPDATE, 4) == 8 % 4
+
+    # Updates without a user are spread by their ID
+    assert get_worker_index(POLL_UPDATE, 4) == 13 % 4
+
+
+@pytest.mark.asyncio
+async def test_dispatch_puts_update_into_worker_queue():
+    """
+    Tests that the Supervisor routes updates into the queue of the selected worker.
+    """
+    supervisor = Supervisor(workers=2, queue_size=10)
+
+    # Replace worker processes with running mocks
+    supervisor._queues = [queue.Queue(), queue.Queue()]
+    supervisor._processes = [Mock(is_alive=Mock(return_value=True)) for _ in range(2)]
+
+    await supervisor.dispatch(MESSAGE_UPDATE)
+    await supervisor.dispatch(CALLBACK_UPDATE)
+
+    assert supervisor._queues[1].get_nowait() == MESSAGE_UPDATE
+    assert supervisor._queues[0].get_nowait() == CALLBACK_UPDATE
+
+
+@pytest.mark.asyncio
+async def test_dispatch_restarts_dead_worker(monkeypatch):
+    """
+    Tests that a dead worker is restarted before an update is routed to it.
+    """
+    supervisor = Supervisor(workers=1, queue_size=10)
+    supervisor._queues = [queue.Queue()]
+    supervisor._processes = [Mock(is_alive=Mock(return_value=False))]
+
+    start_worker = Mock()
+    monkeypatch.setattr(supervisor, "_start_worker", start_worker)
+
+    await supervisor.dispatch(MESSAGE_UPDATE)
+
+    start_worker.assert_called_once_with(0)
+    assert supervisor._queues[0].get_nowait() == MESSAGE_UPDATE
+
+
+# --- Pytest Test Cases for stopping the workers ---
+
+def test_stop_does_not_block_on_stuck_or_dead_workers():
+    """
+    Tests that stop skips dead workers, terminates a worker whose queue stays full
+    and stops a running worker with the stop signal.
+    """
+    supervisor = Supervisor(workers=3, queue_size=1)
+
+    # 1. Running, stuck (full queue) and dead workers
+    running, stuck, dead = (Mock(is_alive=Mock(return_value=alive)) for alive in (True, True, False))
+    running.join.side_effect = lambda timeout=None: running.is_alive.configure_mock(return_value=False)
+    stuck.terminate.side_effect = lambda: stuck.is_alive.configure_mock(return_value=False)
+
+    full_queue = Mock(put=Mock(side_effect=queue.Full))
+    supervisor._queues = [Mock(), full_queue, Mock()]
+    supervisor._processes = [running, stuck, dead]
+
+    supervisor.stop(timeout=1)
+
+    # 2. Assertions
+    supervisor._queues[0].put.assert_called_once()
+    assert supervisor._queues[0].put.call_args.args == (None,)
+    assert supervisor._queues[0].put.call_args.kwargs["timeout"] <= 1
+    supervisor._queues[2].put.assert_not_called()
+
+    running.terminate.assert_not_called()
+    stuck.terminate.assert_called_once()
+    dead.terminate.assert_not_called()
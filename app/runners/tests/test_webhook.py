@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.runners.webhook import WorkerPoolRequestHandler
+
+# --- Constants for Testing ---
+
+TEST_TOKEN = "42:TEST"
+TEST_SECRET = "secret"
+TEST_PATH = "/webhook"
+
+TEST_UPDATE = {"update_id": 1}
+
+
+# --- Fake Dispatcher that records updates ---
+
+class FakeDispatcher:
+    def __init__(self):
+        self.updates = []
+        self.release = asyncio.Event()
+
+    async def feed_raw_update(self, bot, update, **kwargs):
+        await self.release.wait()
+        self.updates.append(update)
+
+
+async def create_client(dispatcher: FakeDispatcher, **kwargs) -> tuple[TestClient, WorkerPoolRequestHandler]:
+    app = web.Application()
+
+    handler = WorkerPoolRequestHandler(
+        dispatcher=dispatcher,
+        bot=Bot(token=TEST_TOKEN),
+        secret_token=TEST_SECRET,
+        **kwargs,
+    )
+    handler.register(app, path=TEST_PATH)
+
+    client = TestClient(TestServer(app))
+    await client.start_server()
+
+    return client, handler
+
+
+# --- Pytest Test Cases for WorkerPoolRequestHandler ---
+
+@pytest.mark.asyncio
+async def test_update_is_answered_before_processing():
+    """
+    Tests that Telegram gets an answer while the update is still waiting for a worker.
+    """
+    dispatcher = FakeDispatcher()
+    client, handler = await create_client(dispatcher, workers=2)
+
+    try:
+        # 1. Post an update, processing is blocked
+        response = await client.post(
+            TEST_PATH,
+            json=TEST_UPDATE,
+            headers={"X-Telegram-Bot-Api-Secret-Token": TEST_SECRET},
+        )
+
+        assert response.status == 200
+        assert dispatcher.updates == []
+
+        # 2. Let the worker process the update
+        dispatcher.release.set()
+        await handler.join()
+
+        assert dispatcher.updates == [TEST_UPDATE]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_wrong_secret_token_is_rejected():
+    """
+    Tests that updates without the correct secret token are not queued.
+    """
+    dispatcher = FakeDispatcher()
+    client, handler = await create_client(dispatcher)
+
+    try:
+        response = await client.post(
+            TEST_PATH,
+            json=TEST_UPDATE,
+            headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+        )
+
+        assert response.status == 401
+        assert handler.queue_size == 0
+    finally:
+        dispatcher.release.set()
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_workers_bound_concurrency():
+    """
+    Tests that no more updates than workers are processed at the same time.
+    """
+    running = 0
+    max_running = 0
+
+    class CountingDispatcher(FakeDispatcher):
+        async def feed_raw_update(self, bot, update, **kwargs):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    dispatcher = CountingDispatcher()
+    client, handler = await create_client(dispatcher, workers=3)
+
+    try:
+        await asyncio.gather(*[
+            client.post(
+                TEST_PATH,
+                json={"update_id": i},
+                headers={"X-Telegram-Bot-Api-Secret-Token": TEST_SECRET},
+            )
+            for i in range(12)
+        ])
+        await handler.join()
+
+        assert max_running == 3
+    finally:
+        await client.close()
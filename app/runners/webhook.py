@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+from typing import Any, NamedTuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.runners.lanes import UserLanes, get_update_user_id
+
+
+class WebhookSettings(NamedTuple):
+    url: str | None
+    path: str
+    host: str
+    port: int
+    secret_token: str | None
+    workers: int
+    queue_size: int
+
+    @classmethod
+    def from_env(cls) -> "WebhookSettings":
+        return cls(
+            url=os.getenv("WEBHOOK_URL"),
+            path=os.getenv("WEBHOOK_PATH", "/webhook"),
+            host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", 8080)),
+            secret_token=os.getenv("WEBHOOK_SECRET"),
+            workers=int(os.getenv("WEBHOOK_WORKERS", 8)),
+            queue_size=int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000)),
+        )
+
+    @property
+    def webhook_url(self) -> str:
+        if not self.url:
+            raise ValueError("WEBHOOK_URL is required in webhook mode")
+
+        return self.url.rstrip("/") + self.path
+
+
+async def serve(app: web.Application, host: str, port: int) -> None:
+    """
+    Serve the aiohttp application until cancelled
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    try:
+        await web.TCPSite(runner, host=host, port=port).start()
+
+        logging.info("Listening on %s:%s", host, port)
+
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+class WorkerPoolRequestHandler(SimpleRequestHandler):
+    """
+    Webhook handler that answers Telegram as soon as the update is queued.
+    Queued updates are processed by at most workers at the same time, in the order they were received per user
+    """
+
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            workers: int = 8,
+            queue_size: int = 1000,
+            secret_token: str | None = None,
+            **data: Any,
+    ):
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data,
+        )
+
+        # Queued updates with their bot, in a lane per user
+        self._lanes: UserLanes[tuple[Bot, dict]] = UserLanes(
+            process=lambda item: self._background_feed_update(bot=item[0], update=item[1]),
+            key=lambda item: get_update_user_id(item[1]),
+            max_in_flight=queue_size,
+            concurrency=workers,
+            name="webhook",
+        )
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._lanes)
+
+    async def join(self) -> None:
+        """
+        Wait until all queued updates are processed
+        """
+        await self._lanes.join()
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+
+        # A full queue delays the answer, so Telegram slows down instead of piling up tasks
+        await self._lanes.submit((bot, update))
+
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self) -> None:
+        # Finish queued updates before the session is closed
+        await self._lanes.join()
+
+        await super().close()
+
+
+async def start_webhook(dp: Dispatcher, bot: Bot, **kwargs: Any) -> None:
+    """
+    Register the webhook in Telegram and serve updates until cancelled.
+    Settings are read from the WEBHOOK_* environment variables
+    """
+    settings = WebhookSettings.from_env()
+
+    app = web.Application()
+
+    handler = WorkerPoolRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        workers=settings.workers,
+        queue_size=settings.queue_size,
+        secret_token=settings.secret_token,
+        **kwargs,
+    )
+    handler.register(app, path=settings.path)
+
+    # Emit Dispatcher startup/shutdown events with the application
+    setup_application(app, dp, bot=bot, **kwargs)
+
+    await bot.set_webhook(
+        url=settings.webhook_url,
+        secret_token=settings.secret_token,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+    await serve(app, host=settings.host, port=settings.port)
@@ -1,2 +1,14 @@
+from .cache import *
+from .circuit_breaker import *
 from .db import *
+from .http_client import *
+from .icons import *
+from .keyboards import *
+from .metrics import *
+from .migrations import *
+from .rate_limiter import *
+from .scheduler import *
+from .send_queue import *
+from .singleflight import *
 from .weather import *
+from .workers import *
@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Size-bounded LRU Cache with a time to live for every entry.
+    Expired entries are kept for stale_ttl more seconds and are only returned by get_stale
+    """
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            ttl: float = 60,
+            clock: Callable[[], float] = time.monotonic,
+            stale_ttl: float = 0,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+
+        if item is None:
+            self.misses += 1
+
+            return default
+
+        expires_at, value = item
+
+        if expires_at <= self._clock():
+            # Expired entry, kept while it can be served as stale
+            if expires_at + self.stale_ttl <= self._clock():
+                del self._data[key]
+
+            self.misses += 1
+
+            return default
+
+        # Mark as recently used
+        self._data.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def get_stale(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a fresh or expired entry that is still within stale_ttl, hits and misses are not counted
+        """
+        item = self._data.get(key)
+
+        if item is None or item[0] + self.stale_ttl <= self._clock():
+            return default
+
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+
+        self._data[key] = (self._clock() + ttl, value)
+        self._data.move_to_end(key)
+
+        # Evict least recently used entries
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
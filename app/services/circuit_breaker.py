@@ -0,0 +1,104 @@
+import time
+from typing import Callable
+
+from app.services.metrics import REGISTRY
+
+CIRCUIT_BREAKER_STATE = REGISTRY.gauge(
+    "bot_circuit_breaker_state", "Circuit breaker state: 0 closed, 1 open, 2 half-open", ("breaker",)
+)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Circuit Breaker.
+    Opens after failure_threshold failures in a row and rejects calls for recovery_timeout seconds.
+    Then it is half-open: one probe call is allowed, its result closes or opens the circuit again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(
+            self,
+            failure_threshold: int = 5,
+            recovery_timeout: float = 30,
+            name: str = "default",
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.name = name
+
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+
+        CIRCUIT_BREAKER_STATE.set(self._STATE_VALUES[state], breaker=self.name)
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """
+        True while calls are rejected
+        """
+        state = self.state
+
+        return state == self.OPEN or (state == self.HALF_OPEN and self._probing)
+
+    def before_call(self) -> None:
+        """
+        Raise CircuitOpenError if the call is not allowed
+        """
+        state = self.state
+
+        if state == self.CLOSED:
+            return
+
+        if state == self.HALF_OPEN and not self._probing:
+            # Only one probe at a time
+            self._probing = True
+            self._set_state(self.HALF_OPEN)
+
+            return
+
+        raise CircuitOpenError(f"Circuit {self.name} is open")
+
+    def cancel_call(self) -> None:
+        """
+        The call was cancelled before its result, it tells nothing about the service. A probe can be made again
+        """
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probing = False
+
+        if self._state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+            self._set_state(self.OPEN)
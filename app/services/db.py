@@ -1,8 +1,34 @@
+import asyncio
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from sqlite3 import Row
+from typing import AsyncIterator
 
 import aiosqlite
 
+from app.services.cache import TTLCache
+from app.services.metrics import REGISTRY, tracked
+from app.services.migrations import Migration, MigrationService
+
+
+DB_WRITE_LOCK_WAIT = REGISTRY.histogram(
+    "bot_db_write_lock_wait_seconds", "Time a write waited for the shared write connection"
+)
+DB_CHECKPOINT_DURATION = REGISTRY.histogram(
+    "bot_db_checkpoint_duration_seconds", "Time of a WAL checkpoint", ("mode",)
+)
+DB_CHECKPOINT_BUSY = REGISTRY.counter(
+    "bot_db_checkpoint_busy_total", "WAL checkpoints that could not finish because of readers or writers", ("mode",)
+)
+DB_WAL_PAGES = REGISTRY.gauge(
+    "bot_db_wal_pages", "Pages in the WAL file at the last checkpoint"
+)
+DB_GROUP_COMMIT_SIZE = REGISTRY.histogram(
+    "bot_db_group_commit_size", "Writes committed in one group commit", buckets=(1, 2, 5, 10, 20, 50, 100)
+)
+
 
 class DBError(Exception):
     pass
@@ -13,161 +39,380 @@ class DBService:
     Database Service
     """
 
+    _DB_PATH = os.getenv("DB_PATH", "database.db")
+    _USERS_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+    _USERS_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+
+    # Group commit: writes made within the window (s) are committed together, up to max batch
+    _GROUP_COMMIT = os.getenv("DB_GROUP_COMMIT", "0") == "1"
+    _GROUP_COMMIT_WINDOW = float(os.getenv("DB_GROUP_COMMIT_WINDOW", 0.005))
+    _GROUP_COMMIT_MAX_BATCH = int(os.getenv("DB_GROUP_COMMIT_MAX_BATCH", 100))
+
+    # Storage profile, see https://www.sqlite.org/pragma.html
+    _JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL").upper()
+    _SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+    _MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024))
+    # Negative value is in KiB
+    _CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", -64 * 1024))
+    _BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", 5000))
+
+    # WAL maintenance: passive checkpoint interval (0 leaves it to SQLite), WAL size that forces
+    # a truncating checkpoint and PRAGMA optimize interval
+    _CHECKPOINT_INTERVAL = float(os.getenv("DB_CHECKPOINT_INTERVAL", 60))
+    _CHECKPOINT_TRUNCATE_PAGES = int(os.getenv("DB_CHECKPOINT_TRUNCATE_PAGES", 10000))
+    _OPTIMIZE_INTERVAL = float(os.getenv("DB_OPTIMIZE_INTERVAL", 60 * 60))
+
+    _JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+    _SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+    _CHECKPOINT_MODES = {"PASSIVE", "FULL", "RESTART", "TRUNCATE"}
+
     _connection: aiosqlite.Connection | None = None
-    _cursor: aiosqlite.Cursor | None = None
-
-    async def _create_trigger(self, table_name: str):
-        await self._cursor.execute(
-            f"CREATE TRIGGER IF NOT EXISTS update_{table_name}_updated_at "
-            f"BEFORE UPDATE ON {table_name} "
-            "FOR EACH ROW "
-            "BEGIN "
-            f"UPDATE {table_name} SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id; "
-            "END"
-        )
-
-    async def _create_users_table(self):
-        await self._cursor.execute(
-            "CREATE TABLE IF NOT EXISTS users ("
-            "id INTEGER PRIMARY KEY,"
-            "phone TEXT,"
-            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
-            "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
-            ")"
-        )
-
-        await self._create_trigger("users")
-
-    async def _create_places_table(self):
-        await self._cursor.execute(
-            "CREATE TABLE IF NOT EXISTS places ("
-            "id INTEGER PRIMARY KEY AUTOINCREMENT,"
-            "name TEXT NOT NULL,"
-            "lat REAL NOT NULL,"
-            "lon REAL NOT NULL,"
-            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
-            "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
-            "user_id INTEGER,"
-            "UNIQUE (name, user_id),"
-            "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
-            ")"
-        )
-
-        await self._create_trigger("places")
-
-    async def _create_tables(self) -> None:
-        await self._create_users_table()
-        await self._create_places_table()
+    # Separate connection for reads in WAL mode, so reads do not wait for writes and vice versa
+    _read_connection: aiosqlite.Connection | None = None
+
+    def __init__(self, group_commit: bool | None = None):
+        # One long-lived connection is shared by all updates,
+        # so a write (execute + commit/rollback) must not interleave with another one
+        self._write_lock = asyncio.Lock()
+
+        # Pending (sql, parameters, future) writes of the group commit writer
+        self._group_commit = self._GROUP_COMMIT if group_commit is None else group_commit
+        self._writes: list[tuple[str, tuple, asyncio.Future]] = []
+        self._writes_ready = asyncio.Event()
+        self._writer: asyncio.Task | None = None
+        self._closing = False
+
+        self._maintenance: asyncio.Task | None = None
+
+        # Known (True) and unknown (False) user IDs, updated by create_user and delete_user
+        self._users_cache = TTLCache(maxsize=self._USERS_CACHE_SIZE, ttl=self._USERS_CACHE_TTL)
+        self._users_generation = 0
+
+    def _set_user_exists(self, user_id: int, exists: bool | None) -> None:
+        # Lookups started before this change must not overwrite it
+        self._users_generation += 1
+
+        if exists is None:
+            self._users_cache.delete(user_id)
+        else:
+            self._users_cache.set(user_id, exists)
+
+    @asynccontextmanager
+    async def _locked(self) -> AsyncIterator[None]:
+        start = time.perf_counter()
+
+        async with self._write_lock:
+            DB_WRITE_LOCK_WAIT.observe(time.perf_counter() - start)
+
+            yield
+
+    async def _execute_write(self, sql: str, parameters: tuple = ()) -> int | None:
+        """
+        Execute a write statement in its own transaction (or in the next group commit)
+        and return the last row ID
+        """
+        if self._writer is not None:
+            # The pending writes of a stopped writer would never be committed
+            if self._writer.done():
+                raise DBError("Group commit writer is stopped")
+
+            future = asyncio.get_running_loop().create_future()
+
+            self._writes.append((sql, parameters, future))
+            self._writes_ready.set()
+
+            return await future
+
+        async with self._locked():
+            try:
+                async with self._connection.execute(sql, parameters) as cursor:
+                    row_id = cursor.lastrowid
+
+                await self._connection.commit()
+
+                return row_id
+            except Exception:
+                await self._connection.rollback()
+
+                raise
+
+    async def _run_writer(self) -> None:
+        while True:
+            await self._writes_ready.wait()
+
+            if not self._writes:
+                if self._closing:
+                    return
+
+                self._writes_ready.clear()
+
+                continue
+
+            # Collect writes of concurrent updates
+            if len(self._writes) < self._GROUP_COMMIT_MAX_BATCH and not self._closing:
+                await asyncio.sleep(self._GROUP_COMMIT_WINDOW)
+
+            batch = self._writes[:self._GROUP_COMMIT_MAX_BATCH]
+            del self._writes[:self._GROUP_COMMIT_MAX_BATCH]
+
+            if not self._writes and not self._closing:
+                self._writes_ready.clear()
+
+            try:
+                await self._commit_batch(batch)
+            except Exception as e:
+                # Only this batch fails, the writer keeps serving the next ones
+                logging.exception("Failed to commit a group of writes: %s", e)
+
+                self._fail_writes(batch, e)
+
+    @staticmethod
+    def _fail_writes(batch: list[tuple[str, tuple, asyncio.Future]], error: BaseException) -> None:
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _writer_done(self, task: asyncio.Task) -> None:
+        # Cancelled or crashed writer, its callers must not wait forever
+        if self._writes:
+            self._fail_writes(self._writes, DBError("Group commit writer is stopped"))
+            self._writes.clear()
+
+    async def _commit_batch(self, batch: list[tuple[str, tuple, asyncio.Future]]) -> None:
+        """
+        Apply writes in one transaction. Every write has its own savepoint,
+        so a failed write is rolled back alone and only its caller gets the error
+        """
+        results = []
+
+        async with self._locked():
+            try:
+                await self._connection.execute("BEGIN IMMEDIATE")
+
+                for sql, parameters, future in batch:
+                    await self._connection.execute("SAVEPOINT write")
+
+                    try:
+                        async with self._connection.execute(sql, parameters) as cursor:
+                            results.append((future, cursor.lastrowid, None))
+
+                        await self._connection.execute("RELEASE write")
+                    except Exception as e:
+                        await self._connection.execute("ROLLBACK TO write")
+                        await self._connection.execute("RELEASE write")
+
+                        results.append((future, None, e))
+
+                await self._connection.commit()
+            except Exception as e:
+                self._fail_writes(batch, e)
+
+                try:
+                    await self._connection.rollback()
+                except Exception as rollback_error:
+                    logging.warning("Failed to roll back a group of writes: %s", rollback_error)
+
+                return
 
+        DB_GROUP_COMMIT_SIZE.observe(len(batch))
+
+        for future, row_id, error in results:
+            # Cancelled caller, the write is applied anyway
+            if future.done():
+                continue
+
+            if error is None:
+                future.set_result(row_id)
+            else:
+                future.set_exception(error)
+
+    async def _execute_write_many(self, sql: str, parameters: list[tuple]) -> None:
+        """
+        Execute a write statement for every parameters tuple in one transaction
+        """
+        async with self._locked():
+            try:
+                await self._connection.executemany(sql, parameters)
+                await self._connection.commit()
+            except Exception:
+                await self._connection.rollback()
+
+                raise
+
+    async def _fetchone(self, sql: str, parameters: tuple = ()) -> Row | None:
+        async with (self._read_connection or self._connection).execute(sql, parameters) as cursor:
+            return await cursor.fetchone()
+
+    async def _fetchall(self, sql: str, parameters: tuple = ()) -> list:
+        async with (self._read_connection or self._connection).execute(sql, parameters) as cursor:
+            return list(await cursor.fetchall())
+
+    @tracked("db")
     async def create_user(self, user_id: int, phone: str) -> int | None:
         try:
-            await self._cursor.execute(
+            user_id = await self._execute_write(
                 "INSERT INTO users (id, phone) VALUES (?, ?)", (user_id, phone)
             )
 
-            user_id = self._cursor.lastrowid
-
-            await self._connection.commit()
+            self._set_user_exists(user_id, True)
 
             return user_id
         except Exception as e:
-            await self._connection.rollback()
+            self._set_user_exists(user_id, None)
 
             raise DBError(f"Failed to create user: {e}")
 
+    @tracked("db")
     async def delete_user(self, user_id: int) -> bool | None:
         try:
-            await self._cursor.execute("DELETE FROM users WHERE id = (?)", (user_id,))
+            await self._execute_write("DELETE FROM users WHERE id = (?)", (user_id,))
 
-            await self._connection.commit()
+            self._set_user_exists(user_id, False)
 
             return True
         except Exception as e:
-            await self._connection.rollback()
+            self._set_user_exists(user_id, None)
 
             raise DBError(f"Failed to delete user: {e}")
 
+    @tracked("db")
     async def get_user(self, user_id: int) -> Row | None:
         try:
-            await self._cursor.execute("SELECT * FROM users WHERE id = (?)", (user_id,))
-            user = await self._cursor.fetchone()
+            user = await self._fetchone("SELECT * FROM users WHERE id = (?)", (user_id,))
 
             return user
         except Exception as e:
             raise DBError(f"Failed to get user: {e}")
 
+    @tracked("db")
+    async def user_exists(self, user_id: int) -> bool:
+        """
+        Check that the user is registered, using the users cache when possible
+        """
+        exists = self._users_cache.get(user_id)
+
+        if exists is None:
+            generation = self._users_generation
+
+            exists = await self.get_user(user_id) is not None
+
+            if generation == self._users_generation:
+                self._users_cache.set(user_id, exists)
+
+        return exists
+
+    @tracked("db")
     async def get_user_places(self, user_id: int) -> list | None:
         try:
-            await self._cursor.execute(
+            places = await self._fetchall(
                 "SELECT * FROM places WHERE user_id = (?)", (user_id,)
             )
-            places = await self._cursor.fetchall()
 
-            return list(places)
+            return places
+        except Exception as e:
+            raise DBError(f"Failed to get user's places: {e}")
+
+    @tracked("db")
+    async def get_user_places_page(
+            self,
+            user_id: int,
+            limit: int,
+            after: int | None = None,
+            before: int | None = None,
+            prefix: str | None = None,
+    ) -> list | None:
+        """
+        Get up to limit places of the user ordered by name, starting after (or ending before) the place with that ID.
+        Keyset pagination reads only the rows of the page from the (user_id, name) index, however long the list is.
+        The prefix filter is case-sensitive
+        """
+        try:
+            conditions = ["user_id = (?)"]
+            parameters: list = [user_id]
+
+            if prefix:
+                # Range of the names that start with the prefix, served by the index unlike LIKE
+                conditions.append("name >= (?)")
+                parameters.append(prefix)
+
+                # The last code point has no next one, the character before it is increased instead
+                # (no upper bound if there is none)
+                upper = prefix.rstrip(chr(0x10FFFF))
+
+                if upper:
+                    conditions.append("name < (?)")
+                    parameters.append(upper[:-1] + chr(ord(upper[-1]) + 1))
+
+            cursor = after if after is not None else before
+            order = "DESC" if after is None and before is not None else "ASC"
+
+            if cursor is not None:
+                conditions.append(
+                    f"(name, id) {'<' if order == 'DESC' else '>'} (SELECT name, id FROM places WHERE id = (?))"
+                )
+                parameters.append(cursor)
+
+            places = await self._fetchall(
+                f"SELECT * FROM places WHERE {' AND '.join(conditions)} "
+                f"ORDER BY name {order}, id {order} LIMIT (?)",
+                (*parameters, limit),
+            )
+
+            # Pages before the cursor are read backwards
+            return places[::-1] if order == "DESC" else places
         except Exception as e:
             raise DBError(f"Failed to get user's places: {e}")
 
+    @tracked("db")
     async def create_place(
             self, name: str, lat: int | float, lon: int | float, user_id: int
     ) -> int | None:
         try:
-            await self._cursor.execute(
+            place_id = await self._execute_write(
                 "INSERT INTO places (name, lat, lon, user_id) VALUES (?, ?, ?, ?)",
                 (name, lat, lon, user_id),
             )
 
-            place_id = self._cursor.lastrowid
-
-            await self._connection.commit()
-
             return place_id
         except Exception as e:
-            await self._connection.rollback()
-
             raise DBError(f"Failed to create place: {e}")
 
+    @tracked("db")
     async def update_place(self, name: str, place_id: int) -> bool | None:
         try:
-            await self._cursor.execute(
+            await self._execute_write(
                 "UPDATE places SET name = (?) WHERE id = (?)",
                 (name, place_id),
             )
 
-            await self._connection.commit()
-
             return True
         except Exception as e:
-            await self._connection.rollback()
-
             raise DBError(f"Failed to update place: {e}")
 
+    @tracked("db")
     async def delete_place(self, place_id: int) -> bool | None:
         try:
-            await self._cursor.execute("DELETE FROM places WHERE id = (?)", (place_id,))
-
-            await self._connection.commit()
+            await self._execute_write("DELETE FROM places WHERE id = (?)", (place_id,))
 
             return True
         except Exception as e:
-            await self._connection.rollback()
-
             raise DBError(f"Failed to delete place: {e}")
 
+    @tracked("db")
     async def get_place(self, place_id: int) -> Row | None:
         try:
-            await self._cursor.execute("SELECT * FROM places WHERE id = (?)", (place_id,))
-
-            place = await self._cursor.fetchone()
+            place = await self._fetchone("SELECT * FROM places WHERE id = (?)", (place_id,))
 
             return place
         except Exception as e:
             raise DBError(f"Failed to get place by ID: {e}")
 
+    @tracked("db")
     async def get_place_by_coordinates(
             self, user_id: int, lat: int | float, lon: int | float
     ) -> Row | None:
         try:
-            await self._cursor.execute(
+            place = await self._fetchone(
                 "SELECT * FROM places WHERE user_id = (?) AND lat = (?) AND lon = (?)",
                 (
                     user_id,
@@ -176,45 +421,307 @@ class DBService:
                 ),
             )
 
-            place = await self._cursor.fetchone()
-
             return place
         except Exception as e:
             raise DBError(f"Failed to get place by coordinates: {e}")
 
+    @tracked("db")
     async def get_place_by_name(self, name: str, user_id: int) -> Row | None:
         try:
-            await self._cursor.execute(
+            place = await self._fetchone(
                 "SELECT * FROM places WHERE user_id = (?) AND name = (?)",
                 (user_id, name),
             )
-            place = await self._cursor.fetchone()
 
             return place
         except Exception as e:
             raise DBError(f"Failed to get place by name: {e}")
 
-    async def connect(self) -> None:
+    @tracked("db")
+    async def create_subscription(self, place_id: int, period: int, next_run_at: int) -> bool | None:
+        """
+        Subscribe a place to the weather push, an existing subscription gets the new period
+        """
+        try:
+            await self._execute_write(
+                "INSERT INTO subscriptions (place_id, period, next_run_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (place_id) DO UPDATE SET period = excluded.period, next_run_at = excluded.next_run_at",
+                (place_id, period, next_run_at),
+            )
+
+            return True
+        except Exception as e:
+            raise DBError(f"Failed to create subscription: {e}")
+
+    @tracked("db")
+    async def delete_subscription(self, place_id: int) -> bool | None:
         try:
-            self._connection = await aiosqlite.connect(os.path.join("database.db"))
+            await self._execute_write("DELETE FROM subscriptions WHERE place_id = (?)", (place_id,))
+
+            return True
+        except Exception as e:
+            raise DBError(f"Failed to delete subscription: {e}")
 
-            # Enable Foreign Key Support
-            await self._connection.execute("PRAGMA foreign_keys = ON;")
+    @tracked("db")
+    async def get_subscription(self, place_id: int) -> Row | None:
+        try:
+            subscription = await self._fetchone(
+                "SELECT * FROM subscriptions WHERE place_id = (?)", (place_id,)
+            )
 
-            self._cursor = await self._connection.cursor()
+            return subscription
+        except Exception as e:
+            raise DBError(f"Failed to get subscription: {e}")
+
+    @tracked("db")
+    async def get_due_subscriptions(self, now: int, limit: int = 1000) -> list | None:
+        """
+        Subscriptions with next_run_at <= now, oldest first, as
+        (id, period, next_run_at, place_id, name, lat, lon, user_id)
+        """
+        try:
+            subscriptions = await self._fetchall(
+                "SELECT subscriptions.id, subscriptions.period, subscriptions.next_run_at, "
+                "places.id, places.name, places.lat, places.lon, places.user_id "
+                "FROM subscriptions JOIN places ON places.id = subscriptions.place_id "
+                "WHERE subscriptions.next_run_at <= (?) "
+                "ORDER BY subscriptions.next_run_at LIMIT (?)",
+                (now, limit),
+            )
+
+            return subscriptions
+        except Exception as e:
+            raise DBError(f"Failed to get due subscriptions: {e}")
+
+    @tracked("db")
+    async def reschedule_subscriptions(self, schedule: list[tuple[int, int]]) -> bool | None:
+        """
+        Set next_run_at of many subscriptions, schedule is a list of (subscription_id, next_run_at)
+        """
+        try:
+            await self._execute_write_many(
+                "UPDATE subscriptions SET next_run_at = (?) WHERE id = (?)",
+                [(next_run_at, subscription_id) for subscription_id, next_run_at in schedule],
+            )
+
+            return True
+        except Exception as e:
+            raise DBError(f"Failed to reschedule subscriptions: {e}")
+
+    @tracked("db")
+    async def get_fsm_record(self, key: str, now: int) -> Row | None:
+        """
+        FSM (state, data, expires_at) of the storage key, if it has not expired
+        """
+        try:
+            record = await self._fetchone(
+                "SELECT state, data, expires_at FROM fsm_states WHERE key = (?) AND expires_at > (?)",
+                (key, now),
+            )
+
+            return record
+        except Exception as e:
+            raise DBError(f"Failed to get FSM record: {e}")
+
+    @tracked("db")
+    async def save_fsm_records(self, records: list[tuple[str, str | None, str | None, int]]) -> bool | None:
+        """
+        Save many (key, state, data, expires_at) FSM records in one transaction
+        """
+        try:
+            await self._execute_write_many(
+                "INSERT INTO fsm_states (key, state, data, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "state = excluded.state, data = excluded.data, expires_at = excluded.expires_at",
+                records,
+            )
+
+            return True
+        except Exception as e:
+            raise DBError(f"Failed to save FSM records: {e}")
+
+    @tracked("db")
+    async def delete_expired_fsm_records(self, now: int) -> bool | None:
+        try:
+            await self._execute_write("DELETE FROM fsm_states WHERE expires_at <= (?)", (now,))
+
+            return True
+        except Exception as e:
+            raise DBError(f"Failed to delete expired FSM records: {e}")
+
+    @tracked("db")
+    async def get_icon_file_id(self, url: str) -> Row | None:
+        try:
+            icon = await self._fetchone("SELECT file_id FROM icon_files WHERE url = (?)", (url,))
+
+            return icon
+        except Exception as e:
+            raise DBError(f"Failed to get icon file: {e}")
+
+    @tracked("db")
+    async def save_icon_file_id(self, url: str, file_id: str) -> bool | None:
+        try:
+            await self._execute_write(
+                "INSERT INTO icon_files (url, file_id) VALUES (?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET file_id = excluded.file_id",
+                (url, file_id),
+            )
+
+            return True
+        except Exception as e:
+            raise DBError(f"Failed to save icon file: {e}")
+
+    @tracked("db")
+    async def delete_icon_file_id(self, url: str) -> bool | None:
+        try:
+            await self._execute_write("DELETE FROM icon_files WHERE url = (?)", (url,))
+
+            return True
+        except Exception as e:
+            raise DBError(f"Failed to delete icon file: {e}")
+
+    async def _apply_profile(self, connection: aiosqlite.Connection) -> None:
+        if self._JOURNAL_MODE not in self._JOURNAL_MODES:
+            raise DBError(f"Unknown journal mode: {self._JOURNAL_MODE}")
+
+        if self._SYNCHRONOUS not in self._SYNCHRONOUS_LEVELS:
+            raise DBError(f"Unknown synchronous level: {self._SYNCHRONOUS}")
+
+        # PRAGMA does not accept parameters, values are validated above or are ints
+        await connection.execute(f"PRAGMA journal_mode = {self._JOURNAL_MODE}")
+        await connection.execute(f"PRAGMA synchronous = {self._SYNCHRONOUS}")
+        await connection.execute(f"PRAGMA mmap_size = {int(self._MMAP_SIZE)}")
+        await connection.execute(f"PRAGMA cache_size = {int(self._CACHE_SIZE)}")
+        await connection.execute(f"PRAGMA busy_timeout = {int(self._BUSY_TIMEOUT)}")
+
+        if self._CHECKPOINT_INTERVAL:
+            # Checkpoints are made by the maintenance task instead of the committing write
+            await connection.execute("PRAGMA wal_autocheckpoint = 0")
+
+        # Enable Foreign Key Support
+        await connection.execute("PRAGMA foreign_keys = ON;")
+
+    async def checkpoint(self, mode: str = "PASSIVE") -> tuple[int, int, int]:
+        """
+        Run a WAL checkpoint and return (busy, WAL pages, checkpointed pages)
+        """
+        mode = mode.upper()
+
+        if mode not in self._CHECKPOINT_MODES:
+            raise DBError(f"Unknown checkpoint mode: {mode}")
+
+        try:
+            with DB_CHECKPOINT_DURATION.time(mode=mode.lower()):
+                async with self._locked():
+                    async with self._connection.execute(f"PRAGMA wal_checkpoint({mode})") as cursor:
+                        busy, pages, checkpointed = await cursor.fetchone()
+        except Exception as e:
+            raise DBError(f"Failed to checkpoint DB: {e}")
+
+        if busy:
+            DB_CHECKPOINT_BUSY.inc(mode=mode.lower())
+
+        DB_WAL_PAGES.set(max(pages, 0))
+
+        return busy, pages, checkpointed
+
+    async def optimize(self) -> None:
+        try:
+            async with self._locked():
+                await self._connection.execute("PRAGMA optimize")
+        except Exception as e:
+            raise DBError(f"Failed to optimize DB: {e}")
+
+    async def _run_maintenance(self) -> None:
+        optimized_at = time.monotonic()
+
+        while True:
+            await asyncio.sleep(self._CHECKPOINT_INTERVAL)
+
+            try:
+                busy, pages, checkpointed = await self.checkpoint("PASSIVE")
+
+                # Readers kept the WAL from being reset for too long
+                if pages >= self._CHECKPOINT_TRUNCATE_PAGES:
+                    await self.checkpoint("TRUNCATE")
+
+                if time.monotonic() - optimized_at >= self._OPTIMIZE_INTERVAL:
+                    optimized_at = time.monotonic()
+
+                    await self.optimize()
+            except DBError as e:
+                logging.warning("DB maintenance failed: %s", e)
+
+    async def connect(self, path: str | None = None) -> None:
+        try:
+            path = path or self._DB_PATH
+
+            self._connection = await aiosqlite.connect(path)
+            await self._apply_profile(self._connection)
+
+            # In-memory databases can not be shared between connections and have no WAL
+            if self._JOURNAL_MODE == "WAL" and path != ":memory:" and "mode=memory" not in path:
+                self._read_connection = await aiosqlite.connect(path)
+                await self._apply_profile(self._read_connection)
+
+                if self._CHECKPOINT_INTERVAL:
+                    self._maintenance = asyncio.create_task(self._run_maintenance())
+
+            if self._group_commit:
+                self._closing = False
+                self._writer = asyncio.create_task(self._run_writer())
+                self._writer.add_done_callback(self._writer_done)
         except Exception as e:
             raise DBError(f"Failed to connect to database: {e}")
 
     async def close(self) -> None:
         try:
-            await self._cursor.close()
-            await self._connection.close()
+            if self._maintenance is not None:
+                self._maintenance.cancel()
+
+                try:
+                    await self._maintenance
+                except asyncio.CancelledError:
+                    pass
+
+                self._maintenance = None
+
+            if self._writer is not None:
+                # Commit pending writes first
+                self._closing = True
+                self._writes_ready.set()
+
+                # A stopped writer has already failed its callers
+                await asyncio.gather(self._writer, return_exceptions=True)
+
+                self._writer = None
+
+            if self._read_connection:
+                await self._read_connection.close()
+
+            self._read_connection = None
+
+            if self._connection:
+                # Update the query planner statistics, cheap when nothing changed
+                await self._connection.execute("PRAGMA optimize")
+                await self._connection.close()
+
+            self._connection = None
         except Exception as e:
             raise DBError(f"Failed to close database connection: {e}")
 
+    async def migrate(self, dry_run: bool = False) -> list[Migration]:
+        """
+        Apply pending schema migrations (or only list them with dry_run)
+        """
+        try:
+            return await MigrationService(self._connection).apply(dry_run=dry_run)
+        except Exception as e:
+            raise DBError(f"Failed to migrate DB: {e}")
+
     async def setup(self) -> bool | None:
         try:
-            await self._create_tables()
+            await self.migrate()
 
             return True
         except Exception as e:
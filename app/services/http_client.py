@@ -0,0 +1,55 @@
+import logging
+import os
+
+import httpx
+
+
+def create_http_client(
+        http2: bool | None = None,
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float | None = None,
+        timeout: float | None = None,
+        connect_timeout: float | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncClient:
+    """
+    This function creates the process-wide pooled HTTP client.
+    Arguments that are not passed are read from the HTTP_* environment variables, a timeout of 0 disables it.
+    A custom transport (e.g. httpx.MockTransport) replaces the network
+    """
+    if http2 is None:
+        http2 = bool(os.getenv("HTTP_HTTP2"))
+
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logging.warning("HTTP/2 requested, but the 'h2' package is not installed. Using HTTP/1.1")
+            http2 = False
+
+    # An explicit 0 is kept: no keep-alive connections, or no timeout
+    if max_connections is None:
+        max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+
+    if max_keepalive_connections is None:
+        max_keepalive_connections = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+
+    if keepalive_expiry is None:
+        keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+
+    if timeout is None:
+        timeout = float(os.getenv("HTTP_TIMEOUT", 10))
+
+    if connect_timeout is None:
+        connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+    timeout = httpx.Timeout(timeout or None, connect=connect_timeout or None)
+
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout, transport=transport)
@@ -0,0 +1,80 @@
+import logging
+from typing import Awaitable, Callable
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+
+from app.services.db import DBError, DBService
+
+
+# Errors of a file_id that Telegram no longer accepts
+_FILE_ERRORS = ("wrong file identifier", "wrong remote file", "file reference expired")
+
+
+class IconService:
+    """
+    Icon Service.
+    Weather icons are uploaded by Telegram from their URL once, then sent by the Telegram file_id
+    """
+
+    def __init__(self, db: DBService):
+        self._db = db
+
+        # Known file_id (or None) by icon URL, there are only a few dozen icons
+        self._file_ids: dict[str, str | None] = {}
+
+    async def get_file_id(self, url: str) -> str | None:
+        if url not in self._file_ids:
+            try:
+                icon = await self._db.get_icon_file_id(url=url)
+            except DBError as e:
+                logging.warning("Failed to get icon file: %s", e)
+
+                return None
+
+            self._file_ids[url] = icon[0] if icon else None
+
+        return self._file_ids[url]
+
+    async def remember(self, url: str, file_id: str) -> None:
+        self._file_ids[url] = file_id
+
+        try:
+            await self._db.save_icon_file_id(url=url, file_id=file_id)
+        except DBError as e:
+            logging.warning("Failed to save icon file: %s", e)
+
+    async def forget(self, url: str) -> None:
+        self._file_ids[url] = None
+
+        try:
+            await self._db.delete_icon_file_id(url=url)
+        except DBError as e:
+            logging.warning("Failed to delete icon file: %s", e)
+
+    async def send(self, send: Callable[[str], Awaitable[Message]], url: str) -> Message:
+        """
+        Send a photo of the icon with send(photo). The known file_id is tried first,
+        a rejected one is forgotten and the photo is sent by URL. Other errors are raised
+        """
+        file_id = await self.get_file_id(url)
+
+        if file_id:
+            try:
+                return await send(file_id)
+            except TelegramBadRequest as e:
+                # E.g. a caption that can not be parsed, sending by URL would fail the same way
+                if not any(error in e.message.lower() for error in _FILE_ERRORS):
+                    raise
+
+                logging.warning("Icon file %s was rejected: %s", file_id, e)
+
+                await self.forget(url)
+
+        message = await send(url)
+
+        # The largest size of the uploaded photo
+        if message.photo:
+            await self.remember(url, message.photo[-1].file_id)
+
+        return message
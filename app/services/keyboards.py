@@ -0,0 +1,104 @@
+import os
+import time
+from typing import Callable
+
+from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+import app.keyboards as kb
+from app.services.cache import TTLCache
+from app.services.db import DBService
+
+
+class KeyboardService:
+    """
+    Keyboard Service.
+    Places keyboards are built once per user and dropped when the user's places change.
+    Long lists of places are browsed page by page
+    """
+
+    _CACHE_TTL = float(os.getenv("KEYBOARD_CACHE_TTL", 3600))
+    _CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", 10000))
+    # Places in the reply keyboard and on a page of the browser
+    _PAGE_SIZE = int(os.getenv("PLACES_PAGE_SIZE", 20))
+
+    def __init__(
+            self,
+            db: DBService,
+            ttl: float | None = None,
+            maxsize: int | None = None,
+            page_size: int | None = None,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self._db = db
+        self._page_size = page_size or self._PAGE_SIZE
+
+        # Places keyboard and browser of the first page (or False without places) by user
+        self._places = TTLCache(
+            maxsize=maxsize or self._CACHE_SIZE,
+            ttl=self._CACHE_TTL if ttl is None else ttl,
+            clock=clock,
+        )
+
+    async def get_places(self, user_id: int) -> tuple[ReplyKeyboardMarkup, InlineKeyboardMarkup | None] | None:
+        """
+        Get the places keyboard of the user with the first page of places, and the browser of all places
+        if they do not fit on one page. None if the user has no places.
+        Raises DBError
+        """
+        markups = self._places.get(user_id)
+
+        if markups is None:
+            places = await self._db.get_user_places_page(user_id=user_id, limit=self._page_size + 1)
+
+            if places:
+                page = places[:self._page_size]
+                browser = kb.places_page(page, has_next=True) if len(places) > self._page_size else None
+
+                markups = (kb.places(places=page), browser)
+            else:
+                markups = False
+
+            self._places.set(user_id, markups)
+
+        return markups or None
+
+    async def get_places_page(
+            self,
+            user_id: int,
+            after: int | None = None,
+            before: int | None = None,
+            prefix: str | None = None,
+    ) -> InlineKeyboardMarkup | None:
+        """
+        Get the browser of the places after (or before) the place with that ID whose name starts with the prefix.
+        The first page if the place was deleted meanwhile, None if there are no such places.
+        Raises DBError
+        """
+        places = await self._db.get_user_places_page(
+            user_id=user_id, limit=self._page_size + 1, after=after, before=before, prefix=prefix
+        )
+
+        # One more place tells whether there is a next (or previous) page
+        more = len(places) > self._page_size
+
+        if before is not None:
+            places = places[-self._page_size:]
+            has_previous, has_next = more, True
+        else:
+            places = places[:self._page_size]
+            has_previous, has_next = after is not None, more
+
+        if not places:
+            # The place of the cursor (or the places around it) was deleted meanwhile
+            if after is not None or before is not None:
+                return await self.get_places_page(user_id=user_id, prefix=prefix)
+
+            return None
+
+        return kb.places_page(places, has_previous=has_previous, has_next=has_next)
+
+    def invalidate_places(self, user_id: int) -> None:
+        """
+        Drop the places keyboard of the user, called after a place is created, renamed or deleted
+        """
+        self._places.delete(user_id)
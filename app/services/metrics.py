@@ -0,0 +1,250 @@
+import functools
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator
+
+from aiohttp import web
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+
+    if extra:
+        labels.append(extra)
+
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Metric:
+    """
+    Base Metric with a fixed set of label names
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def _key(self, labels: dict[str, Any]) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labels: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+
+        self.buckets = tuple(sorted(buckets))
+
+        # Per label values: count in every bucket (+Inf is the last one), sum, count
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        data = self._values.get(key)
+
+        if data is None:
+            data = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+        data[0][bisect_left(self.buckets, value)] += 1
+        data[1] += value
+        data[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels: Any) -> int:
+        data = self._values.get(self._key(labels))
+
+        return data[2] if data else 0
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, f'le="{bound}"')
+
+                yield f"{self.name}_bucket{labels} {cumulative}"
+
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {count}"
+
+
+class MetricsRegistry:
+    """
+    Registry of process metrics rendered in the Prometheus text format
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def _get_or_create(self, metric_class: type, name: str, *args: Any, **kwargs: Any) -> Any:
+        metric = self._metrics.get(name)
+
+        if metric is None:
+            metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+        elif type(metric) is not metric_class:
+            raise ValueError(f"Metric {name} is already registered as {metric.type}")
+
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labels)
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            labels: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labels, buckets)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+UPDATE_DURATION = REGISTRY.histogram(
+    "bot_update_duration_seconds", "Time to process an update", ("type",)
+)
+HANDLER_DURATION = REGISTRY.histogram(
+    "bot_handler_duration_seconds", "Time spent in a handler", ("handler",)
+)
+MIDDLEWARE_DURATION = REGISTRY.histogram(
+    "bot_middleware_duration_seconds", "Time spent in a middleware, without the wrapped handler", ("middleware",)
+)
+EXTERNAL_CALL_DURATION = REGISTRY.histogram(
+    "bot_external_call_duration_seconds",
+    "Time of calls to the database, OpenWeatherMap and Telegram",
+    ("service", "method", "status"),
+)
+
+
+@contextmanager
+def track_call(service: str, method: str) -> Iterator[None]:
+    """
+    Measure an external call, failed calls get status "error"
+    """
+    start = time.perf_counter()
+    status = "error"
+
+    try:
+        yield
+
+        status = "ok"
+    finally:
+        EXTERNAL_CALL_DURATION.observe(
+            time.perf_counter() - start, service=service, method=method, status=status
+        )
+
+
+def tracked(service: str) -> Callable:
+    """
+    Decorator that measures every call of an async method as an external call
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with track_call(service, func.__name__):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def start_metrics_server(
+        host: str, port: int, registry: MetricsRegistry = REGISTRY
+) -> web.AppRunner:
+    """
+    Serve metrics on http://host:port/metrics. The returned runner must be cleaned up on shutdown
+    """
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+
+    return runner
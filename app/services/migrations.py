@@ -0,0 +1,191 @@
+from typing import NamedTuple
+
+import aiosqlite
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: tuple[str, ...]
+
+
+def _updated_at_trigger(table_name: str) -> str:
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS update_{table_name}_updated_at "
+        f"BEFORE UPDATE ON {table_name} "
+        "FOR EACH ROW "
+        "BEGIN "
+        f"UPDATE {table_name} SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id; "
+        "END"
+    )
+
+
+# Ordered list of schema migrations. Never edit an applied migration, add a new one instead
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        version=1,
+        name="create users and places",
+        statements=(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "id INTEGER PRIMARY KEY,"
+            "phone TEXT,"
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
+            "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+            ")",
+            _updated_at_trigger("users"),
+            "CREATE TABLE IF NOT EXISTS places ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            "name TEXT NOT NULL,"
+            "lat REAL NOT NULL,"
+            "lon REAL NOT NULL,"
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
+            "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
+            "user_id INTEGER,"
+            "UNIQUE (name, user_id),"
+            "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+            ")",
+            _updated_at_trigger("places"),
+        ),
+    ),
+    Migration(
+        version=2,
+        name="index places lookups",
+        statements=(
+            # get_user_places, get_place_by_name and ON DELETE CASCADE from users
+            "CREATE INDEX IF NOT EXISTS idx_places_user_id_name ON places (user_id, name)",
+            # get_place_by_coordinates
+            "CREATE INDEX IF NOT EXISTS idx_places_user_id_lat_lon ON places (user_id, lat, lon)",
+        ),
+    ),
+    Migration(
+        version=3,
+        name="create subscriptions",
+        statements=(
+            # One subscription per place, period and next run are in seconds (unix time)
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            "place_id INTEGER NOT NULL UNIQUE,"
+            "period INTEGER NOT NULL,"
+            "next_run_at INTEGER NOT NULL,"
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
+            "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
+            "FOREIGN KEY (place_id) REFERENCES places (id) ON DELETE CASCADE"
+            ")",
+            _updated_at_trigger("subscriptions"),
+            # get_due_subscriptions
+            "CREATE INDEX IF NOT EXISTS idx_subscriptions_next_run_at ON subscriptions (next_run_at)",
+        ),
+    ),
+    Migration(
+        version=4,
+        name="create fsm states",
+        statements=(
+            # FSM state and compact JSON data by storage key, expires_at is unix time
+            "CREATE TABLE IF NOT EXISTS fsm_states ("
+            "key TEXT PRIMARY KEY,"
+            "state TEXT,"
+            "data TEXT,"
+            "expires_at INTEGER NOT NULL"
+            ") WITHOUT ROWID",
+            # delete_expired_fsm_records
+            "CREATE INDEX IF NOT EXISTS idx_fsm_states_expires_at ON fsm_states (expires_at)",
+        ),
+    ),
+    Migration(
+        version=5,
+        name="create icon files",
+        statements=(
+            # Telegram file_id of an uploaded weather icon by its URL
+            "CREATE TABLE IF NOT EXISTS icon_files ("
+            "url TEXT PRIMARY KEY,"
+            "file_id TEXT NOT NULL,"
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+            ") WITHOUT ROWID",
+        ),
+    ),
+)
+
+
+class MigrationService:
+    """
+    Migration Service.
+    The applied schema version is stored in PRAGMA user_version
+    """
+
+    def __init__(
+            self,
+            connection: aiosqlite.Connection,
+            migrations: tuple[Migration, ...] = MIGRATIONS,
+    ):
+        versions = [migration.version for migration in migrations]
+
+        if versions != sorted(set(versions)):
+            raise MigrationError("Migration versions must be unique and ordered")
+
+        self._connection = connection
+        self._migrations = migrations
+
+    @property
+    def latest_version(self) -> int:
+        return self._migrations[-1].version if self._migrations else 0
+
+    async def get_version(self) -> int:
+        async with self._connection.execute("PRAGMA user_version") as cursor:
+            row = await cursor.fetchone()
+
+        return row[0]
+
+    async def get_pending(self) -> list[Migration]:
+        version = await self.get_version()
+
+        if version > self.latest_version:
+            raise MigrationError(
+                f"Database schema version {version} is newer than the latest known {self.latest_version}"
+            )
+
+        return [migration for migration in self._migrations if migration.version > version]
+
+    async def apply(self, dry_run: bool = False) -> list[Migration]:
+        """
+        Apply pending migrations, each one in its own transaction.
+        With dry_run only return the migrations that would be applied
+        """
+        pending = await self.get_pending()
+
+        if dry_run:
+            return pending
+
+        applied = []
+
+        for migration in pending:
+            try:
+                # Take the write lock first, another process may be migrating the same database
+                await self._connection.execute("BEGIN IMMEDIATE")
+
+                if await self.get_version() >= migration.version:
+                    await self._connection.commit()
+
+                    continue
+
+                for statement in migration.statements:
+                    await self._connection.execute(statement)
+
+                # PRAGMA does not accept parameters, version is always an int
+                await self._connection.execute(f"PRAGMA user_version = {int(migration.version)}")
+
+                await self._connection.commit()
+
+                applied.append(migration)
+            except Exception as e:
+                await self._connection.rollback()
+
+                raise MigrationError(
+                    f"Failed to apply migration {migration.version} ({migration.name}): {e}"
+                )
+
+        return applied
+
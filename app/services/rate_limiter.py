@@ -0,0 +1,189 @@
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+from typing import Callable
+
+from app.services.metrics import REGISTRY
+
+RATE_LIMITER_QUEUE_DEPTH = REGISTRY.gauge(
+    "bot_rate_limiter_queue_depth", "Requests waiting for a rate limiter token", ("limiter", "priority")
+)
+RATE_LIMITER_WAIT_DURATION = REGISTRY.histogram(
+    "bot_rate_limiter_wait_seconds", "Time a request waited for a rate limiter token", ("limiter", "priority")
+)
+RATE_LIMITER_REJECTED = REGISTRY.counter(
+    "bot_rate_limiter_rejected_total",
+    "Requests rejected by a rate limiter (full queue or wait timeout)",
+    ("limiter", "priority"),
+)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class Priority(IntEnum):
+    # Lower value is served first
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket with a bounded wait queue. Waiting requests get tokens by priority, then in arrival order.
+    When the queue is full, a request takes the place of the last waiting one of a lower priority, if any.
+    A rate of 0 disables the limiter
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            burst: int = 1,
+            max_waiters: int = 100,
+            timeout: float | None = None,
+            name: str = "default",
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        # Tokens per second
+        self.rate = rate
+        self.burst = burst
+        self.max_waiters = max_waiters
+        self.timeout = timeout
+        self.name = name
+
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated_at = clock()
+        self._paused_until = 0.0
+
+        # Heap of (priority, arrival, future)
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._waiting = 0
+        self._arrivals = itertools.count()
+        self._wakeup: asyncio.Handle | None = None
+
+    def __len__(self) -> int:
+        return self._waiting
+
+    @property
+    def is_idle(self) -> bool:
+        """
+        Nobody is waiting and the bucket is full, so the limiter can be dropped and created again later
+        """
+        now = self._clock()
+
+        self._refill(now)
+
+        return not self._waiting and self._tokens >= self.burst and now >= self._paused_until
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _try_take(self) -> bool:
+        now = self._clock()
+
+        self._refill(now)
+
+        if now < self._paused_until or self._tokens < 1:
+            return False
+
+        self._tokens -= 1
+
+        return True
+
+    def _get_delay(self) -> float:
+        now = self._clock()
+
+        return max(self._paused_until - now, (1 - self._tokens) / self.rate, 0)
+
+    def _drain(self) -> None:
+        self._wakeup = None
+
+        while self._waiters:
+            future = self._waiters[0][2]
+
+            # Timed out or cancelled
+            if future.done():
+                heapq.heappop(self._waiters)
+
+                continue
+
+            if not self._try_take():
+                break
+
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+        if self._waiters:
+            self._wakeup = asyncio.get_running_loop().call_later(self._get_delay(), self._drain)
+
+    def _evict(self, priority: Priority) -> bool:
+        """
+        Reject the last waiting request of a lower priority than the new one, so background requests
+        never keep interactive ones out of a full queue
+        """
+        waiters = [waiter for waiter in self._waiters if waiter[0] > priority and not waiter[2].done()]
+
+        if not waiters:
+            return False
+
+        waiter = max(waiters, key=lambda item: (item[0], item[1]))
+
+        self._waiters.remove(waiter)
+        heapq.heapify(self._waiters)
+
+        RATE_LIMITER_REJECTED.inc(limiter=self.name, priority=Priority(waiter[0]).name.lower())
+        waiter[2].set_exception(RateLimitError(f"Rate limiter {self.name} queue is full"))
+
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop giving tokens for some time, e.g. after a 429 response with Retry-After
+        """
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+        self._tokens = 0
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE) -> None:
+        """
+        Wait for a token. Raises RateLimitError if the queue is full or the wait is too long
+        """
+        if self.rate <= 0:
+            return
+
+        labels = {"limiter": self.name, "priority": priority.name.lower()}
+
+        # Fast path: nobody is waiting and a token is available
+        if not self._waiters and self._try_take():
+            RATE_LIMITER_WAIT_DURATION.observe(0, **labels)
+
+            return
+
+        if self._waiting >= self.max_waiters and not self._evict(priority):
+            RATE_LIMITER_REJECTED.inc(**labels)
+
+            raise RateLimitError(f"Rate limiter {self.name} queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), future))
+
+        if self._wakeup is None:
+            self._wakeup = asyncio.get_running_loop().call_soon(self._drain)
+
+        self._waiting += 1
+        RATE_LIMITER_QUEUE_DEPTH.inc(**labels)
+        start = self._clock()
+
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            RATE_LIMITER_REJECTED.inc(**labels)
+
+            raise RateLimitError(f"Rate limiter {self.name} wait exceeded {self.timeout} s")
+        finally:
+            self._waiting -= 1
+            RATE_LIMITER_QUEUE_DEPTH.dec(**labels)
+            RATE_LIMITER_WAIT_DURATION.observe(self._clock() - start, **labels)
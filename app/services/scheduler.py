@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+import app.keyboards as kb
+from app.services.db import DBError, DBService
+from app.services.icons import IconService
+from app.services.metrics import REGISTRY
+from app.services.rate_limiter import Priority
+from app.services.send_queue import send_priority
+from app.services.weather import WeatherService
+
+# Subscription periods in seconds by name
+SUBSCRIPTION_PERIODS = {
+    "hourly": 60 * 60,
+    "daily": 24 * 60 * 60,
+}
+
+SUBSCRIPTION_PUSHES = REGISTRY.counter(
+    "bot_subscription_pushes_total", "Scheduled weather pushes", ("status",)
+)
+
+
+def get_next_run_at(next_run_at: int, period: int, now: int) -> int:
+    """
+    First run after now on the subscription grid, missed runs are skipped
+    """
+    return next_run_at + period * ((now - next_run_at) // period + 1)
+
+
+class SubscriptionScheduler:
+    """
+    Subscription Scheduler.
+    At every tick due subscriptions are grouped by location cell, the weather of every cell
+    is fetched once and then pushed to all subscribers of the cell
+    """
+
+    _INTERVAL = float(os.getenv("SCHEDULER_INTERVAL", 60))
+    _BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", 1000))
+    _SEND_CONCURRENCY = int(os.getenv("SCHEDULER_SEND_CONCURRENCY", 20))
+
+    def __init__(
+            self,
+            db: DBService,
+            weather_service: WeatherService,
+            icon_service: IconService | None = None,
+            interval: float | None = None,
+            clock: Callable[[], float] = time.time,
+    ):
+        self._db = db
+        self._weather_service = weather_service
+        self._icon_service = icon_service or IconService(db)
+        self._interval = interval or self._INTERVAL
+        self._clock = clock
+
+        self._task: asyncio.Task | None = None
+
+    async def _push(self, bot: Bot, semaphore: asyncio.Semaphore, subscription: tuple, weather: dict) -> None:
+        _, _, _, place_id, name, lat, lon, user_id = subscription
+
+        async with semaphore:
+            try:
+                await self._icon_service.send(
+                    lambda photo: bot.send_photo(
+                        chat_id=user_id,
+                        photo=photo,
+                        caption=weather["text"] + "\n\n" + f"*{name}*",
+                        parse_mode="Markdown",
+                        reply_markup=kb.location(lat=lat, lon=lon, place_id=place_id),
+                    ),
+                    weather["photo"],
+                )
+
+                SUBSCRIPTION_PUSHES.inc(status="ok")
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # A bad request can be about the message, only a missing chat ends the subscription
+                if isinstance(e, TelegramBadRequest) and "chat not found" not in e.message.lower():
+                    SUBSCRIPTION_PUSHES.inc(status="error")
+
+                    logging.warning("Failed to push weather of place %s: %s", place_id, e)
+
+                    return
+
+                # The user blocked the bot or the chat is gone, the pushes would fail forever
+                SUBSCRIPTION_PUSHES.inc(status="unsubscribed")
+
+                logging.info("Chat of place %s is not available, deleting its subscription: %s", place_id, e)
+
+                try:
+                    await self._db.delete_subscription(place_id=place_id)
+                except DBError as db_error:
+                    logging.warning("Failed to delete subscription of place %s: %s", place_id, db_error)
+            except Exception as e:
+                SUBSCRIPTION_PUSHES.inc(status="error")
+
+                logging.warning("Failed to push weather of place %s: %s", place_id, e)
+
+    async def tick(self, bot: Bot) -> int:
+        """
+        Push the weather to all due subscriptions, return the number of pushes
+        """
+        now = int(self._clock())
+
+        subscriptions = await self._db.get_due_subscriptions(now=now, limit=self._BATCH_SIZE)
+
+        if not subscriptions:
+            return 0
+
+        # Due subscriptions by location cell
+        cells: dict[tuple[int, int], list] = {}
+
+        for subscription in subscriptions:
+            cell = self._weather_service.get_cell(subscription[5], subscription[6])
+            cells.setdefault(cell, []).append(subscription)
+
+        # One request per cell, served from the shared cache when possible.
+        # Pushes use the API quota left by interactive lookups and never push a stale reading
+        results = await self._weather_service.get_many_weather_data(
+            [(group[0][5], group[0][6]) for group in cells.values()],
+            priority=Priority.BACKGROUND,
+            allow_stale=False,
+        )
+
+        semaphore = asyncio.Semaphore(self._SEND_CONCURRENCY)
+        pushes = []
+        schedule = []
+
+        for group, result in zip(cells.values(), results):
+            try:
+                data, _ = result
+                weather = self._weather_service.parse_weather(data)
+            except Exception:
+                # Retried at the next tick
+                SUBSCRIPTION_PUSHES.inc(len(group), status="weather_error")
+
+                continue
+
+            for subscription in group:
+                subscription_id, period, next_run_at, *rest = subscription
+
+                pushes.append(self._push(bot, semaphore, subscription, weather))
+                schedule.append((subscription_id, get_next_run_at(next_run_at, period, now)))
+
+        # Reschedule first, so a slow push is not repeated by the next tick
+        if schedule:
+            await self._db.reschedule_subscriptions(schedule)
+
+        # Interactive replies are sent before the pushes
+        with send_priority(Priority.BACKGROUND):
+            await asyncio.gather(*pushes)
+
+        return len(pushes)
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            try:
+                await self.tick(bot)
+            except Exception as e:
+                logging.exception("Failed to push subscriptions: %s", e)
+
+            await asyncio.sleep(self._interval)
+
+    def start(self, bot: Bot) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+            self._task = None
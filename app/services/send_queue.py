@@ -0,0 +1,132 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Hashable, Iterator, TypeVar
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.services.metrics import REGISTRY
+from app.services.rate_limiter import Priority, TokenBucketLimiter
+from app.services.workers import workers_count
+
+SEND_QUEUE_WAIT = REGISTRY.histogram(
+    "bot_send_queue_wait_seconds", "Time a Telegram message waited in the send queue", ("priority",)
+)
+SEND_RETRIES = REGISTRY.counter(
+    "bot_send_retries_total", "Telegram messages sent again after a retry_after (flood control) error", ("priority",)
+)
+
+T = TypeVar("T")
+
+# Priority of the messages sent by the current task
+_send_priority: ContextVar[Priority] = ContextVar("send_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: Priority) -> Iterator[None]:
+    """
+    Send the messages of this block with the priority, e.g. background for broadcasts
+    """
+    token = _send_priority.set(priority)
+
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class SendQueue:
+    """
+    Send Queue of the outgoing Telegram messages.
+    Every message waits for a token of its chat, then for a global one; interactive replies are served
+    before background (broadcast) messages. A retry_after error pauses the chat and the message is sent again
+    """
+
+    # Telegram limits: about 30 messages per second in total and 1 per second in one chat (0 disables a limit).
+    # The global limit of the bot is shared by the worker processes
+    _RATE_LIMIT = float(os.getenv("TELEGRAM_RATE_LIMIT", 30))
+    _CHAT_RATE_LIMIT = float(os.getenv("TELEGRAM_CHAT_RATE_LIMIT", 1))
+    _CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 3))
+    _QUEUE_SIZE = int(os.getenv("TELEGRAM_SEND_QUEUE_SIZE", 10000))
+    _MAX_RETRIES = int(os.getenv("TELEGRAM_SEND_RETRIES", 3))
+    # Limiters of idle chats are dropped above this number of chats
+    _MAX_CHATS = 10000
+
+    def __init__(
+            self,
+            rate: float | None = None,
+            chat_rate: float | None = None,
+            chat_burst: int | None = None,
+            max_retries: int | None = None,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self._chat_rate = self._CHAT_RATE_LIMIT if chat_rate is None else chat_rate
+        self._chat_burst = chat_burst or self._CHAT_BURST
+        self._max_retries = self._MAX_RETRIES if max_retries is None else max_retries
+        self._clock = clock
+
+        rate = self._RATE_LIMIT / workers_count() if rate is None else rate
+
+        # Burst of one second of the global rate
+        self._limiter = TokenBucketLimiter(
+            rate=rate,
+            burst=max(int(rate), 1),
+            max_waiters=self._QUEUE_SIZE,
+            name="telegram",
+            clock=clock,
+        )
+
+        # Limiter by chat
+        self._chats: dict[Hashable, TokenBucketLimiter] = {}
+
+    @property
+    def limiter(self) -> TokenBucketLimiter:
+        return self._limiter
+
+    def _get_chat_limiter(self, chat_id: Hashable) -> TokenBucketLimiter:
+        limiter = self._chats.get(chat_id)
+
+        if limiter is None:
+            if len(self._chats) >= self._MAX_CHATS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.is_idle}
+
+            limiter = self._chats[chat_id] = TokenBucketLimiter(
+                rate=self._chat_rate,
+                burst=self._chat_burst,
+                max_waiters=self._QUEUE_SIZE,
+                name="telegram_chat",
+                clock=self._clock,
+            )
+
+        return limiter
+
+    async def send(self, chat_id: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Wait for the turn of the message, then make the call. Raises RateLimitError if the queue is full
+        """
+        priority = _send_priority.get()
+        chat_limiter = self._get_chat_limiter(chat_id)
+
+        retries = 0
+
+        while True:
+            start = self._clock()
+
+            # A busy chat does not hold a global token while it waits
+            await chat_limiter.acquire(priority)
+            await self._limiter.acquire(priority)
+
+            SEND_QUEUE_WAIT.observe(self._clock() - start, priority=priority.name.lower())
+
+            try:
+                return await call()
+            except TelegramRetryAfter as e:
+                if retries >= self._max_retries:
+                    raise
+
+                retries += 1
+                SEND_RETRIES.inc(priority=priority.name.lower())
+
+                # Flood control is per chat, the other chats keep sending
+                chat_limiter.pause(e.retry_after)
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one shared call
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() once for all concurrent callers with the same key.
+        Every caller gets the same result or the same exception
+        """
+        future = self._calls.get(key)
+
+        if future is None:
+            future = asyncio.ensure_future(fn())
+
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+
+        # Shield the shared call, so a cancelled caller does not cancel the other callers
+        return await asyncio.shield(future)
+
+    def _done(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+        # Mark the exception as retrieved even if every caller was cancelled
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,102 @@
+from app.services.cache import TTLCache
+
+
+# --- Pytest Test Cases for TTLCache ---
+
+def test_get_and_set_counts_hits_and_misses():
+    """
+    Test that stored values are returned and hits/misses are counted.
+    """
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    assert cache.get("key") is None
+
+    cache.set("key", "value")
+
+    assert cache.get("key") == "value"
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_entry_expires_after_ttl(fake_clock):
+    """
+    Test that an entry is not returned once its TTL has passed.
+    """
+    cache = TTLCache(maxsize=10, ttl=60, clock=fake_clock)
+
+    cache.set("key", "value")
+    cache.set("short", "value", ttl=5)
+
+    # 1. Before expiration
+    fake_clock.now = 4
+    assert cache.get("short") == "value"
+
+    # 2. Per-entry TTL has passed
+    fake_clock.now = 5
+    assert cache.get("short") is None
+    assert cache.get("key") == "value"
+
+    # 3. Default TTL has passed
+    fake_clock.now = 60
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    """
+    Test that the cache never grows above maxsize and evicts the least recently used entry.
+    """
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Touch "a" so "b" becomes the least recently used
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_delete_and_clear():
+    """
+    Test explicit invalidation of entries.
+    """
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.delete("a")
+    cache.delete("missing")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+
+    assert len(cache) == 0
+
+
+def test_expired_entry_is_kept_as_stale(fake_clock):
+    """
+    Test that an expired entry is a miss for get, but is returned by get_stale until stale_ttl passes.
+    """
+    cache = TTLCache(maxsize=10, ttl=60, clock=fake_clock, stale_ttl=100)
+
+    cache.set("key", "value")
+
+    fake_clock.now = 61
+
+    assert cache.get("key") is None
+    assert cache.get_stale("key") == "value"
+    assert len(cache) == 1
+
+    fake_clock.now = 161
+
+    assert cache.get_stale("key") is None
+    assert cache.get("key") is None
+    assert len(cache) == 0
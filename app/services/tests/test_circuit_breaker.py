@@ -0,0 +1,81 @@
+import pytest
+
+from app.services import CircuitBreaker, CircuitOpenError
+
+
+# --- Pytest Test Cases for CircuitBreaker ---
+
+def test_opens_after_failures_in_a_row(fake_clock):
+    """
+    Test that the circuit opens only after failure_threshold failures in a row.
+    """
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30, clock=fake_clock)
+
+    # 1. A success resets the failures
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # 2. Third failure in a row
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_open
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_allows_one_probe(fake_clock):
+    """
+    Test that after recovery_timeout one probe is allowed and its result closes or reopens the circuit.
+    """
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30, clock=fake_clock)
+    breaker.record_failure()
+
+    # 1. Half-open after the timeout, only one probe at a time
+    fake_clock.now = 30
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.is_open
+
+    breaker.before_call()
+
+    assert breaker.is_open
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # 2. Failed probe opens the circuit again
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # 3. Successful probe closes it
+    fake_clock.now = 60
+    breaker.before_call()
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_cancelled_probe_allows_another_probe(fake_clock):
+    """
+    Test that a cancelled probe neither opens nor closes the circuit and the next call can probe again.
+    """
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30, clock=fake_clock)
+    breaker.record_failure()
+    fake_clock.now = 30
+
+    breaker.before_call()
+    breaker.cancel_call()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.is_open
+
+    breaker.before_call()
@@ -1,3 +1,4 @@
+import asyncio
 from sqlite3 import Row
 
 import aiosqlite
@@ -9,35 +10,14 @@ from app.services.db import DBService, DBError
 
 # --- Fixture for In-Memory Database Service ---
 
-@pytest_asyncio.fixture
-async def db_service() -> DBService:
+@pytest.fixture
+def db_service(db_service: DBService) -> DBService:
     """
-    Fixture to set up an in-memory SQLite database, create tables,
-    and yield a connected DBService instance for testing.
+    Fixture to yield the shared in-memory DBService with rows accessible by column name (e.g., user['id']).
     """
-    # 1. Initialize DBService
-    db = DBService()
-
-    try:
-        # 2. Establish in-memory connection manually (bypassing the file path in connect())
-        db._connection = await aiosqlite.connect(":memory:")
-
-        # 3. Set the row factory
-        # This allows accessing columns by name (e.g., user['id'])
-        db._connection.row_factory = aiosqlite.Row
-
-        # 4. Enable Foreign Key Support
-        await db._connection.execute("PRAGMA foreign_keys = ON;")
-        db._cursor = await db._connection.cursor()
+    db_service._connection.row_factory = aiosqlite.Row
 
-        # 5. Setup tables
-        await db.setup()
-
-        yield db
-    finally:
-        # 4. Cleanup
-        if db._connection:
-            await db.close()
+    return db_service
 
 
 # --- Constants for Testing ---
@@ -252,6 +232,41 @@ async def test_get_place_by_name_success(db_service: DBService):
     assert place["lat"] == PLACE_1_LAT
 
 
+@pytest.mark.asyncio
+async def test_get_user_places_page(db_service: DBService):
+    """
+    Tests keyset pagination of the user's places by name.
+    1. Creates places in random name order, and a place of another user.
+    2. Asserts the pages after and before a cursor, and the prefix filter.
+    """
+    await db_service.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE)
+    await db_service.create_user(user_id=TEST_USER_ID + 1, phone="0987654321")
+
+    ids = {}
+
+    for name in ["Cafe", "Alps", "Beach", "Dacha", "Base"]:
+        ids[name] = await db_service.create_place(name=name, lat=1, lon=1, user_id=TEST_USER_ID)
+
+    await db_service.create_place(name="Airport", lat=1, lon=1, user_id=TEST_USER_ID + 1)
+
+    async def get_names(**kwargs) -> list[str]:
+        places = await db_service.get_user_places_page(user_id=TEST_USER_ID, **kwargs)
+
+        return [place["name"] for place in places]
+
+    assert await get_names(limit=2) == ["Alps", "Base"]
+    assert await get_names(limit=2, after=ids["Base"]) == ["Beach", "Cafe"]
+    assert await get_names(limit=2, before=ids["Cafe"]) == ["Base", "Beach"]
+    assert await get_names(limit=2, before=ids["Alps"]) == []
+    assert await get_names(limit=5, prefix="B") == ["Base", "Beach"]
+    assert await get_names(limit=5, after=ids["Base"], prefix="B") == ["Beach"]
+
+    # The last code point has no upper bound
+    await db_service.create_place(name="B\U0010ffff", lat=1, lon=1, user_id=TEST_USER_ID)
+
+    assert await get_names(limit=5, prefix="B\U0010ffff") == ["B\U0010ffff"]
+
+
 @pytest.mark.asyncio
 async def test_delete_user_cascades_delete_places(db_service: DBService):
     """
@@ -274,3 +289,335 @@ async def test_delete_user_cascades_delete_places(db_service: DBService):
     # 4. Verify places are gone
     places_after = await db_service.get_user_places(user_id=TEST_USER_ID)
     assert places_after == []
+
+
+# --- Pytest Test Cases for the shared connection ---
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_do_not_roll_back_each_other(db_service: DBService):
+    """
+    Tests that a failing write does not roll back a concurrent write on the shared connection.
+    """
+    await db_service.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE)
+    await db_service.create_place(
+        name=PLACE_1_NAME, lat=PLACE_1_LAT, lon=PLACE_1_LON, user_id=TEST_USER_ID
+    )
+
+    # 1. Run a valid write together with a duplicate one
+    results = await asyncio.gather(
+        db_service.create_place(
+            name=PLACE_2_NAME, lat=PLACE_2_LAT, lon=PLACE_2_LON, user_id=TEST_USER_ID
+        ),
+        db_service.create_place(
+            name=PLACE_1_NAME, lat=PLACE_1_LAT, lon=PLACE_1_LON, user_id=TEST_USER_ID
+        ),
+        return_exceptions=True,
+    )
+
+    # 2. Only the duplicate fails
+    assert isinstance(results[0], int)
+    assert isinstance(results[1], DBError)
+
+    places = await db_service.get_user_places(user_id=TEST_USER_ID)
+    assert {p["name"] for p in places} == {PLACE_1_NAME, PLACE_2_NAME}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_on_shared_connection(db_service: DBService):
+    """
+    Tests that concurrent reads on the shared connection do not mix up their results.
+    """
+    await db_service.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE)
+    await db_service.create_user(user_id=TEST_USER_ID + 1, phone="0000000000")
+
+    users = await asyncio.gather(
+        *[db_service.get_user(user_id=TEST_USER_ID + i % 2) for i in range(10)]
+    )
+
+    assert [user["id"] for user in users] == [TEST_USER_ID + i % 2 for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_close_is_idempotent():
+    """
+    Tests that closing the service twice does not raise.
+    """
+    db = DBService()
+    await db.connect(":memory:")
+
+    await db.close()
+    await db.close()
+
+
+# --- Pytest Test Cases for the users cache ---
+
+@pytest.mark.asyncio
+async def test_user_exists_is_cached(db_service: DBService, monkeypatch):
+    """
+    Tests that user_exists queries the database once for known and unknown users.
+    """
+    await db_service.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE)
+
+    # Start with an empty cache to count the queries
+    db_service._users_cache.clear()
+
+    calls = []
+    get_user = db_service.get_user
+
+    async def counting_get_user(user_id):
+        calls.append(user_id)
+        return await get_user(user_id)
+
+    monkeypatch.setattr(db_service, "get_user", counting_get_user)
+
+    # 1. Known user
+    assert await db_service.user_exists(TEST_USER_ID) is True
+    assert await db_service.user_exists(TEST_USER_ID) is True
+
+    # 2. Unknown user (negative caching)
+    assert await db_service.user_exists(99999) is False
+    assert await db_service.user_exists(99999) is False
+
+    assert calls == [TEST_USER_ID, 99999]
+
+
+@pytest.mark.asyncio
+async def test_user_exists_is_invalidated_by_create_and_delete(db_service: DBService):
+    """
+    Tests that create_user and delete_user update the cached answer.
+    """
+    # 1. Unknown user is cached as missing
+    assert await db_service.user_exists(TEST_USER_ID) is False
+
+    # 2. Registration is visible immediately
+    await db_service.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE)
+    assert await db_service.user_exists(TEST_USER_ID) is True
+
+    # 3. Deletion is visible immediately
+    await db_service.delete_user(user_id=TEST_USER_ID)
+    assert await db_service.user_exists(TEST_USER_ID) is False
+
+
+@pytest.mark.asyncio
+async def test_user_exists_lookup_does_not_overwrite_newer_change(db_service: DBService, monkeypatch):
+    """
+    Tests that a lookup started before create_user does not cache a stale "missing" answer.
+    """
+    get_user = db_service.get_user
+
+    async def get_user_with_concurrent_create(user_id):
+        user = await get_user(user_id)
+
+        # The user registers while the lookup is in flight
+        await db_service.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE)
+
+        return user
+
+    monkeypatch.setattr(db_service, "get_user", get_user_with_concurrent_create)
+
+    assert await db_service.user_exists(TEST_USER_ID) is False
+
+    monkeypatch.setattr(db_service, "get_user", get_user)
+
+    assert await db_service.user_exists(TEST_USER_ID) is True
+
+
+# --- Pytest Test Cases for group commit ---
+
+@pytest_asyncio.fixture
+async def group_db_service() -> DBService:
+    """
+    Fixture to yield a migrated in-memory DBService in the group commit mode.
+    """
+    db = DBService(group_commit=True)
+
+    try:
+        await db.connect(":memory:")
+        await db.setup()
+        await db.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE)
+
+        yield db
+    finally:
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_group_commit_applies_concurrent_writes_in_one_transaction(group_db_service: DBService):
+    """
+    Tests that concurrent writes are committed together, every caller gets its own row ID
+    and a failed write (duplicate name) is rolled back alone.
+    """
+    commit = group_db_service._connection.commit
+    commits = 0
+
+    async def counting_commit():
+        nonlocal commits
+        commits += 1
+        await commit()
+
+    group_db_service._connection.commit = counting_commit
+
+    # 1. Concurrent writes, the last one duplicates the first name
+    names = [f"Place {index}" for index in range(20)] + ["Place 0"]
+    results = await asyncio.gather(
+        *[group_db_service.create_place(name=name, lat=1.0, lon=2.0, user_id=TEST_USER_ID) for name in names],
+        return_exceptions=True,
+    )
+
+    # 2. Assertions
+    assert commits == 1
+    assert len(set(results[:20])) == 20
+    assert isinstance(results[20], DBError)
+    assert len(await group_db_service.get_user_places(user_id=TEST_USER_ID)) == 20
+
+
+@pytest.mark.asyncio
+async def test_group_commit_writes_are_committed_on_close(tmp_path):
+    """
+    Tests that pending writes are committed before the connection is closed.
+    """
+    path = str(tmp_path / "database.db")
+
+    db = DBService(group_commit=True)
+    await db.connect(path)
+    await db.setup()
+
+    # 1. Close while the write is waiting for the window
+    task = asyncio.create_task(db.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE))
+    await asyncio.sleep(0)
+
+    await db.close()
+
+    assert await task == TEST_USER_ID
+
+    # 2. The write is in the database
+    db = DBService()
+    await db.connect(path)
+
+    try:
+        assert await db.get_user(user_id=TEST_USER_ID) is not None
+    finally:
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_group_commit_writer_survives_failed_rollback(group_db_service: DBService):
+    """
+    Tests that a batch whose commit and rollback fail is failed alone and the writer serves the next writes.
+    """
+    connection = group_db_service._connection
+    commit, rollback = connection.commit, connection.rollback
+
+    async def failing(*args):
+        raise RuntimeError("disk I/O error")
+
+    # 1. Commit and rollback of the first batch fail
+    connection.commit, connection.rollback = failing, failing
+
+    with pytest.raises(DBError):
+        await group_db_service.create_place(name="Home", lat=1.0, lon=2.0, user_id=TEST_USER_ID)
+
+    connection.commit, connection.rollback = commit, rollback
+    await rollback()
+
+    # 2. The writer is alive
+    assert not group_db_service._writer.done()
+    assert await asyncio.wait_for(
+        group_db_service.create_place(name="Work", lat=1.0, lon=2.0, user_id=TEST_USER_ID), 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_group_commit_stopped_writer_fails_writes(group_db_service: DBService):
+    """
+    Tests that writes fail at once instead of waiting forever when the writer is stopped.
+    """
+    # 1. The writer stops with a write waiting for the window
+    task = asyncio.create_task(
+        group_db_service.create_place(name="Home", lat=1.0, lon=2.0, user_id=TEST_USER_ID)
+    )
+    await asyncio.sleep(0)
+
+    group_db_service._writer.cancel()
+
+    # 2. Pending and new writes fail
+    with pytest.raises(DBError):
+        await asyncio.wait_for(task, 1)
+
+    with pytest.raises(DBError):
+        await asyncio.wait_for(
+            group_db_service.create_place(name="Work", lat=1.0, lon=2.0, user_id=TEST_USER_ID), 1
+        )
+
+
+# --- Pytest Test Cases for the storage profile ---
+
+@pytest_asyncio.fixture
+async def file_db_service(tmp_path) -> DBService:
+    """
+    Fixture to yield a migrated DBService on a database file, with the default (WAL) profile.
+    """
+    db = DBService()
+
+    try:
+        await db.connect(str(tmp_path / "database.db"))
+        await db.setup()
+
+        yield db
+    finally:
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_profile_is_applied(file_db_service: DBService):
+    """
+    Tests that both connections get the WAL profile.
+    """
+    for connection in (file_db_service._connection, file_db_service._read_connection):
+        async with connection.execute("PRAGMA journal_mode") as cursor:
+            assert (await cursor.fetchone())[0] == "wal"
+
+        async with connection.execute("PRAGMA synchronous") as cursor:
+            # NORMAL
+            assert (await cursor.fetchone())[0] == 1
+
+        async with connection.execute("PRAGMA busy_timeout") as cursor:
+            assert (await cursor.fetchone())[0] == DBService._BUSY_TIMEOUT
+
+        async with connection.execute("PRAGMA foreign_keys") as cursor:
+            assert (await cursor.fetchone())[0] == 1
+
+
+@pytest.mark.asyncio
+async def test_reader_does_not_block_writer(file_db_service: DBService):
+    """
+    Tests that an open read transaction does not block writes, and checkpoints
+    reset the WAL once the reader is done.
+    """
+    reader = file_db_service._read_connection
+
+    # 1. Long read transaction
+    await reader.execute("BEGIN")
+    async with reader.execute("SELECT COUNT(*) FROM users") as cursor:
+        assert (await cursor.fetchone())[0] == 0
+
+    # 2. Write does not wait for the reader
+    await asyncio.wait_for(file_db_service.create_user(user_id=TEST_USER_ID, phone=TEST_USER_PHONE), 1)
+
+    # 3. The reader keeps its snapshot, new reads see the write
+    async with reader.execute("SELECT COUNT(*) FROM users") as cursor:
+        assert (await cursor.fetchone())[0] == 0
+
+    await reader.commit()
+
+    assert await file_db_service.user_exists(user_id=TEST_USER_ID) is True
+
+    # 4. WAL is reset by a truncating checkpoint
+    busy, pages, checkpointed = await file_db_service.checkpoint("PASSIVE")
+
+    assert pages > 0
+
+    assert await file_db_service.checkpoint("TRUNCATE") == (0, 0, 0)
+
+    with pytest.raises(DBError):
+        await file_db_service.checkpoint("UNKNOWN")
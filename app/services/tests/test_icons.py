@@ -0,0 +1,95 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendPhoto
+
+from app.services import IconService
+
+# --- Constants for Testing ---
+
+ICON_URL = "https://openweathermap.org/img/wn/01d@2x.png"
+FILE_ID = "AgACAgIAAxkBAAIBc2Z"
+
+
+def create_message(file_id: str) -> Mock:
+    """
+    Message with a photo in two sizes, the largest one last
+    """
+    return Mock(photo=[Mock(file_id="small"), Mock(file_id=file_id)])
+
+
+# --- Pytest Test Cases for IconService ---
+
+@pytest.mark.asyncio
+async def test_send_remembers_file_id(db_service):
+    """
+    Tests that the first send uploads the icon by URL and the next one reuses its file_id.
+    1. Sends the icon twice.
+    2. Asserts that the first send used the URL and the second the largest photo's file_id.
+    3. Asserts that the file_id is saved in the database.
+    """
+    icon_service = IconService(db_service)
+    send = AsyncMock(return_value=create_message(FILE_ID))
+
+    await icon_service.send(send, ICON_URL)
+    await icon_service.send(send, ICON_URL)
+
+    assert [call.args[0] for call in send.await_args_list] == [ICON_URL, FILE_ID]
+    assert await db_service.get_icon_file_id(url=ICON_URL) == (FILE_ID,)
+
+
+@pytest.mark.asyncio
+async def test_send_falls_back_to_url(db_service):
+    """
+    Tests that a file_id rejected by Telegram is forgotten and the icon is sent by URL.
+    1. Saves a file_id and makes Telegram reject it.
+    2. Asserts that the icon is sent by URL and the new file_id replaces the old one.
+    """
+    await db_service.save_icon_file_id(url=ICON_URL, file_id="expired")
+
+    icon_service = IconService(db_service)
+    error = TelegramBadRequest(method=SendPhoto(chat_id=1, photo="expired"), message="wrong file identifier")
+    send = AsyncMock(side_effect=[error, create_message(FILE_ID)])
+
+    await icon_service.send(send, ICON_URL)
+
+    assert [call.args[0] for call in send.await_args_list] == ["expired", ICON_URL]
+    assert await icon_service.get_file_id(ICON_URL) == FILE_ID
+    assert await db_service.get_icon_file_id(url=ICON_URL) == (FILE_ID,)
+
+
+@pytest.mark.asyncio
+async def test_other_bad_request_keeps_file_id(db_service):
+    """
+    Tests that an error not about the file (e.g. a broken Markdown caption) is raised and the file_id is kept.
+    """
+    await db_service.save_icon_file_id(url=ICON_URL, file_id=FILE_ID)
+
+    icon_service = IconService(db_service)
+    error = TelegramBadRequest(
+        method=SendPhoto(chat_id=1, photo=FILE_ID), message="Bad Request: can't parse entities"
+    )
+    send = AsyncMock(side_effect=error)
+
+    with pytest.raises(TelegramBadRequest):
+        await icon_service.send(send, ICON_URL)
+
+    send.assert_awaited_once_with(FILE_ID)
+    assert await icon_service.get_file_id(ICON_URL) == FILE_ID
+    assert await db_service.get_icon_file_id(url=ICON_URL) == (FILE_ID,)
+
+
+@pytest.mark.asyncio
+async def test_file_id_survives_restart(db_service):
+    """
+    Tests that a new IconService (e.g. after a restart) loads the file_id from the database.
+    1. Remembers a file_id with one instance.
+    2. Asserts that another instance sends the icon by that file_id.
+    """
+    await IconService(db_service).remember(ICON_URL, FILE_ID)
+
+    send = AsyncMock(return_value=create_message(FILE_ID))
+    await IconService(db_service).send(send, ICON_URL)
+
+    send.assert_awaited_once_with(FILE_ID)
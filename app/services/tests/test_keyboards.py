@@ -0,0 +1,218 @@
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+
+import app.keyboards as kb
+from app.keyboards import PlacesPageCallback
+from app.services import DBService, KeyboardService
+from app.texts import Buttons
+
+# --- Constants for Testing ---
+
+USER_ID = 1
+
+
+def get_texts(markup) -> list[str]:
+    return [button.text for row in markup.keyboard for button in row]
+
+
+def get_buttons(markup) -> list[str]:
+    return [button.text for row in markup.inline_keyboard for button in row]
+
+
+def get_cursor(markup, text: str) -> int:
+    """
+    Place ID of the navigation button with that text
+    """
+    button = next(button for row in markup.inline_keyboard for button in row if button.text == text)
+
+    return PlacesPageCallback.unpack(button.callback_data).place_id
+
+
+# --- Fixtures ---
+
+@pytest_asyncio.fixture
+async def db_service(db_service: DBService) -> DBService:
+    """
+    Fixture to yield the shared in-memory DBService with one user.
+    """
+    await db_service.create_user(user_id=USER_ID, phone="1")
+
+    return db_service
+
+
+# --- Pytest Test Cases for KeyboardService ---
+
+@pytest.mark.asyncio
+async def test_get_places_is_cached(db_service):
+    """
+    Tests that the places keyboard is built from the database once.
+    1. Gets the keyboard twice.
+    2. Asserts that the places were queried once and the same markup is returned.
+    """
+    await db_service.create_place(name="Home", lat=50.45, lon=30.52, user_id=USER_ID)
+    keyboard_service = KeyboardService(db_service)
+
+    with patch.object(db_service, "get_user_places_page", wraps=db_service.get_user_places_page) as get_page:
+        first = await keyboard_service.get_places(USER_ID)
+        second = await keyboard_service.get_places(USER_ID)
+
+    assert first is second
+    assert get_page.await_count == 1
+
+    markup, browser = first
+
+    assert get_texts(markup) == ["Home", Buttons.PLACES_WEATHER_ALL, Buttons.BACK_TO_MAIN_MENU]
+    assert browser is None
+
+
+@pytest.mark.asyncio
+async def test_get_places_without_places(db_service):
+    """
+    Tests that a user without places gets None, and that it is cached too.
+    """
+    keyboard_service = KeyboardService(db_service)
+
+    with patch.object(db_service, "get_user_places_page", wraps=db_service.get_user_places_page) as get_page:
+        assert await keyboard_service.get_places(USER_ID) is None
+        assert await keyboard_service.get_places(USER_ID) is None
+
+    assert get_page.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_places(db_service):
+    """
+    Tests that the keyboard is rebuilt after the user's places change.
+    1. Caches the keyboard, then adds a place and invalidates it.
+    2. Asserts that the new place is in the keyboard.
+    """
+    keyboard_service = KeyboardService(db_service)
+    await keyboard_service.get_places(USER_ID)
+
+    await db_service.create_place(name="Work", lat=50.45, lon=30.52, user_id=USER_ID)
+    keyboard_service.invalidate_places(USER_ID)
+
+    markup, browser = await keyboard_service.get_places(USER_ID)
+
+    assert get_texts(markup)[0] == "Work"
+
+
+@pytest.mark.asyncio
+async def test_get_places_expires(db_service):
+    """
+    Tests that the keyboard is rebuilt after its time to live.
+    """
+    now = [0.0]
+    keyboard_service = KeyboardService(db_service, ttl=10, clock=lambda: now[0])
+
+    first = await keyboard_service.get_places(USER_ID)
+    await db_service.create_place(name="Home", lat=50.45, lon=30.52, user_id=USER_ID)
+
+    now[0] = 11
+
+    assert first is None
+    assert await keyboard_service.get_places(USER_ID) is not None
+
+
+@pytest.mark.asyncio
+async def test_get_places_with_long_list(db_service):
+    """
+    Tests that only the first page of a long list is in the keyboard, with a browser of the rest.
+    """
+    for index in range(5):
+        await db_service.create_place(name=f"Place {index}", lat=50 + index, lon=30, user_id=USER_ID)
+
+    keyboard_service = KeyboardService(db_service, page_size=2)
+
+    markup, browser = await keyboard_service.get_places(USER_ID)
+
+    assert get_texts(markup) == ["Place 0", "Place 1", Buttons.PLACES_WEATHER_ALL, Buttons.BACK_TO_MAIN_MENU]
+    assert get_buttons(browser) == ["Place 0", "Place 1", Buttons.PLACES_NEXT]
+
+
+@pytest.mark.asyncio
+async def test_get_places_page_navigation(db_service):
+    """
+    Tests browsing the places forwards and backwards.
+    1. Creates five places and follows the next buttons to the last page.
+    2. Asserts the places and navigation buttons of every page.
+    3. Goes back from the last page and asserts that the previous page is the same.
+    """
+    for index in range(5):
+        await db_service.create_place(name=f"Place {index}", lat=50 + index, lon=30, user_id=USER_ID)
+
+    keyboard_service = KeyboardService(db_service, page_size=2)
+
+    first = await keyboard_service.get_places_page(USER_ID)
+    second = await keyboard_service.get_places_page(USER_ID, after=get_cursor(first, Buttons.PLACES_NEXT))
+    last = await keyboard_service.get_places_page(USER_ID, after=get_cursor(second, Buttons.PLACES_NEXT))
+
+    assert get_buttons(first) == ["Place 0", "Place 1", Buttons.PLACES_NEXT]
+    assert get_buttons(second) == ["Place 2", "Place 3", Buttons.PLACES_PREVIOUS, Buttons.PLACES_NEXT]
+    assert get_buttons(last) == ["Place 4", Buttons.PLACES_PREVIOUS]
+
+    previous = await keyboard_service.get_places_page(USER_ID, before=get_cursor(last, Buttons.PLACES_PREVIOUS))
+    assert get_buttons(previous) == get_buttons(second)
+
+    previous = await keyboard_service.get_places_page(USER_ID, before=get_cursor(second, Buttons.PLACES_PREVIOUS))
+    assert get_buttons(previous) == ["Place 0", "Place 1", Buttons.PLACES_NEXT]
+
+
+@pytest.mark.asyncio
+async def test_get_places_page_with_prefix(db_service):
+    """
+    Tests that the browser only shows the places whose name starts with the prefix.
+    """
+    for name in ["Home", "Hostel", "Work", "House"]:
+        await db_service.create_place(name=name, lat=50, lon=30, user_id=USER_ID)
+
+    keyboard_service = KeyboardService(db_service, page_size=2)
+
+    first = await keyboard_service.get_places_page(USER_ID, prefix="Ho")
+    second = await keyboard_service.get_places_page(
+        USER_ID, after=get_cursor(first, Buttons.PLACES_NEXT), prefix="Ho"
+    )
+
+    assert get_buttons(first) == ["Home", "Hostel", Buttons.PLACES_NEXT]
+    assert get_buttons(second) == ["House", Buttons.PLACES_PREVIOUS]
+    assert await keyboard_service.get_places_page(USER_ID, prefix="Park") is None
+
+
+@pytest.mark.asyncio
+async def test_get_places_page_after_deleted_place(db_service):
+    """
+    Tests that the first page is shown when the place of the cursor was deleted meanwhile.
+    1. Creates five places and deletes the place of the next button.
+    2. Asserts that the next and previous buttons lead to the first page.
+    3. Asserts that there is no page when all places are deleted.
+    """
+    ids = [
+        await db_service.create_place(name=f"Place {index}", lat=50 + index, lon=30, user_id=USER_ID)
+        for index in range(5)
+    ]
+
+    keyboard_service = KeyboardService(db_service, page_size=2)
+
+    first = await keyboard_service.get_places_page(USER_ID)
+    cursor = get_cursor(first, Buttons.PLACES_NEXT)
+    await db_service.delete_place(place_id=cursor)
+
+    expected = ["Place 0", "Place 2", Buttons.PLACES_NEXT]
+
+    assert get_buttons(await keyboard_service.get_places_page(USER_ID, after=cursor)) == expected
+    assert get_buttons(await keyboard_service.get_places_page(USER_ID, before=cursor)) == expected
+
+    for place_id in ids:
+        await db_service.delete_place(place_id=place_id)
+
+    assert await keyboard_service.get_places_page(USER_ID, after=cursor) is None
+
+
+def test_location_keyboard_is_memoized():
+    """
+    Tests that location keyboards of the same place are built once.
+    """
+    assert kb.location(lat=50.45, lon=30.52, place_id=1) is kb.location(lat=50.45, lon=30.52, place_id=1)
+    assert kb.location(lat=50.45, lon=30.52, place_id=1) is not kb.location(lat=50.45, lon=30.52, place_id=2)
@@ -0,0 +1,80 @@
+import pytest
+
+from app.services.metrics import MetricsRegistry, tracked, EXTERNAL_CALL_DURATION
+
+
+# --- Pytest Test Cases for the metrics registry ---
+
+def test_histogram_render_prometheus_format():
+    """
+    Tests that a histogram is rendered with cumulative buckets, sum and count.
+    """
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test latency", ("handler",), buckets=(0.1, 1))
+
+    histogram.observe(0.05, handler="start")
+    histogram.observe(0.1, handler="start")
+    histogram.observe(5, handler="start")
+
+    text = registry.render()
+
+    assert "# HELP test_seconds Test latency" in text
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{handler="start",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{handler="start",le="1"} 2' in text
+    assert 'test_seconds_bucket{handler="start",le="+Inf"} 3' in text
+    assert 'test_seconds_sum{handler="start"} 5.15' in text
+    assert 'test_seconds_count{handler="start"} 3' in text
+
+
+def test_counter_and_gauge_render():
+    """
+    Tests counters and gauges with escaped label values.
+    """
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "Test counter", ("name",))
+    gauge = registry.gauge("test_depth", "Test gauge")
+
+    counter.inc(name='say "hi"')
+    counter.inc(2, name='say "hi"')
+    gauge.set(5)
+    gauge.dec()
+
+    text = registry.render()
+
+    assert 'test_total{name="say \\"hi\\""} 3' in text
+    assert "test_depth 4" in text
+
+
+def test_registry_returns_existing_metric():
+    """
+    Tests that registering a metric twice returns the same object and a type conflict raises.
+    """
+    registry = MetricsRegistry()
+
+    first = registry.counter("test_total", "Test counter")
+
+    assert registry.counter("test_total", "Test counter") is first
+
+    with pytest.raises(ValueError):
+        registry.histogram("test_total", "Test histogram")
+
+
+@pytest.mark.asyncio
+async def test_tracked_records_status():
+    """
+    Tests that the tracked decorator records successful and failed calls.
+    """
+
+    @tracked("test")
+    async def test_call(fail: bool):
+        if fail:
+            raise ValueError("boom")
+
+    await test_call(False)
+
+    with pytest.raises(ValueError):
+        await test_call(True)
+
+    assert EXTERNAL_CALL_DURATION.get_count(service="test", method="test_call", status="ok") == 1
+    assert EXTERNAL_CALL_DURATION.get_count(service="test", method="test_call", status="error") == 1
@@ -0,0 +1,139 @@
+from unittest.mock import AsyncMock
+
+import aiosqlite
+import pytest
+import pytest_asyncio
+
+from app.services.migrations import MIGRATIONS, Migration, MigrationError, MigrationService
+
+
+# --- Fixture for In-Memory Database Connection ---
+
+@pytest_asyncio.fixture
+async def connection() -> aiosqlite.Connection:
+    """
+    Fixture to yield an empty in-memory SQLite connection.
+    """
+    conn = await aiosqlite.connect(":memory:")
+
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+async def get_tables(conn: aiosqlite.Connection) -> set[str]:
+    async with conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'") as cursor:
+        return {row[0] for row in await cursor.fetchall()}
+
+
+# --- Pytest Test Cases for MigrationService ---
+
+@pytest.mark.asyncio
+async def test_apply_all_migrations_on_empty_database(connection):
+    """
+    Tests that all migrations are applied in order and the schema version is stored.
+    """
+    service = MigrationService(connection)
+
+    applied = await service.apply()
+
+    assert [m.version for m in applied] == [m.version for m in MIGRATIONS]
+    assert await service.get_version() == MIGRATIONS[-1].version
+    assert {"users", "places"} <= await get_tables(connection)
+
+
+@pytest.mark.asyncio
+async def test_apply_is_noop_when_up_to_date(connection):
+    """
+    Tests that a second run applies nothing.
+    """
+    service = MigrationService(connection)
+
+    await service.apply()
+
+    assert await service.apply() == []
+    assert await service.get_pending() == []
+
+
+@pytest.mark.asyncio
+async def test_dry_run_does_not_change_database(connection):
+    """
+    Tests that dry run only lists pending migrations.
+    """
+    service = MigrationService(connection)
+
+    pending = await service.apply(dry_run=True)
+
+    assert pending == list(MIGRATIONS)
+    assert await service.get_version() == 0
+    assert "users" not in await get_tables(connection)
+
+
+@pytest.mark.asyncio
+async def test_failed_migration_is_rolled_back(connection):
+    """
+    Tests that a failing migration leaves neither its tables nor its version behind.
+    """
+    migrations = (
+        Migration(1, "first", ("CREATE TABLE first (id INTEGER)",)),
+        Migration(2, "broken", ("CREATE TABLE second (id INTEGER)", "NOT A STATEMENT")),
+    )
+    service = MigrationService(connection, migrations)
+
+    with pytest.raises(MigrationError) as excinfo:
+        await service.apply()
+
+    assert "Failed to apply migration 2 (broken)" in str(excinfo.value)
+    assert await service.get_version() == 1
+    assert await get_tables(connection) == {"first"}
+
+
+@pytest.mark.asyncio
+async def test_newer_database_version_raises(connection):
+    """
+    Tests that a database migrated by a newer release is not touched.
+    """
+    await connection.execute("PRAGMA user_version = 999")
+
+    with pytest.raises(MigrationError):
+        await MigrationService(connection).apply()
+
+
+def test_unordered_migrations_raise():
+    """
+    Tests that migrations with duplicated or unordered versions are rejected.
+    """
+    migrations = (
+        Migration(2, "second", ()),
+        Migration(1, "first", ()),
+    )
+
+    with pytest.raises(MigrationError):
+        MigrationService(None, migrations)
+
+
+@pytest.mark.asyncio
+async def test_migrations_applied_by_another_connection_are_skipped(tmp_path):
+    """
+    Tests that a migration applied by another process in the meantime is not applied twice.
+    """
+    path = str(tmp_path / "database.db")
+    migrations = (
+        Migration(1, "first", ("CREATE TABLE first (id INTEGER)",)),
+        Migration(2, "add column", ("ALTER TABLE first ADD COLUMN name TEXT",)),
+    )
+
+    async with aiosqlite.connect(path) as first, aiosqlite.connect(path) as second:
+        first_service = MigrationService(first, migrations)
+        second_service = MigrationService(second, migrations)
+
+        # 1. Both see pending migrations, the first one applies them
+        pending = await second_service.get_pending()
+        assert len(await first_service.apply()) == 2
+
+        # 2. The second one skips them instead of failing on the duplicate column
+        second_service.get_pending = AsyncMock(return_value=pending)
+
+        assert await second_service.apply() == []
+        assert await second_service.get_version() == 2
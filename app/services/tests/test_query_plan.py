@@ -0,0 +1,89 @@
+import inspect
+
+import pytest
+
+from app.services.db import DBService
+
+# --- Constants for Testing ---
+
+TEST_USER_ID = 123456
+TEST_USER_PHONE = "1234567890"
+TEST_PLACE_ID = 1
+
+# DBService methods that do not run queries
+LIFECYCLE_METHODS = {"connect", "close", "setup", "migrate", "checkpoint", "optimize"}
+
+# Every DBService query with its arguments, in the order they are called.
+# A new query method must be added here, otherwise test_all_queries_are_audited fails
+QUERIES = [
+    ("create_user", {"user_id": TEST_USER_ID, "phone": TEST_USER_PHONE}),
+    ("get_user", {"user_id": TEST_USER_ID}),
+    ("user_exists", {"user_id": TEST_USER_ID + 1}),
+    ("create_place", {"name": "Home", "lat": 40.7128, "lon": -74.006, "user_id": TEST_USER_ID}),
+    ("get_place", {"place_id": TEST_PLACE_ID}),
+    ("get_user_places", {"user_id": TEST_USER_ID}),
+    ("get_user_places_page", {"user_id": TEST_USER_ID, "limit": 10}),
+    ("get_user_places_page", {"user_id": TEST_USER_ID, "limit": 10, "after": TEST_PLACE_ID, "prefix": "Ho"}),
+    ("get_user_places_page", {"user_id": TEST_USER_ID, "limit": 10, "before": TEST_PLACE_ID}),
+    ("get_place_by_name", {"name": "Home", "user_id": TEST_USER_ID}),
+    ("get_place_by_coordinates", {"user_id": TEST_USER_ID, "lat": 40.7128, "lon": -74.006}),
+    ("update_place", {"name": "Work", "place_id": TEST_PLACE_ID}),
+    ("create_subscription", {"place_id": TEST_PLACE_ID, "period": 3600, "next_run_at": 0}),
+    ("get_subscription", {"place_id": TEST_PLACE_ID}),
+    ("get_due_subscriptions", {"now": 10}),
+    ("reschedule_subscriptions", {"schedule": [(1, 3600)]}),
+    ("delete_subscription", {"place_id": TEST_PLACE_ID}),
+    ("delete_place", {"place_id": TEST_PLACE_ID}),
+    ("delete_user", {"user_id": TEST_USER_ID}),
+    ("save_fsm_records", {"records": [("fsm:1:2:2:default", "PlaceCreate:name", "{}", 100)]}),
+    ("get_fsm_record", {"key": "fsm:1:2:2:default", "now": 10}),
+    ("delete_expired_fsm_records", {"now": 10}),
+    ("save_icon_file_id", {"url": "https://openweathermap.org/img/wn/01d@2x.png", "file_id": "file"}),
+    ("get_icon_file_id", {"url": "https://openweathermap.org/img/wn/01d@2x.png"}),
+    ("delete_icon_file_id", {"url": "https://openweathermap.org/img/wn/01d@2x.png"}),
+]
+
+
+def test_all_queries_are_audited():
+    """
+    Tests that every public DBService query method is listed in QUERIES.
+    """
+    methods = {
+        name for name, member in inspect.getmembers(DBService, inspect.iscoroutinefunction)
+        if not name.startswith("_")
+    }
+
+    assert methods - LIFECYCLE_METHODS == {name for name, _ in QUERIES}
+
+
+@pytest.mark.asyncio
+async def test_queries_do_not_scan_tables(db_service: DBService):
+    """
+    Tests that no DBService query does a full table scan.
+    Every executed statement is captured and checked with EXPLAIN QUERY PLAN.
+    """
+    statements = []
+
+    # 1. Capture the SQL of every query (bound parameters are expanded)
+    await db_service._connection.set_trace_callback(statements.append)
+
+    for name, kwargs in QUERIES:
+        await getattr(db_service, name)(**kwargs)
+
+    await db_service._connection.set_trace_callback(None)
+
+    # 2. Check the plan of every read and write with a WHERE clause
+    audited = [
+        sql for sql in statements
+        if sql.split(" ", 1)[0].upper() in ("SELECT", "UPDATE", "DELETE")
+    ]
+
+    assert audited
+
+    for sql in audited:
+        async with db_service._connection.execute(f"EXPLAIN QUERY PLAN {sql}") as cursor:
+            plan = [row[3] for row in await cursor.fetchall()]
+
+        scans = [detail for detail in plan if detail.startswith("SCAN")]
+
+        assert not scans, f"Full table scan in {sql!r}: {plan}"
@@ -0,0 +1,170 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import (
+    Priority,
+    RateLimitError,
+    TokenBucketLimiter,
+    WeatherError,
+    WeatherService,
+    create_http_client,
+)
+from app.services.rate_limiter import RATE_LIMITER_QUEUE_DEPTH, RATE_LIMITER_REJECTED
+from benchmarks.weather_server import WeatherServer
+
+
+# --- Pytest Test Cases for TokenBucketLimiter ---
+
+@pytest.mark.asyncio
+async def test_burst_is_immediate_then_requests_are_paced():
+    """
+    Tests that burst tokens are given at once and the next token waits for the refill.
+    """
+    limiter = TokenBucketLimiter(rate=50, burst=3, name="test_burst")
+
+    # 1. Burst
+    start = time.monotonic()
+
+    for _ in range(3):
+        await limiter.acquire()
+
+    assert time.monotonic() - start < 0.01
+
+    # 2. Next token after about 1 / rate
+    await limiter.acquire()
+
+    assert time.monotonic() - start >= 0.015
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_are_served_first():
+    """
+    Tests that a waiting interactive request gets a token before earlier background ones.
+    """
+    limiter = TokenBucketLimiter(rate=100, burst=1, name="test_priority")
+    await limiter.acquire()
+
+    order = []
+
+    async def acquire(name: str, priority: Priority) -> None:
+        await limiter.acquire(priority)
+        order.append(name)
+
+    # 1. Background requests arrive first
+    tasks = [asyncio.create_task(acquire(f"background {i}", Priority.BACKGROUND)) for i in range(2)]
+    await asyncio.sleep(0)
+
+    tasks.append(asyncio.create_task(acquire("interactive", Priority.INTERACTIVE)))
+
+    await asyncio.gather(*tasks)
+
+    # 2. Assertions
+    assert order == ["interactive", "background 0", "background 1"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_timeout_are_rejected():
+    """
+    Tests that requests over the queue size and requests waiting too long are rejected.
+    """
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_waiters=1, timeout=0.05, name="test_reject")
+    await limiter.acquire()
+
+    # 1. The only waiter times out, the second one does not fit in the queue
+    waiter = asyncio.create_task(limiter.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+
+    with pytest.raises(RateLimitError, match="queue is full"):
+        await limiter.acquire(Priority.BACKGROUND)
+
+    with pytest.raises(RateLimitError, match="wait exceeded"):
+        await waiter
+
+    # 2. Metrics
+    assert len(limiter) == 0
+    assert RATE_LIMITER_QUEUE_DEPTH.get(limiter="test_reject", priority="background") == 0
+    assert RATE_LIMITER_REJECTED.get(limiter="test_reject", priority="background") == 2
+
+
+@pytest.mark.asyncio
+async def test_full_background_queue_admits_interactive_request():
+    """
+    Tests that an interactive request takes the place of the last background waiter in a full queue.
+    """
+    limiter = TokenBucketLimiter(rate=20, burst=1, max_waiters=2, name="test_evict")
+    await limiter.acquire()
+
+    # 1. Background requests fill the queue
+    first = asyncio.create_task(limiter.acquire(Priority.BACKGROUND))
+    last = asyncio.create_task(limiter.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+
+    # 2. The interactive request is admitted and served first, the last background one is rejected
+    await limiter.acquire(Priority.INTERACTIVE)
+
+    assert not first.done()
+
+    with pytest.raises(RateLimitError, match="queue is full"):
+        await last
+
+    await first
+
+    assert len(limiter) == 0
+    assert RATE_LIMITER_REJECTED.get(limiter="test_evict", priority="background") == 1
+    assert RATE_LIMITER_REJECTED.get(limiter="test_evict", priority="interactive") == 0
+
+    # 3. A request of the same priority still does not fit
+    first = asyncio.create_task(limiter.acquire(Priority.INTERACTIVE))
+    last = asyncio.create_task(limiter.acquire(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+
+    with pytest.raises(RateLimitError, match="queue is full"):
+        await limiter.acquire(Priority.INTERACTIVE)
+
+    await asyncio.gather(first, last)
+
+
+@pytest.mark.asyncio
+async def test_pause_and_disabled_limiter():
+    """
+    Tests that pause holds tokens back and a zero rate disables the limiter.
+    """
+    limiter = TokenBucketLimiter(rate=1000, burst=10, name="test_pause")
+    limiter.pause(0.05)
+
+    start = time.monotonic()
+    await limiter.acquire()
+
+    assert time.monotonic() - start >= 0.04
+
+    unlimited = TokenBucketLimiter(rate=0, name="test_unlimited")
+
+    for _ in range(100):
+        await unlimited.acquire()
+
+
+# --- Pytest Test Cases for the WeatherService quota ---
+
+@pytest.mark.asyncio
+async def test_weather_429_pauses_the_limiter():
+    """
+    Tests that a 429 response pauses the limiter for Retry-After seconds,
+    so the next lookup fails fast instead of hitting the API.
+    """
+    limiter = TokenBucketLimiter(rate=100, burst=10, timeout=0.05, name="test_weather")
+
+    async with WeatherServer(rate_limit_rate=1, retry_after=5) as server:
+        async with create_http_client() as client:
+            weather_service = WeatherService(client=client, api_url=server.url, limiter=limiter)
+
+            # 1. Quota exhausted
+            with pytest.raises(WeatherError, match="429"):
+                await weather_service._get_weather_by_coordinates(lat=50.45, lon=30.52)
+
+            # 2. Next lookup waits for the pause and is rejected
+            with pytest.raises(WeatherError, match="wait exceeded"):
+                await weather_service._get_weather_by_coordinates(lat=50.45, lon=30.52)
+
+    assert server.requests == 1
@@ -0,0 +1,142 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+import pytest_asyncio
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.methods import SendPhoto
+
+from app.services import DBService, SubscriptionScheduler, WeatherError, WeatherService
+from app.services.scheduler import SUBSCRIPTION_PERIODS, get_next_run_at
+
+# --- Constants for Testing ---
+
+NOW = 1_700_000_000
+HOUR = SUBSCRIPTION_PERIODS["hourly"]
+
+WEATHER_DATA = {
+    "weather": [{"description": "clear sky", "icon": "01d"}],
+    "main": {"temp": 21.5, "feels_like": 21.1, "pressure": 1016, "humidity": 48},
+    "wind": {"speed": 3.1},
+}
+
+
+# --- Fixtures ---
+
+@pytest_asyncio.fixture
+async def db_service(db_service: DBService) -> DBService:
+    """
+    Fixture to yield the shared in-memory DBService with three users.
+    The first two have places in one cell, the third one far away.
+    """
+    for user_id, (lat, lon) in enumerate([(50.4501, 30.5201), (50.4502, 30.5202), (49.84, 24.03)], 1):
+        await db_service.create_user(user_id=user_id, phone=str(user_id))
+        place_id = await db_service.create_place(name="Home", lat=lat, lon=lon, user_id=user_id)
+        await db_service.create_subscription(place_id=place_id, period=HOUR, next_run_at=NOW - 10)
+
+    return db_service
+
+
+@pytest.fixture
+def weather_service(monkeypatch) -> WeatherService:
+    weather_service = WeatherService()
+    monkeypatch.setattr(
+        weather_service, "_get_weather_by_coordinates", AsyncMock(return_value=WEATHER_DATA)
+    )
+
+    return weather_service
+
+
+# --- Pytest Test Cases for SubscriptionScheduler ---
+
+def test_get_next_run_at_skips_missed_runs():
+    """
+    Tests that the next run stays on the subscription grid and is after now.
+    """
+    assert get_next_run_at(next_run_at=100, period=60, now=100) == 160
+    assert get_next_run_at(next_run_at=100, period=60, now=159) == 160
+    assert get_next_run_at(next_run_at=100, period=60, now=400) == 460
+
+
+@pytest.mark.asyncio
+async def test_tick_fetches_every_cell_once(db_service: DBService, weather_service: WeatherService):
+    """
+    Tests that due subscriptions are grouped by cell, every cell is fetched once
+    and every subscriber gets a push.
+    """
+    bot = Mock(send_photo=AsyncMock())
+    scheduler = SubscriptionScheduler(db=db_service, weather_service=weather_service, clock=lambda: NOW)
+
+    # 1. Push due subscriptions
+    pushes = await scheduler.tick(bot)
+
+    # 2. Assertions
+    assert pushes == 3
+    assert weather_service._get_weather_by_coordinates.await_count == 2
+    assert sorted(call.kwargs["chat_id"] for call in bot.send_photo.await_args_list) == [1, 2, 3]
+
+    # 3. Subscriptions are rescheduled, the next tick pushes nothing
+    assert await scheduler.tick(bot) == 0
+    assert (await db_service.get_subscription(place_id=1))[3] == NOW - 10 + HOUR
+
+
+@pytest.mark.asyncio
+async def test_tick_retries_cells_without_weather(db_service: DBService, weather_service: WeatherService):
+    """
+    Tests that subscriptions of a cell without weather data stay due, and a failed push
+    does not stop the other pushes.
+    """
+    async def fetch(lat, lon):
+        if lat < 50:
+            raise WeatherError("HTTP error occurred: 500")
+
+        return WEATHER_DATA
+
+    weather_service._get_weather_by_coordinates.side_effect = fetch
+    bot = Mock(send_photo=AsyncMock(side_effect=[Exception("Forbidden"), None]))
+    scheduler = SubscriptionScheduler(db=db_service, weather_service=weather_service, clock=lambda: NOW)
+
+    # 1. Push due subscriptions
+    assert await scheduler.tick(bot) == 2
+    assert bot.send_photo.await_count == 2
+
+    # 2. Only the failed cell is still due
+    due = await db_service.get_due_subscriptions(now=NOW)
+
+    assert [subscription[7] for subscription in due] == [3]
+
+
+@pytest.mark.asyncio
+async def test_subscriptions_are_deleted_with_place(db_service: DBService):
+    """
+    Tests that deleting a place deletes its subscription.
+    """
+    await db_service.delete_place(place_id=1)
+
+    assert await db_service.get_subscription(place_id=1) is None
+    assert len(await db_service.get_due_subscriptions(now=NOW)) == 2
+
+
+@pytest.mark.asyncio
+async def test_subscription_is_deleted_when_chat_is_gone(db_service: DBService, weather_service: WeatherService):
+    """
+    Tests that the subscription is deleted when the user blocked the bot or the chat does not exist,
+    and kept after another error.
+    """
+    method = SendPhoto(chat_id=1, photo="photo")
+    errors = {
+        1: TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user"),
+        2: TelegramBadRequest(method=method, message="Bad Request: chat not found"),
+        3: TelegramBadRequest(method=method, message="Bad Request: can't parse entities"),
+    }
+
+    async def send_photo(chat_id, **kwargs):
+        raise errors[chat_id]
+
+    bot = Mock(send_photo=AsyncMock(side_effect=send_photo))
+    scheduler = SubscriptionScheduler(db=db_service, weather_service=weather_service, clock=lambda: NOW)
+
+    assert await scheduler.tick(bot) == 3
+
+    assert await db_service.get_subscription(place_id=1) is None
+    assert await db_service.get_subscription(place_id=2) is None
+    assert await db_service.get_subscription(place_id=3) is not None
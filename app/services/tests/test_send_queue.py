@@ -0,0 +1,112 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from app.services import Priority, SendQueue, send_priority
+from app.services.send_queue import SEND_RETRIES
+
+
+def create_retry_after(retry_after: int = 0) -> TelegramRetryAfter:
+    return TelegramRetryAfter(
+        method=SendMessage(chat_id=1, text="Weather"), message="Too Many Requests", retry_after=retry_after
+    )
+
+
+# --- Pytest Test Cases for SendQueue ---
+
+@pytest.mark.asyncio
+async def test_chat_limit_does_not_delay_other_chats():
+    """
+    Tests that messages to one chat are paced while other chats are served at once.
+    1. Sends two messages to one chat and one to another chat concurrently.
+    2. Asserts that only the second message of the first chat waited for the chat limit.
+    """
+    queue = SendQueue(rate=1000, chat_rate=20, chat_burst=1)
+    start = time.monotonic()
+    sent_at = {}
+
+    async def send(name: str, chat_id: int) -> None:
+        await queue.send(chat_id, AsyncMock())
+        sent_at[name] = time.monotonic() - start
+
+    await asyncio.gather(send("first", 1), send("second", 1), send("other chat", 2))
+
+    assert sent_at["first"] < 0.01
+    assert sent_at["other chat"] < 0.01
+    assert sent_at["second"] >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_interactive_messages_are_sent_before_background_ones():
+    """
+    Tests that an interactive reply overtakes queued broadcast messages.
+    """
+    queue = SendQueue(rate=1000, chat_rate=10, chat_burst=1)
+    await queue.send(1, AsyncMock())
+
+    order = []
+
+    async def send(name: str) -> None:
+        await queue.send(1, AsyncMock(side_effect=lambda: order.append(name)))
+
+    # 1. Broadcast messages are queued first
+    with send_priority(Priority.BACKGROUND):
+        tasks = [asyncio.create_task(send(f"background {i}")) for i in range(2)]
+
+    await asyncio.sleep(0)
+
+    tasks.append(asyncio.create_task(send("interactive")))
+
+    await asyncio.gather(*tasks)
+
+    # 2. Assertions
+    assert order == ["interactive", "background 0", "background 1"]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honored():
+    """
+    Tests that a message rejected by the flood control is sent again after retry_after.
+    1. The first call fails with retry_after, the second one succeeds.
+    2. Asserts the result and the retry counter.
+    """
+    queue = SendQueue(rate=1000, chat_rate=100, chat_burst=1)
+    call = AsyncMock(side_effect=[create_retry_after(), "sent"])
+    retries = SEND_RETRIES.get(priority="interactive")
+
+    assert await queue.send(1, call) == "sent"
+
+    assert call.await_count == 2
+    assert SEND_RETRIES.get(priority="interactive") == retries + 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_raised_after_max_retries():
+    """
+    Tests that the retry_after error is raised when the retries are exhausted.
+    """
+    queue = SendQueue(rate=1000, chat_rate=100, chat_burst=1, max_retries=1)
+    call = AsyncMock(side_effect=create_retry_after())
+
+    with pytest.raises(TelegramRetryAfter):
+        await queue.send(1, call)
+
+    assert call.await_count == 2
+
+
+def test_global_rate_is_shared_by_workers(monkeypatch):
+    """
+    Tests that the global rate is split between BOT_WORKERS processes, read when the queue is built,
+    and BOT_WORKERS=0 means a single process.
+    """
+    monkeypatch.setenv("BOT_WORKERS", "3")
+
+    assert SendQueue().limiter.rate == SendQueue._RATE_LIMIT / 3
+
+    monkeypatch.setenv("BOT_WORKERS", "0")
+
+    assert SendQueue().limiter.rate == SendQueue._RATE_LIMIT
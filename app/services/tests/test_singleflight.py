@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+# --- Pytest Test Cases for SingleFlight ---
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_call():
+    """
+    Test that concurrent callers with the same key await one shared call.
+    """
+    flights = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    # 1. Start several concurrent callers
+    tasks = [asyncio.create_task(flights.do("key", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+
+    assert flights.is_in_flight("key")
+
+    # 2. Let the shared call finish
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    # 3. Assertions
+    assert calls == 1
+    assert results == ["result"] * 5
+    assert len(flights) == 0
+
+
+@pytest.mark.asyncio
+async def test_error_propagates_to_every_caller():
+    """
+    Test that an exception of the shared call is raised in every caller and the key is released.
+    """
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+
+    # 1. All callers get the error
+    results = await asyncio.gather(
+        *[flights.do("key", fetch) for _ in range(3)], return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+    # 2. A new call is made after the failure
+    async def fetch_ok():
+        return "ok"
+
+    assert await flights.do("key", fetch_ok) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    """
+    Test that cancelling one waiter does not cancel the shared call for the rest.
+    """
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(flights.do("key", fetch))
+    second = asyncio.create_task(flights.do("key", fetch))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    release.set()
+
+    assert await second == "result"
+    with pytest.raises(asyncio.CancelledError):
+        await first
@@ -1,9 +1,12 @@
+import asyncio
 from unittest.mock import Mock, patch, AsyncMock
 
 import httpx
 import pytest
 
-from app.services import WeatherService, WeatherError
+from app.services import WeatherService, WeatherError, create_http_client
+from app.texts import Messages
+from benchmarks.weather_server import WeatherServer
 
 # --- Additional Mocks for get_weather method ---
 
@@ -377,3 +380,453 @@ async def test_get_weather_handles_key_error_on_malformed_data(weather_service,
     assert result["photo"] is None
     # We expect a string representation of the KeyError, e.g., "'wind'"
     assert "KeyError" in result["error"] or "'wind'" in result["error"]
+
+
+# --- Pytest Test Cases for the shared HTTP client ---
+
+@pytest.mark.asyncio
+async def test_get_weather_uses_injected_client():
+    """
+    Test that an injected client is reused for every request and is not closed by the service.
+    """
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=MOCK_SUCCESS_RESPONSE_DATA)
+
+    # 1. Create a client with a mocked transport
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    weather_service = WeatherService(client=client)
+
+    # 2. Call the service several times
+    await weather_service._get_weather_by_coordinates(lat=44.55, lon=33.39)
+    await weather_service._get_weather_by_city(city="Kyiv")
+
+    # 3. Assertions
+    assert len(requests) == 2
+    assert requests[0].url.params["lat"] == "44.55"
+    assert requests[1].url.params["q"] == "Kyiv"
+    assert not client.is_closed
+
+    await client.aclose()
+
+
+def test_create_http_client_settings():
+    """
+    Test that the shared client is created with the requested pool limits and timeouts.
+    """
+    client = create_http_client(max_connections=7, timeout=3, connect_timeout=1)
+
+    pool = client._transport._pool
+
+    assert pool._max_connections == 7
+    assert client.timeout.read == 3
+    assert client.timeout.connect == 1
+
+
+def test_create_http_client_keeps_explicit_zero(monkeypatch):
+    """
+    Test that an explicit 0 is not replaced by the environment: no keep-alive connections and no timeout.
+    """
+    monkeypatch.setenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+    monkeypatch.setenv("HTTP_TIMEOUT", "10")
+
+    client = create_http_client(max_keepalive_connections=0, keepalive_expiry=0, timeout=0, connect_timeout=0)
+
+    pool = client._transport._pool
+
+    assert pool._max_keepalive_connections == 0
+    assert pool._keepalive_expiry == 0
+    assert client.timeout.read is None
+    assert client.timeout.connect is None
+
+
+# --- Pytest Test Cases for the weather cache ---
+
+@pytest.mark.asyncio
+async def test_get_weather_caches_by_location_cell(weather_service, monkeypatch):
+    """
+    Test that nearby coordinates in the same cell are served from the cache.
+    """
+    mock_coordinates_call = AsyncMock(return_value=MOCK_SUCCESS_RESPONSE_DATA)
+    monkeypatch.setattr(weather_service, "_get_weather_by_coordinates", mock_coordinates_call)
+
+    # 1. Same cell (precision 2) for the first two calls, another cell for the third
+    first = await weather_service.get_weather(lat=44.551, lon=33.391)
+    second = await weather_service.get_weather(lat=44.552, lon=33.389)
+    await weather_service.get_weather(lat=45.0, lon=33.39)
+
+    # 2. Assertions
+    assert first == second
+    assert mock_coordinates_call.await_count == 2
+    assert weather_service.cache.hits == 1
+    assert weather_service.cache.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_get_weather_city_lands_in_coordinates_cell(weather_service, monkeypatch):
+    """
+    Test that a resolved city lookup is cached in the cell of its coordinates.
+    """
+    mock_city_call = AsyncMock(return_value=MOCK_SUCCESS_RESPONSE_DATA)
+    mock_coordinates_call = AsyncMock(return_value=MOCK_SUCCESS_RESPONSE_DATA)
+    monkeypatch.setattr(weather_service, "_get_weather_by_city", mock_city_call)
+    monkeypatch.setattr(weather_service, "_get_weather_by_coordinates", mock_coordinates_call)
+
+    # 1. First lookup by city resolves the coordinates
+    await weather_service.get_weather(city="Kyiv")
+
+    # 2. Next lookups by city or by coordinates of the same cell use the cache
+    await weather_service.get_weather(city=" kyiv ")
+    await weather_service.get_weather(lat=44.55, lon=33.39)
+
+    # 3. Assertions
+    mock_city_call.assert_awaited_once_with("Kyiv")
+    mock_coordinates_call.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_weather_does_not_cache_errors(weather_service, monkeypatch):
+    """
+    Test that failed lookups are not cached.
+    """
+    mock_error_call = AsyncMock(side_effect=WeatherError("HTTP error occurred: 500"))
+    monkeypatch.setattr(weather_service, "_get_weather_by_coordinates", mock_error_call)
+
+    await weather_service.get_weather(lat=0.0, lon=0.0)
+    await weather_service.get_weather(lat=0.0, lon=0.0)
+
+    assert mock_error_call.await_count == 2
+    assert len(weather_service.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_weather_coalesces_concurrent_lookups(weather_service, monkeypatch):
+    """
+    Test that concurrent lookups of the same cell make a single API call.
+    """
+    release = asyncio.Event()
+
+    async def slow_call(lat, lon):
+        await release.wait()
+        return MOCK_SUCCESS_RESPONSE_DATA
+
+    mock_coordinates_call = AsyncMock(side_effect=slow_call)
+    monkeypatch.setattr(weather_service, "_get_weather_by_coordinates", mock_coordinates_call)
+
+    # 1. Burst of lookups before the first response
+    tasks = [
+        asyncio.create_task(weather_service.get_weather(lat=44.55, lon=33.39))
+        for _ in range(10)
+    ]
+    await asyncio.sleep(0)
+
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    # 2. Assertions
+    assert mock_coordinates_call.await_count == 1
+    assert all(result["error"] is None for result in results)
+
+
+@pytest.mark.asyncio
+async def test_get_weather_coalesced_error_reaches_every_caller(weather_service, monkeypatch):
+    """
+    Test that a failed shared lookup is reported to every concurrent caller.
+    """
+    async def failing_call(lat, lon):
+        await asyncio.sleep(0)
+        raise WeatherError("HTTP error occurred: 500")
+
+    mock_coordinates_call = AsyncMock(side_effect=failing_call)
+    monkeypatch.setattr(weather_service, "_get_weather_by_coordinates", mock_coordinates_call)
+
+    results = await asyncio.gather(
+        *[weather_service.get_weather(lat=44.55, lon=33.39) for _ in range(3)]
+    )
+
+    assert mock_coordinates_call.await_count == 1
+    assert all(result["error"] == "HTTP error occurred: 500" for result in results)
+
+
+# --- Pytest Test Cases against the local OpenWeatherMap server ---
+
+@pytest.mark.asyncio
+async def test_get_weather_from_local_server_over_pooled_connections():
+    """
+    Test that the service reaches the server through the base URL and reuses pooled connections.
+    """
+    async with WeatherServer() as server:
+        # 1. Point the service to the local server
+        async with create_http_client() as client:
+            weather_service = WeatherService(client=client, api_url=server.url, precision=4)
+
+            # 2. Sequential lookups of different cells and a city
+            for index in range(5):
+                weather = await weather_service.get_weather(lat=50 + index, lon=30)
+
+                assert weather["error"] is None
+
+            weather = await weather_service.get_weather(city="Kyiv")
+
+        # 3. Assertions
+        assert weather["error"] is None
+        assert server.responses[200] == 6
+        assert len(server.connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_weather_from_local_server_errors():
+    """
+    Test that 429, 500 and unknown city responses of the server are reported as errors.
+    """
+    async with create_http_client() as client:
+        # 1. Rate limited server
+        async with WeatherServer(rate_limit_rate=1) as server:
+            weather_service = WeatherService(client=client, api_url=server.url)
+
+            with pytest.raises(WeatherError, match="429"):
+                await weather_service._get_weather_by_coordinates(lat=50.45, lon=30.52)
+
+        # 2. Failing server
+        async with WeatherServer(error_rate=1) as server:
+            weather_service = WeatherService(client=client, api_url=server.url)
+
+            with pytest.raises(WeatherError, match="500"):
+                await weather_service._get_weather_by_coordinates(lat=50.45, lon=30.52)
+
+            # 3. Unknown city
+            server.error_rate = 0
+
+            with pytest.raises(WeatherError, match="404"):
+                await weather_service._get_weather_by_city(city="Atlantis")
+
+
+@pytest.mark.asyncio
+async def test_get_weather_from_local_server_timeout_and_payload_variants():
+    """
+    Test that a slow server hits the client timeout and a broken payload is reported as an error.
+    """
+    # 1. Server slower than the client timeout
+    async with WeatherServer(latency=0.5) as server:
+        async with create_http_client(timeout=0.05) as client:
+            weather_service = WeatherService(client=client, api_url=server.url)
+
+            weather = await weather_service.get_weather(lat=50.45, lon=30.52)
+
+        assert weather["error"] is not None
+
+    # 2. Payload without wind
+    async with WeatherServer(variants={"no_wind": 1}) as server:
+        async with create_http_client() as client:
+            weather_service = WeatherService(client=client, api_url=server.url)
+
+            weather = await weather_service.get_weather(lat=50.45, lon=30.52)
+
+        assert weather["error"] == "'wind'"
+
+
+# --- Pytest Test Cases for get_many_weather_data ---
+
+@pytest.mark.asyncio
+async def test_get_many_weather_data_bounded_and_ordered(weather_service, monkeypatch):
+    """
+    Test that locations are fetched concurrently up to the limit, results keep the order
+    and a failed location gets None.
+    """
+    running = 0
+    max_running = 0
+
+    async def fetch(lat, lon):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+        if lat == 3:
+            raise WeatherError("HTTP error occurred: 500")
+
+        return {"lat": lat}
+
+    monkeypatch.setattr(weather_service, "_get_weather_by_coordinates", AsyncMock(side_effect=fetch))
+
+    # 1. Fetch 10 locations with at most 3 at a time
+    results = await weather_service.get_many_weather_data(
+        [(index, 30) for index in range(10)], concurrency=3
+    )
+
+    # 2. Assertions
+    assert max_running == 3
+    assert results[3] is None
+    assert [result[0]["lat"] for index, result in enumerate(results) if index != 3] == [
+        0, 1, 2, 4, 5, 6, 7, 8, 9
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_many_weather_data_uses_cache(weather_service, monkeypatch):
+    """
+    Test that places in one cached cell are fetched once.
+    """
+    mock_coordinates_call = AsyncMock(return_value=MOCK_SUCCESS_RESPONSE_DATA)
+    monkeypatch.setattr(weather_service, "_get_weather_by_coordinates", mock_coordinates_call)
+
+    await weather_service.get_weather_data(lat=44.55, lon=33.39)
+    results = await weather_service.get_many_weather_data([(44.551, 33.391), (44.549, 33.389)])
+
+    assert mock_coordinates_call.await_count == 1
+    assert results == [(MOCK_SUCCESS_RESPONSE_DATA, False), (MOCK_SUCCESS_RESPONSE_DATA, False)]
+
+
+# --- Pytest Test Cases for stale readings and the circuit breaker ---
+
+@pytest.fixture
+def stale_weather_service():
+    """
+    WeatherService with an expired reading of the (44.55, 33.39) cell and a breaker opening after 1 failure.
+    """
+    from app.services import CircuitBreaker, TTLCache
+
+    clock = Mock(return_value=0.0)
+    cache = TTLCache(maxsize=10, ttl=60, stale_ttl=600, clock=clock)
+
+    weather_service = WeatherService(
+        cache=cache, breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=30, clock=clock)
+    )
+    cache.set(weather_service.get_cell(44.55, 33.39), MOCK_SUCCESS_RESPONSE_DATA)
+
+    # Expire the reading
+    clock.return_value = 100.0
+
+    return weather_service, clock
+
+
+@pytest.mark.asyncio
+async def test_get_weather_serves_stale_reading_when_api_fails(stale_weather_service):
+    """
+    Test that a failed request falls back to the stale reading, marked as stale,
+    and the open circuit then answers without calling the API.
+    """
+    weather_service, clock = stale_weather_service
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503, json={})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        weather_service._client = client
+
+        # 1. The API fails, the stale reading is served and the circuit opens
+        weather = await weather_service.get_weather(lat=44.55, lon=33.39)
+
+        assert weather["error"] is None
+        assert weather["stale"] is True
+        assert weather["text"].endswith(Messages.WEATHER_STALE)
+        assert weather_service.breaker.is_open
+
+        # 2. A cell without a reading fails fast
+        weather = await weather_service.get_weather(lat=10.0, lon=10.0)
+
+        assert "open" in weather["error"]
+
+        # 3. The places list marks the stale reading
+        results = await weather_service.get_many_weather_data([(44.55, 33.39), (10.0, 10.0)])
+
+        assert results == [(MOCK_SUCCESS_RESPONSE_DATA, True), None]
+
+    # 4. Scheduler lookups never get the stale reading
+    with pytest.raises(WeatherError):
+        await weather_service.get_weather_data(lat=44.55, lon=33.39, allow_stale=False)
+
+
+@pytest.mark.asyncio
+async def test_get_weather_refreshes_stale_reading_in_background(stale_weather_service, monkeypatch):
+    """
+    Test that a half-open circuit serves the stale reading at once and probes the API in the background.
+    """
+    weather_service, clock = stale_weather_service
+    weather_service.breaker.record_failure()
+
+    release = asyncio.Event()
+    fresh_data = {**MOCK_SUCCESS_RESPONSE_DATA, "name": "Fresh"}
+
+    async def slow_call(lat, lon):
+        await release.wait()
+        return fresh_data
+
+    mock_coordinates_call = AsyncMock(side_effect=slow_call)
+    monkeypatch.setattr(weather_service, "_get_weather_by_coordinates", mock_coordinates_call)
+
+    # 1. Open circuit: stale reading, no request
+    weather = await weather_service.get_weather(lat=44.55, lon=33.39)
+
+    assert weather["stale"] is True
+    assert mock_coordinates_call.await_count == 0
+
+    # 2. Half-open: stale reading at once, refresh in the background
+    clock.return_value = 200.0
+
+    weather = await weather_service.get_weather(lat=44.55, lon=33.39)
+
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+    assert weather["stale"] is True
+    assert mock_coordinates_call.await_count == 1
+
+    # 3. The refresh lands in the cache
+    release.set()
+    await asyncio.gather(*weather_service._refreshes)
+
+    assert await weather_service.get_weather_data(lat=44.55, lon=33.39) == fresh_data
+
+
+# --- Pytest Test Cases for the API quota ---
+
+def test_api_quota_is_shared_by_workers(monkeypatch):
+    """
+    Test that the API quota is split between BOT_WORKERS processes and BOT_WORKERS=0 means a single process.
+    """
+    monkeypatch.setenv("BOT_WORKERS", "4")
+    limiter = WeatherService().limiter
+
+    assert limiter.rate == WeatherService._RATE_LIMIT / 60 / 4
+    assert limiter.burst == max(WeatherService._RATE_BURST // 4, 1)
+
+    monkeypatch.setenv("BOT_WORKERS", "0")
+    limiter = WeatherService().limiter
+
+    assert limiter.rate == WeatherService._RATE_LIMIT / 60
+    assert limiter.burst == WeatherService._RATE_BURST
+
+
+# --- Pytest Test Cases for cancelled requests ---
+
+@pytest.mark.asyncio
+async def test_cancelled_request_is_not_a_breaker_failure():
+    """
+    Test that a request cancelled in flight (e.g. on shutdown) does not open the circuit.
+    """
+    from app.services import CircuitBreaker
+
+    started = asyncio.Event()
+
+    async def slow_get(*args, **kwargs):
+        started.set()
+        await asyncio.Event().wait()
+
+    client = Mock(get=AsyncMock(side_effect=slow_get))
+    weather_service = WeatherService(
+        client=client, breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+    )
+
+    task = asyncio.create_task(weather_service._get_weather_by_coordinates(44.55, 33.39))
+    await started.wait()
+
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert weather_service.breaker.state == CircuitBreaker.CLOSED
@@ -1,8 +1,16 @@
+import asyncio
 import os
-from typing import TypedDict
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Hashable, TypedDict
 
 import httpx
 
+from app.services.cache import TTLCache
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.metrics import track_call
+from app.services.rate_limiter import Priority, TokenBucketLimiter
+from app.services.singleflight import SingleFlight
+from app.services.workers import workers_count
 from app.texts import Messages
 
 
@@ -10,20 +18,162 @@ class TWeather(TypedDict):
     text: str | None
     photo: str | None
     error: str | None
+    # Last known reading served while the API is unavailable
+    stale: bool
 
 
 class WeatherError(Exception):
     pass
 
 
+# Priority of the requests made by the current lookup
+_priority: ContextVar[Priority] = ContextVar("weather_priority", default=Priority.INTERACTIVE)
+
+
 class WeatherService:
     """
     Weather Service
     """
 
-    _API_URL = "https://api.openweathermap.org/data/2.5/weather"
+    # Base URL can point to a local stand-in (benchmarks/weather_server.py)
+    _API_BASE_URL = os.getenv("OPENWEATHERMAP_API_URL", "https://api.openweathermap.org")
+    _API_PATH = "/data/2.5/weather"
     _API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
 
+    _CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", 300))
+    # Time an expired reading can still be served as stale
+    _STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", 3600))
+    _CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", 10000))
+    # Number of decimal places kept in the cell coordinates (2 is about 1 km)
+    _CACHE_PRECISION = int(os.getenv("WEATHER_CACHE_PRECISION", 2))
+    _CITY_TTL = 24 * 60 * 60
+    # Number of locations fetched at the same time by get_many_weather_data
+    _BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", 5))
+
+    # API quota: requests per minute (0 disables the limiter), burst, waiting requests and max wait.
+    # The quota of the API key is shared by the worker processes
+    _RATE_LIMIT = float(os.getenv("OPENWEATHERMAP_RATE_LIMIT", 60))
+    _RATE_BURST = int(os.getenv("OPENWEATHERMAP_RATE_BURST", 10))
+    _RATE_QUEUE_SIZE = int(os.getenv("OPENWEATHERMAP_RATE_QUEUE_SIZE", 100))
+    _RATE_TIMEOUT = float(os.getenv("OPENWEATHERMAP_RATE_TIMEOUT", 10))
+    # Pause after a 429 response without a Retry-After header, s
+    _RATE_PAUSE = 60
+
+    # Failures in a row that open the circuit and seconds until the next probe
+    _BREAKER_THRESHOLD = int(os.getenv("WEATHER_BREAKER_THRESHOLD", 5))
+    _BREAKER_TIMEOUT = float(os.getenv("WEATHER_BREAKER_TIMEOUT", 30))
+
+    def __init__(
+            self,
+            client: httpx.AsyncClient | None = None,
+            cache: TTLCache | None = None,
+            precision: int | None = None,
+            api_url: str | None = None,
+            limiter: TokenBucketLimiter | None = None,
+            breaker: CircuitBreaker | None = None,
+    ):
+        self._api_url = (api_url or self._API_BASE_URL).rstrip("/") + self._API_PATH
+
+        # Shared pooled client, owned (opened and closed) by the caller
+        self._client = client
+
+        # Weather data by location cell
+        self._cache = cache if cache is not None else TTLCache(
+            maxsize=self._CACHE_SIZE, ttl=self._CACHE_TTL, stale_ttl=self._STALE_TTL
+        )
+        self._precision = self._CACHE_PRECISION if precision is None else precision
+
+        # Location cell by city name, filled once a city is resolved to coordinates
+        self._cities = TTLCache(maxsize=self._CACHE_SIZE, ttl=self._CITY_TTL)
+
+        # Requests in flight by cell
+        self._flights = SingleFlight()
+
+        # Shared API quota, this process gets its share
+        workers = workers_count()
+
+        self._limiter = limiter if limiter is not None else TokenBucketLimiter(
+            rate=self._RATE_LIMIT / 60 / workers,
+            burst=max(self._RATE_BURST // workers, 1),
+            max_waiters=self._RATE_QUEUE_SIZE,
+            timeout=self._RATE_TIMEOUT,
+            name="openweathermap",
+        )
+
+        # Fail fast while the API is down
+        self._breaker = breaker if breaker is not None else CircuitBreaker(
+            failure_threshold=self._BREAKER_THRESHOLD,
+            recovery_timeout=self._BREAKER_TIMEOUT,
+            name="openweathermap",
+        )
+
+        # Background refreshes of stale readings
+        self._refreshes: set[asyncio.Future] = set()
+
+    @property
+    def limiter(self) -> TokenBucketLimiter:
+        return self._limiter
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    @property
+    def cache(self) -> TTLCache:
+        return self._cache
+
+    def get_cell(self, lat: float, lon: float) -> tuple[int, int]:
+        """
+        Quantize coordinates to the cell used as a cache key
+        """
+        scale = 10 ** self._precision
+
+        return round(lat * scale), round(lon * scale)
+
+    async def _request(self, params: dict) -> dict:
+        # Do not wait for the quota while the API is down
+        if self._breaker.is_open:
+            raise CircuitOpenError(f"Circuit {self._breaker.name} is open")
+
+        # Wait for the quota before the call is measured
+        await self._limiter.acquire(_priority.get())
+
+        self._breaker.before_call()
+
+        with track_call("openweathermap", "weather"):
+            try:
+                if self._client:
+                    response = await self._client.get(self._api_url, params=params)
+                else:
+                    async with httpx.AsyncClient() as client:
+                        response = await client.get(self._api_url, params=params)
+            except asyncio.CancelledError:
+                # Shutdown or a cancelled update, not a failure of the API
+                self._breaker.cancel_call()
+
+                raise
+            except Exception:
+                # Connection errors and timeouts
+                self._breaker.record_failure()
+
+                raise
+
+            # Client errors (e.g. unknown city) do not mean the API is down
+            if response.status_code >= 500 or response.status_code == 429:
+                self._breaker.record_failure()
+            else:
+                self._breaker.record_success()
+
+            if response.status_code == 429:
+                # Quota is exhausted, stop all requests for a while
+                retry_after = response.headers.get("Retry-After", "")
+                self._limiter.pause(float(retry_after) if retry_after.isdigit() else self._RATE_PAUSE)
+
+            # Raise an exception for bad status codes (4xx or 5xx)
+            response.raise_for_status()
+
+            return response.json()
+
     async def _get_weather_by_coordinates(self, lat: float, lon: float) -> dict | None:
         try:
             params = {
@@ -33,13 +183,7 @@ class WeatherService:
                 "units": "metric",
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(self._API_URL, params=params)
-
-                # Raise an exception for bad status codes (4xx or 5xx)
-                response.raise_for_status()
-
-            return response.json()
+            return await self._request(params)
         except httpx.HTTPStatusError as e:
             # Handle HTTP errors specifically
             raise WeatherError(f"HTTP error occurred: {e.response.status_code}")
@@ -54,13 +198,7 @@ class WeatherService:
                 "units": "metric",
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(self._API_URL, params=params)
-
-                # Raise an exception for bad status codes (4xx or 5xx)
-                response.raise_for_status()
-
-            return response.json()
+            return await self._request(params)
         except httpx.HTTPStatusError as e:
             # Handle HTTP errors specifically
             raise WeatherError(f"HTTP error occurred: {e.response.status_code}")
@@ -78,6 +216,150 @@ class WeatherService:
         except Exception as e:
             raise WeatherError(e)
 
+    async def get_weather_data(
+            self,
+            lat: float | None = None,
+            lon: float | None = None,
+            city: str | None = None,
+            priority: Priority = Priority.INTERACTIVE,
+            allow_stale: bool = True,
+    ) -> dict:
+        """
+        Get raw weather data from the cache or from the API.
+        Interactive lookups get the API quota before background ones
+        """
+        data, stale = await self._get_weather_data(
+            lat=lat, lon=lon, city=city, priority=priority, allow_stale=allow_stale
+        )
+
+        return data
+
+    async def _get_weather_data(
+            self,
+            lat: float | None = None,
+            lon: float | None = None,
+            city: str | None = None,
+            priority: Priority = Priority.INTERACTIVE,
+            allow_stale: bool = True,
+    ) -> tuple[dict, bool]:
+        """
+        Get raw weather data and whether it is a stale reading.
+        A stale reading is served while the circuit is not closed or a refresh is in flight,
+        and when the API request fails
+        """
+        if city:
+            city_key = city.strip().lower()
+            cell = self._cities.get(city_key)
+        else:
+            city_key = None
+            cell = self.get_cell(lat, lon)
+
+        data = self._cache.get(cell) if cell else None
+
+        if data is not None:
+            return data, False
+
+        key = cell or ("city", city_key)
+        stale = self._cache.get_stale(cell) if cell and allow_stale else None
+
+        def fetch() -> Awaitable[dict]:
+            return self._fetch_weather_data(lat=lat, lon=lon, city=city)
+
+        if stale is not None and (
+                self._breaker.state != CircuitBreaker.CLOSED or self._flights.is_in_flight(key)
+        ):
+            # Answer at once, a half-open circuit is probed in the background
+            if self._breaker.state == CircuitBreaker.HALF_OPEN:
+                self._refresh(key, fetch)
+
+            return stale, True
+
+        # The shared request runs in a new task, which copies the priority
+        token = _priority.set(priority)
+
+        try:
+            # Concurrent lookups of the same cell (or unresolved city) share one request
+            data = await self._flights.do(key, fetch)
+        except WeatherError:
+            if stale is None:
+                raise
+
+            return stale, True
+        finally:
+            _priority.reset(token)
+
+        return data, False
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[dict]]) -> None:
+        if self._flights.is_in_flight(key):
+            return
+
+        token = _priority.set(Priority.BACKGROUND)
+
+        try:
+            future = asyncio.ensure_future(self._flights.do(key, fetch))
+        finally:
+            _priority.reset(token)
+
+        self._refreshes.add(future)
+        future.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, future: asyncio.Future) -> None:
+        self._refreshes.discard(future)
+
+        # A failed refresh keeps the stale reading
+        if not future.cancelled():
+            future.exception()
+
+    async def get_many_weather_data(
+            self,
+            locations: list[tuple[float, float]],
+            concurrency: int | None = None,
+            priority: Priority = Priority.INTERACTIVE,
+            allow_stale: bool = True,
+    ) -> list[tuple[dict, bool] | None]:
+        """
+        Get raw weather data and whether it is a stale reading for many (lat, lon) locations concurrently,
+        in the same order. Failed locations get None
+        """
+        semaphore = asyncio.Semaphore(concurrency or self._BATCH_CONCURRENCY)
+
+        async def get(lat: float, lon: float) -> tuple[dict, bool] | None:
+            async with semaphore:
+                try:
+                    return await self._get_weather_data(
+                        lat=lat, lon=lon, priority=priority, allow_stale=allow_stale
+                    )
+                except WeatherError:
+                    return None
+
+        return list(await asyncio.gather(*(get(lat, lon) for lat, lon in locations)))
+
+    async def _fetch_weather_data(
+            self,
+            lat: float | None = None,
+            lon: float | None = None,
+            city: str | None = None,
+    ) -> dict:
+        if city:
+            data = await self._get_weather_by_city(city)
+
+            # Resolve city to its cell
+            coord = data.get("coord")
+            cell = self.get_cell(coord["lat"], coord["lon"]) if coord else None
+
+            if cell:
+                self._cities.set(city.strip().lower(), cell)
+        else:
+            data = await self._get_weather_by_coordinates(lat, lon)
+
+            cell = self.get_cell(lat, lon)
+
+        if cell:
+            self._cache.set(cell, data)
+
+        return data
+
     async def get_weather(
             self,
             lat: float | None = None,
@@ -88,29 +370,40 @@ class WeatherService:
             "text": None,
             "photo": None,
             "error": None,
+            "stale": False,
         }
 
         try:
-            if city:
-                data = await self._get_weather_by_city(city)
-            else:
-                data = await self._get_weather_by_coordinates(lat, lon)
+            data, stale = await self._get_weather_data(lat=lat, lon=lon, city=city)
+
+            res = self.parse_weather(data)
 
-            weather: dict = data["weather"][0]
-            main: dict = data["main"]
-            wind: dict = data["wind"]
+            if stale:
+                res["text"] += "\n\n" + Messages.WEATHER_STALE
+                res["stale"] = True
+        except Exception as e:
+            res["error"] = str(e)
+        finally:
+            return res
+
+    def parse_weather(self, data: dict) -> TWeather:
+        """
+        Format raw weather data, raises on malformed data
+        """
+        weather: dict = data["weather"][0]
+        main: dict = data["main"]
+        wind: dict = data["wind"]
 
-            res["text"] = Messages.get_weather_text(
+        return {
+            "text": Messages.get_weather_text(
                 description=weather["description"],
                 temperature=main["temp"],
                 feels_like=main["feels_like"],
                 pressure=main["pressure"],
                 humidity=main["humidity"],
                 wind_speed=wind["speed"],
-            )
-
-            res["photo"] = self.get_icon_url(data)
-        except Exception as e:
-            res["error"] = str(e)
-        finally:
-            return res
+            ),
+            "photo": self.get_icon_url(data),
+            "error": None,
+            "stale": False,
+        }
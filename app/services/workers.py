@@ -0,0 +1,8 @@
+import os
+
+
+def workers_count() -> int:
+    """
+    Number of bot worker processes (BOT_WORKERS), 0 and 1 both mean a single process
+    """
+    return max(int(os.getenv("BOT_WORKERS", 1)), 1)
@@ -1 +1,2 @@
 from .place import *
+from .storage import *
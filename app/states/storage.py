@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from app.services import DBService, TTLCache
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM Storage in the bot database.
+    Reads and writes go to memory, changed records are written to the database in batches
+    every flush_interval seconds. States expire ttl seconds after the last change
+    """
+
+    _STATE_TTL = float(os.getenv("FSM_STATE_TTL", 24 * 60 * 60))
+    _FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", 0.1))
+    _CLEANUP_INTERVAL = float(os.getenv("FSM_CLEANUP_INTERVAL", 10 * 60))
+    _CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", 10000))
+
+    def __init__(
+            self,
+            db: DBService,
+            key_builder: KeyBuilder | None = None,
+            ttl: float | None = None,
+            flush_interval: float | None = None,
+            clock: Callable[[], float] = time.time,
+    ):
+        self._db = db
+        self._key_builder = key_builder or DefaultKeyBuilder(
+            with_bot_id=True, with_business_connection_id=True, with_destiny=True
+        )
+        self._ttl = ttl or self._STATE_TTL
+        self._flush_interval = flush_interval or self._FLUSH_INTERVAL
+        self._clock = clock
+
+        # Saved records (state, data, expires_at) by key
+        self._records = TTLCache(maxsize=self._CACHE_SIZE, ttl=self._ttl, clock=clock)
+        # Changed records waiting for the next flush
+        self._dirty: dict[str, tuple[str | None, dict, int]] = {}
+
+        self._task: asyncio.Task | None = None
+        self._closing = asyncio.Event()
+        self._cleaned_at = clock()
+
+    @staticmethod
+    def _encode(data: dict) -> str | None:
+        # Compact JSON, an empty dict is not stored
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False) if data else None
+
+    async def _get(self, key: str) -> tuple[str | None, dict]:
+        record = self._dirty.get(key)
+
+        if record is None:
+            record = self._records.get(key)
+
+        if record is None:
+            row = await self._db.get_fsm_record(key=key, now=int(self._clock()))
+
+            record = (row[0], json.loads(row[1]) if row[1] else {}, row[2]) if row else (None, {}, 0)
+
+            # A change made during the lookup is newer
+            if key not in self._dirty and self._records.get_stale(key) is None:
+                self._records.set(key, record)
+
+        state, data, expires_at = record
+
+        if expires_at <= self._clock():
+            return None, {}
+
+        return state, data
+
+    def _set(self, key: str, state: str | None, data: dict) -> None:
+        # A cleared record expires at once and is deleted by the cleanup
+        expires_at = int(self._clock() + self._ttl) if state is not None or data else 0
+
+        self._dirty[key] = (state, data, expires_at)
+
+        # The task is started again if it has stopped
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self) -> None:
+        """
+        Write all changed records in one transaction. Failed records are written again at the next flush
+        """
+        if not self._dirty:
+            return
+
+        records, self._dirty = self._dirty, {}
+        rows = []
+
+        for key, (state, data, expires_at) in list(records.items()):
+            self._records.set(key, (state, data, expires_at))
+
+            try:
+                rows.append((key, state, self._encode(data), expires_at))
+            except (TypeError, ValueError) as e:
+                # Not JSON serializable, kept in memory only, so the other records are still written
+                logging.error("Failed to encode FSM data of %s: %s", key, e)
+
+                del records[key]
+
+        if not rows:
+            return
+
+        try:
+            await self._db.save_fsm_records(rows)
+        except Exception as e:
+            logging.warning("Failed to save FSM states, retry at the next flush: %s", e)
+
+            # Keep changes made since
+            for key, record in records.items():
+                self._dirty.setdefault(key, record)
+
+    async def _run(self) -> None:
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            await self.flush()
+
+            if self._clock() - self._cleaned_at >= self._CLEANUP_INTERVAL:
+                self._cleaned_at = self._clock()
+
+                try:
+                    await self._db.delete_expired_fsm_records(now=int(self._cleaned_at))
+                except Exception as e:
+                    logging.warning("Failed to delete expired FSM states: %s", e)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self._key_builder.build(key)
+        _, data = await self._get(storage_key)
+
+        self._set(storage_key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = await self._get(self._key_builder.build(key))
+
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self._key_builder.build(key)
+        state, _ = await self._get(storage_key)
+
+        self._set(storage_key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._get(self._key_builder.build(key))
+
+        return data.copy()
+
+    async def close(self) -> None:
+        """
+        Stop the flush task and write the remaining changes. Must be called before the database is closed.
+        The task is not cancelled, a batch being written is finished
+        """
+        if self._task is not None:
+            self._closing.set()
+
+            try:
+                await self._task
+            finally:
+                self._task = None
+                self._closing.clear()
+
+        await self.flush()
@@ -0,0 +1,191 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from app.services import DBService
+from app.states import PlaceCreate, SQLiteStorage
+
+# --- Constants for Testing ---
+
+KEY = StorageKey(bot_id=42, chat_id=123456, user_id=123456)
+OTHER_KEY = StorageKey(bot_id=42, chat_id=654321, user_id=654321)
+
+
+# --- Pytest Test Cases for SQLiteStorage ---
+
+@pytest.mark.asyncio
+async def test_state_and_data_survive_restart(db_service: DBService):
+    """
+    Tests that state and data are written on close and read back by a new storage.
+    """
+    # 1. Set state and data
+    storage = SQLiteStorage(db_service)
+
+    await storage.set_state(KEY, PlaceCreate.name)
+    await storage.update_data(KEY, {"lat": 50.45, "lon": 30.52, "name": "Дім"})
+    await storage.close()
+
+    # 2. New storage on the same database
+    storage = SQLiteStorage(db_service)
+
+    assert await storage.get_state(KEY) == PlaceCreate.name.state
+    assert await storage.get_data(KEY) == {"lat": 50.45, "lon": 30.52, "name": "Дім"}
+    assert await storage.get_state(OTHER_KEY) is None
+    assert await storage.get_data(OTHER_KEY) == {}
+
+    # 3. Compact encoding
+    row = await db_service.get_fsm_record(key=storage._key_builder.build(KEY), now=0)
+
+    assert row[1] == '{"lat":50.45,"lon":30.52,"name":"Дім"}'
+
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched(db_service: DBService):
+    """
+    Tests that changes of many keys are written in one transaction.
+    """
+    storage = SQLiteStorage(db_service, flush_interval=60)
+
+    with patch.object(db_service, "save_fsm_records", wraps=db_service.save_fsm_records) as save:
+        for user_id in range(50):
+            key = StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+            await storage.set_state(key, PlaceCreate.name)
+            await storage.update_data(key, {"lat": user_id})
+
+        await storage.close()
+
+    assert save.await_count == 1
+    assert len(save.await_args.args[0]) == 50
+
+
+@pytest.mark.asyncio
+async def test_states_expire(db_service: DBService, fake_clock):
+    """
+    Tests that a state expires ttl seconds after the last change, and expired and cleared
+    records are deleted by the cleanup.
+    """
+    fake_clock.now = 1_700_000_000.0
+    storage = SQLiteStorage(db_service, ttl=60, clock=fake_clock)
+
+    # 1. One abandoned state and one cleared state
+    await storage.set_state(KEY, PlaceCreate.name)
+    await storage.set_state(OTHER_KEY, PlaceCreate.name)
+    await storage.set_state(OTHER_KEY, None)
+    await storage.flush()
+
+    # 2. The abandoned state expires
+    fake_clock.now += 61
+
+    assert await storage.get_state(KEY) is None
+    assert await SQLiteStorage(db_service, clock=fake_clock).get_state(KEY) is None
+
+    # 3. Cleanup
+    await db_service.delete_expired_fsm_records(now=int(fake_clock.now))
+
+    async with db_service._connection.execute("SELECT COUNT(*) FROM fsm_states") as cursor:
+        assert (await cursor.fetchone())[0] == 0
+
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_update_data_is_sub_millisecond(db_service: DBService):
+    """
+    Tests that update_data of a loaded key does not wait for the database.
+    """
+    storage = SQLiteStorage(db_service, flush_interval=60)
+    await storage.get_data(KEY)
+
+    start = time.perf_counter()
+
+    for index in range(1000):
+        await storage.update_data(KEY, {"message_id": index, "chat_id": 123456})
+
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_bad_data_does_not_stop_flushing(db_service: DBService):
+    """
+    Tests that data that can not be encoded is kept in memory and the other records are still written.
+    """
+    storage = SQLiteStorage(db_service, flush_interval=0.01)
+
+    # 1. A set is not JSON serializable
+    await storage.set_data(KEY, {"ids": {1, 2}})
+    await asyncio.sleep(0.05)
+
+    # 2. A later change of another key is written by the flush task
+    await storage.set_data(OTHER_KEY, {"ids": [1, 2]})
+    await asyncio.sleep(0.05)
+
+    assert await storage.get_data(KEY) == {"ids": {1, 2}}
+    assert await db_service.get_fsm_record(key=storage._key_builder.build(KEY), now=0) is None
+
+    row = await db_service.get_fsm_record(key=storage._key_builder.build(OTHER_KEY), now=0)
+
+    assert row[1] == '{"ids":[1,2]}'
+
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_save_is_retried(db_service: DBService):
+    """
+    Tests that records of a failed batch are written at the next flush, and a newer change is kept.
+    """
+    storage = SQLiteStorage(db_service, flush_interval=60)
+    save = db_service.save_fsm_records
+
+    # 1. The first batch fails
+    await storage.set_state(KEY, PlaceCreate.name)
+    await storage.set_state(OTHER_KEY, PlaceCreate.name)
+
+    with patch.object(db_service, "save_fsm_records", side_effect=RuntimeError("disk I/O error")):
+        await storage.flush()
+
+    # 2. A change made after the failure wins
+    await storage.set_state(OTHER_KEY, PlaceCreate.lat)
+
+    with patch.object(db_service, "save_fsm_records", wraps=save) as retry:
+        await storage.close()
+
+    assert len(retry.await_args.args[0]) == 2
+
+    storage = SQLiteStorage(db_service)
+
+    assert await storage.get_state(KEY) == PlaceCreate.name.state
+    assert await storage.get_state(OTHER_KEY) == PlaceCreate.lat.state
+
+
+@pytest.mark.asyncio
+async def test_close_finishes_batch_in_progress(db_service: DBService):
+    """
+    Tests that close waits for a batch being written by the flush task instead of cancelling it.
+    """
+    storage = SQLiteStorage(db_service, flush_interval=0.01)
+    save = db_service.save_fsm_records
+    started = asyncio.Event()
+
+    async def slow_save(records):
+        started.set()
+        await asyncio.sleep(0.05)
+
+        return await save(records)
+
+    with patch.object(db_service, "save_fsm_records", side_effect=slow_save):
+        await storage.set_state(KEY, PlaceCreate.name)
+        await started.wait()
+
+        # The records are out of the dirty set while the batch is written
+        await storage.close()
+
+    assert await SQLiteStorage(db_service).get_state(KEY) == PlaceCreate.name.state
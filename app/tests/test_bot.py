@@ -0,0 +1,50 @@
+import pytest
+from aiogram import Bot
+
+from app.bot import ROUTERS, create_dispatcher
+from app.middlewares import HandlerMetricsMiddleware
+from app.services import create_http_client
+
+
+def count_handler_metrics(observer) -> int:
+    return sum(isinstance(middleware, HandlerMetricsMiddleware) for middleware in observer.middleware)
+
+
+# --- Pytest Test Cases for create_dispatcher ---
+
+def test_create_dispatcher_can_be_called_again():
+    """
+    Tests that a second Dispatcher gets the routers and handlers are measured once in both.
+    """
+    create_dispatcher()
+    dp = create_dispatcher()
+
+    for router in ROUTERS:
+        assert router.parent_router is dp
+        assert count_handler_metrics(router.message) == 1
+        assert count_handler_metrics(router.callback_query) == 1
+
+    assert dp.sub_routers == list(ROUTERS)
+
+
+@pytest.mark.asyncio
+async def test_shutdown_closes_only_own_http_client(monkeypatch):
+    """
+    Tests that the shutdown keeps open an HTTP client passed by the caller.
+    """
+    monkeypatch.setenv("SCHEDULER_ENABLED", "0")
+    monkeypatch.delenv("METRICS_PORT", raising=False)
+
+    bot = Bot(token="42:TEST")
+    http_client = create_http_client()
+    dp = create_dispatcher(http_client=http_client, db_path=":memory:")
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+
+    await dp.emit_startup(bot=bot, **workflow_data)
+    await dp.emit_shutdown(bot=bot, **workflow_data)
+
+    try:
+        assert not http_client.is_closed
+    finally:
+        await http_client.aclose()
+        await bot.session.close()
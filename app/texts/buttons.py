@@ -4,6 +4,12 @@ class Buttons:
     PHONE_SHARE = "📟 Share the phone number"
     ACCOUNT_DELETE = "❌ Delete account"
     PLACES_SEE = "🧡 See Favorite Places"
+    PLACES_WEATHER_ALL = "🌍 Weather in All Places"
     PLACES_ADD = "➕ Add to Favorite Places"
     PLACES_DELETE = "❌ Delete from Favorite Places"
     PLACES_RENAME = "✏️ Rename Favorite Place"
+    PLACES_SUBSCRIBE_DAILY = "🔔 Daily forecast"
+    PLACES_SUBSCRIBE_HOURLY = "⏰ Hourly forecast"
+    PLACES_UNSUBSCRIBE = "🔕 Unsubscribe"
+    PLACES_PREVIOUS = "◀️ Previous"
+    PLACES_NEXT = "Next ▶️"
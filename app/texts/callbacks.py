@@ -1,5 +1,4 @@
 class Callbacks:
-    PLACE_ADD = "favorite_place_add"
-    PLACE_RENAME = "favorite_place_rename"
-    PLACE_DELETE = "favorite_place_delete"
+    # Prefix of the place buttons sent before the callback data codec (app/keyboards/callbacks.py)
+    PLACE_LEGACY = "favorite_place"
     CANCEL = "cancel"
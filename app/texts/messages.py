@@ -20,6 +20,13 @@ class Messages:
     PLACES_RENAME_SUCCESS = "Favorite place was successfully renamed!"
     PLACES_RENAME_ENTER_NAME = "Please enter new name for this favorite place"
     CANCEL_SUCCESS = "You have successfully returned to the main menu!"
+    PLACES_SUBSCRIBE_SUCCESS = "You will receive the {period} forecast for this place!"
+    PLACES_UNSUBSCRIBE_SUCCESS = "You have unsubscribed from the forecast for this place."
+    WEATHER_STALE = "⏳ Weather service is not responding, this is the last known weather."
+    PLACES_WEATHER_UNAVAILABLE = "weather is unavailable"
+    PLACES_WEATHER_STALE = "⏳ Weather service is not responding, these places show the last known weather."
+    PLACES_BROWSE = ("📚 Here are all your favorite places. "
+                     "You can also type the beginning of a name to find a place")
 
     @staticmethod
     def get_hello_text(message: Message) -> str:
@@ -58,3 +65,56 @@ class Messages:
             text.append(f"💨 Wind: {wind_speed} m/s")
 
         return "\n\n".join(text)
+
+    @staticmethod
+    def get_places_weather_text(places: list[tuple[str, dict | None, bool]]) -> list[str]:
+        """
+        This function creates the short weather lines of many (name, data, stale) places, one line per place.
+        Stale readings are marked, and a notice is added after the places
+        """
+        lines = []
+        any_stale = False
+
+        for name, data, stale in places:
+            try:
+                weather = data["weather"][0]
+                main = data["main"]
+
+                line = (
+                    f"{weather['description'].capitalize()}, "
+                    f"🌡 {main['temp']} °C (feels like {main['feels_like']} °C), "
+                    f"💨 {data['wind']['speed']} m/s"
+                )
+
+                if stale:
+                    line += " ⏳"
+                    any_stale = True
+            except (TypeError, KeyError, IndexError):
+                line = Messages.PLACES_WEATHER_UNAVAILABLE
+
+            lines.append(f"📍 {html.bold(html.quote(name))}: {line}")
+
+        if any_stale:
+            lines.append(Messages.PLACES_WEATHER_STALE)
+
+        return lines
+
+    @staticmethod
+    def join_lines(lines: list[str], limit: int = 4096) -> list[str]:
+        """
+        This function joins lines into as few texts as possible, each one not longer than the limit
+        """
+        texts = []
+        text = ""
+
+        for line in lines:
+            if text and len(text) + 2 + len(line) > limit:
+                texts.append(text)
+                text = ""
+
+            text = text + "\n\n" + line if text else line
+
+        if text:
+            texts.append(text)
+
+        return texts
@@ -140,3 +140,54 @@ def test_get_weather_text_description_capitalization():
     )
 
     assert result == expected_text
+
+
+# --- Pytest Test Cases for get_places_weather_text and join_lines ---
+
+def test_get_places_weather_text_one_line_per_place():
+    """
+    Test that every place gets one line and a place without data is marked as unavailable.
+    """
+    data = {
+        "weather": [{"description": "clear sky"}],
+        "main": {"temp": 21.5, "feels_like": 21.1},
+        "wind": {"speed": 3.1},
+    }
+
+    lines = Messages.get_places_weather_text([("Home <1>", data, False), ("Work", None, False)])
+
+    assert lines == [
+        f"📍 {html.bold('Home &lt;1&gt;')}: Clear sky, 🌡 21.5 °C (feels like 21.1 °C), 💨 3.1 m/s",
+        f"📍 {html.bold('Work')}: {Messages.PLACES_WEATHER_UNAVAILABLE}",
+    ]
+
+
+def test_get_places_weather_text_marks_stale_places():
+    """
+    Test that a stale reading is marked and the notice is added after the places.
+    """
+    data = {
+        "weather": [{"description": "clear sky"}],
+        "main": {"temp": 21.5, "feels_like": 21.1},
+        "wind": {"speed": 3.1},
+    }
+
+    lines = Messages.get_places_weather_text([("Home", data, True), ("Work", data, False)])
+
+    assert lines == [
+        f"📍 {html.bold('Home')}: Clear sky, 🌡 21.5 °C (feels like 21.1 °C), 💨 3.1 m/s ⏳",
+        f"📍 {html.bold('Work')}: Clear sky, 🌡 21.5 °C (feels like 21.1 °C), 💨 3.1 m/s",
+        Messages.PLACES_WEATHER_STALE,
+    ]
+
+
+def test_join_lines_respects_limit():
+    """
+    Test that lines are joined into texts not longer than the limit.
+    """
+    lines = ["a" * 10] * 5
+
+    texts = Messages.join_lines(lines, limit=25)
+
+    assert texts == ["a" * 10 + "\n\n" + "a" * 10] * 2 + ["a" * 10]
+    assert Messages.join_lines([]) == []
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the place callback data codec (app/keyboards/callbacks.py).
+
+Packs and parses the callback data of a place button with the codec and with the former
+"action?lat|lon|id" strings, and prints the time per operation and the size of the data.
+
+    python -m benchmarks.callback_data --number 100000
+"""
+import argparse
+import sys
+import timeit
+
+from app.keyboards import PlaceAction, PlaceCallback
+
+PLACE_ID = 123456
+# Full precision coordinates, as a float repr they take 17-18 characters
+LAT, LON = 50.45012345678901, -30.523456789012345
+
+LEGACY_PREFIX = "favorite_place_rename"
+
+
+def legacy_pack() -> str:
+    return f"{LEGACY_PREFIX}?{LAT}|{LON}|{PLACE_ID}"
+
+
+def legacy_unpack(data: str) -> tuple[float, float, int]:
+    lat, lon, place_id = data.split("?")[1].split("|")
+
+    return float(lat), float(lon), int(place_id)
+
+
+def codec_pack() -> str:
+    return PlaceCallback.create(PlaceAction.RENAME, PLACE_ID, LAT, LON).pack()
+
+
+def codec_unpack(data: str) -> tuple[float, float, int]:
+    callback_data = PlaceCallback.unpack(data)
+
+    return callback_data.latitude, callback_data.longitude, callback_data.place_id
+
+
+def measure(number: int) -> dict:
+    legacy_data, codec_data = legacy_pack(), codec_pack()
+
+    def per_operation(statement) -> float:
+        # Best of 5 runs, in microseconds
+        return round(min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e6, 3)
+
+    return {
+        "legacy_bytes": len(legacy_data.encode()),
+        "codec_bytes": len(codec_data.encode()),
+        "legacy_pack_us": per_operation(legacy_pack),
+        "codec_pack_us": per_operation(codec_pack),
+        "legacy_unpack_us": per_operation(lambda: legacy_unpack(legacy_data)),
+        "codec_unpack_us": per_operation(lambda: codec_unpack(codec_data)),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the place callback data codec")
+    parser.add_argument("--number", type=int, default=100000, help="Operations per run")
+
+    args = parser.parse_args()
+
+    for key, value in measure(args.number).items():
+        print(f"{key:>20}: {value}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
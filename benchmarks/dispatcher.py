@@ -0,0 +1,248 @@
+"""
+End-to-end load benchmark of the Dispatcher.
+
+Synthetic users send contact, /start, location, add-place, list and select updates through
+dp.feed_raw_update with Telegram and OpenWeatherMap replaced by local fakes.
+
+    python -m benchmarks.dispatcher --users 200 --rounds 3
+    python -m benchmarks.dispatcher --save-baseline baseline.json
+    python -m benchmarks.dispatcher --compare baseline.json --tolerance 0.2
+
+With --weather-server OpenWeatherMap is served by a local HTTP server (benchmarks/weather_server.py),
+so connection pooling and timeouts are part of the measurement
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.methods import TelegramMethod
+
+from app.bot import create_dispatcher
+from app.services import create_http_client
+from benchmarks.fakes import FakeSession, UpdateFactory, create_weather_transport
+from benchmarks.weather_server import WeatherServer, add_arguments
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+
+    return values[index]
+
+
+def get_peak_memory_mb() -> float:
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # Bytes on macOS, kilobytes on Linux
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+    return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+
+
+async def run(
+        users: int,
+        rounds: int,
+        concurrency: int,
+        telegram_latency: float,
+        weather_latency: float,
+        seed: int,
+        weather_server: WeatherServer | None = None,
+        weather_rate_limit: float = 0.0,
+) -> dict:
+    random.seed(seed)
+
+    if resource is None:
+        tracemalloc.start()
+
+    session = FakeSession(latency=telegram_latency)
+    bot = Bot(
+        token="42:BENCHMARK",
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+
+    if weather_server:
+        await weather_server.start()
+
+        http_client = create_http_client()
+    else:
+        # OpenWeatherMap stand-in instead of the network, with the usual client settings
+        http_client = create_http_client(transport=create_weather_transport(latency=weather_latency))
+
+    with tempfile.TemporaryDirectory() as directory:
+        dp = create_dispatcher(
+            http_client=http_client,
+            db_path=os.path.join(directory, "benchmark.db"),
+            weather_api_url=weather_server.url if weather_server else None,
+        )
+        workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+
+        # OpenWeatherMap quota, requests per minute (0 is unlimited)
+        dp["weather_service"].limiter.rate = weather_rate_limit / 60
+
+        await dp.emit_startup(bot=bot, **workflow_data)
+
+        latencies: list[float] = []
+        errors = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_user(user_id: int) -> None:
+            nonlocal errors
+
+            factory = UpdateFactory(user_id)
+
+            async with semaphore:
+                for round_index in range(rounds):
+                    # Updates of one user are sent one after another, like Telegram does
+                    for update in factory.session(round_index):
+                        start = time.perf_counter()
+
+                        try:
+                            result = await dp.feed_raw_update(bot=bot, update=update)
+
+                            if isinstance(result, TelegramMethod):
+                                await dp.silent_call_request(bot=bot, result=result)
+                        except Exception:
+                            errors += 1
+
+                        latencies.append(time.perf_counter() - start)
+
+        try:
+            start = time.perf_counter()
+
+            await asyncio.gather(*(run_user(user_id) for user_id in range(1, users + 1)))
+
+            elapsed = time.perf_counter() - start
+        finally:
+            await dp.emit_shutdown(bot=bot, **workflow_data)
+
+            # The client is owned by the benchmark
+            await http_client.aclose()
+
+            if weather_server:
+                await weather_server.stop()
+
+    result = {
+        "users": users,
+        "rounds": rounds,
+        "concurrency": concurrency,
+        "updates": len(latencies),
+        "errors": errors,
+        "telegram_requests": session.requests,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ups": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_memory_mb": round(get_peak_memory_mb(), 1),
+    }
+
+    if weather_server:
+        result["weather_requests"] = weather_server.requests
+        result["weather_connections"] = len(weather_server.connections)
+
+    return result
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Regressions of the result against the baseline, beyond the relative tolerance
+    """
+    regressions = []
+
+    # Higher is better
+    if result["throughput_ups"] < baseline["throughput_ups"] * (1 - tolerance):
+        regressions.append(
+            f"throughput_ups: {result['throughput_ups']} < {baseline['throughput_ups']}"
+        )
+
+    # Lower is better
+    for key in ("p50_ms", "p95_ms", "p99_ms", "peak_memory_mb"):
+        if result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key}: {result[key]} > {baseline[key]}")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark of the Dispatcher")
+    parser.add_argument("--users", type=int, default=100, help="Number of synthetic users")
+    parser.add_argument("--rounds", type=int, default=3, help="Sessions sent by every user")
+    parser.add_argument("--concurrency", type=int, default=50, help="Users active at the same time")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Telegram API delay, s")
+    parser.add_argument("--weather-server", action="store_true", help="Use the local OpenWeatherMap server")
+    parser.add_argument("--weather-rate-limit", type=float, default=0.0, help="OpenWeatherMap quota, per minute")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the user locations")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Save the result as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare the result with a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    # OpenWeatherMap behavior: --latency is also used by the in-process transport
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    weather_server = WeatherServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        distribution=args.distribution,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        variants=args.variants,
+    ) if args.weather_server else None
+
+    result = asyncio.run(run(
+        users=args.users,
+        rounds=args.rounds,
+        concurrency=args.concurrency,
+        telegram_latency=args.telegram_latency,
+        weather_latency=args.latency,
+        seed=args.seed,
+        weather_server=weather_server,
+        weather_rate_limit=args.weather_rate_limit,
+    ))
+
+    for key, value in result.items():
+        print(f"{key:>20}: {value}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(result, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+
+        if regressions:
+            print("Regressions:")
+
+            for regression in regressions:
+                print(f"  {regression}")
+
+            return 1
+
+        print("No regressions")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
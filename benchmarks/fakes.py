@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import random
+import time
+from typing import Any
+
+import httpx
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Chat, Message, User, PhotoSize
+
+import app.keyboards as kb
+from app.texts import Buttons
+from benchmarks.weather_server import get_payload
+
+# Cities the synthetic users are spread around
+CITIES = [
+    (50.45, 30.52), (49.84, 24.03), (46.48, 30.72), (48.46, 35.04), (49.99, 36.23),
+    (51.51, -0.13), (48.86, 2.35), (52.52, 13.40), (40.71, -74.01), (35.68, 139.69),
+]
+
+
+class FakeSession(BaseSession):
+    """
+    Telegram session that answers every method locally after an optional delay
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+
+        self.latency = latency
+        self.requests = 0
+
+        self._ids = itertools.count(1)
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> Any:
+        raise NotImplementedError
+
+    def _message(self, method: TelegramMethod) -> Message:
+        chat_id = getattr(method, "chat_id", None)
+
+        return Message(
+            message_id=next(self._ids),
+            date=int(time.time()),
+            chat=Chat(id=chat_id if isinstance(chat_id, int) else 1, type="private"),
+            photo=[PhotoSize(file_id="photo", file_unique_id="photo", width=100, height=100)],
+        )
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None) -> Any:
+        self.requests += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        name = method.__api_method__
+
+        if name == "getMe":
+            return User(id=42, is_bot=True, first_name="WeatherBot", username="weather_bot")
+
+        if name.startswith(("send", "edit")):
+            return self._message(method)
+
+        return True
+
+
+def create_weather_transport(latency: float = 0.0, error_rate: float = 0.0) -> httpx.MockTransport:
+    """
+    In-process OpenWeatherMap stand-in for the shared HTTP client
+    """
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency:
+            await asyncio.sleep(latency)
+
+        if error_rate and random.random() < error_rate:
+            return httpx.Response(500, json={"cod": 500, "message": "Internal error"})
+
+        return httpx.Response(200, json=get_payload(float(request.url.params["lat"]), float(request.url.params["lon"])))
+
+    return httpx.MockTransport(handler)
+
+
+class UpdateFactory:
+    """
+    Factory of raw Telegram updates of a synthetic user
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+
+        self._update_ids = itertools.count(user_id * 1000)
+        self._message_ids = itertools.count(1)
+
+    @property
+    def _user(self) -> dict:
+        return {"id": self.user_id, "is_bot": False, "first_name": f"User {self.user_id}"}
+
+    def message(self, **fields: Any) -> dict:
+        return {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": self.user_id, "type": "private"},
+                "from": self._user,
+                **fields,
+            },
+        }
+
+    def callback(self, data: str, caption: str = "") -> dict:
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "chat_instance": str(self.user_id),
+                "from": self._user,
+                "data": data,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": self.user_id, "type": "private"},
+                    "caption": caption,
+                },
+            },
+        }
+
+    def session(self, round_index: int) -> list[dict]:
+        """
+        Updates of one user session: register, ask weather, save the place, list and select it
+        """
+        lat, lon = random.choice(CITIES)
+        lat += random.uniform(-0.05, 0.05)
+        lon += random.uniform(-0.05, 0.05)
+
+        name = f"Place {round_index}"
+
+        # Callback data is built by the real keyboard to stay in sync with the handlers
+        add_data = kb.location(lat=lat, lon=lon, place_id=None).inline_keyboard[0][0].callback_data
+
+        updates = []
+
+        if round_index == 0:
+            updates.append(self.message(contact={
+                "phone_number": f"+380{self.user_id:09d}",
+                "first_name": "User",
+                "user_id": self.user_id,
+            }))
+
+        updates += [
+            self.message(text="/start"),
+            self.message(location={"latitude": lat, "longitude": lon}),
+            self.callback(add_data, caption="Weather"),
+            self.message(text=name),
+            self.message(text=Buttons.PLACES_SEE),
+            self.message(text=Buttons.PLACES_WEATHER_ALL),
+            self.message(text=name),
+            self.message(text=Buttons.BACK_TO_MAIN_MENU),
+        ]
+
+        return updates
@@ -0,0 +1,280 @@
+"""
+Local OpenWeatherMap stand-in serving /data/2.5/weather by coordinates and by city name.
+
+    python -m benchmarks.weather_server --port 8081 --latency 0.05 --jitter 0.02 --error-rate 0.01
+    OPENWEATHERMAP_API_URL=http://127.0.0.1:8081 py main.py
+"""
+import argparse
+import asyncio
+import math
+import random
+from collections import Counter
+from typing import Callable
+
+from aiohttp import web
+
+# Coordinates of the cities known to the "q" lookup
+CITIES = {
+    "kyiv": (50.45, 30.52),
+    "lviv": (49.84, 24.03),
+    "odesa": (46.48, 30.72),
+    "dnipro": (48.46, 35.04),
+    "kharkiv": (49.99, 36.23),
+    "london": (51.51, -0.13),
+    "paris": (48.86, 2.35),
+    "berlin": (52.52, 13.40),
+    "new york": (40.71, -74.01),
+    "tokyo": (35.68, 139.69),
+}
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Payload variants: full response, only the fields the bot reads, and broken ones
+PAYLOAD_VARIANTS = ("full", "minimal", "no_wind", "empty_weather")
+
+
+def get_payload(lat: float, lon: float, name: str = "", variant: str = "full") -> dict:
+    """
+    Weather response in the OpenWeatherMap format
+    """
+    payload = {
+        "coord": {"lon": lon, "lat": lat},
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+        "main": {"temp": 21.5, "feels_like": 21.1, "pressure": 1016, "humidity": 48},
+        "wind": {"speed": 3.1, "deg": 200},
+        "name": name,
+        "cod": 200,
+    }
+
+    if variant == "full":
+        payload.update({
+            "base": "stations",
+            "visibility": 10000,
+            "clouds": {"all": 0},
+            "dt": 1678886400,
+            "sys": {"type": 1, "id": 9037, "country": "UA", "sunrise": 1678861200, "sunset": 1678904400},
+            "timezone": 7200,
+            "id": 703448,
+        })
+        payload["main"].update({"temp_min": 20.1, "temp_max": 22.8})
+    elif variant == "no_wind":
+        del payload["wind"]
+    elif variant == "empty_weather":
+        payload["weather"] = []
+
+    return payload
+
+
+def get_latency_sampler(distribution: str, latency: float, jitter: float = 0.0) -> Callable[[], float]:
+    """
+    Function returning the delay of one response in seconds.
+    latency is the median for "lognormal" and the mean for the others, jitter is the spread
+    """
+    if distribution == "fixed":
+        return lambda: latency
+
+    if distribution == "uniform":
+        return lambda: max(0.0, random.uniform(latency - jitter, latency + jitter))
+
+    if distribution == "exponential":
+        return lambda: random.expovariate(1 / latency) if latency else 0.0
+
+    if distribution == "lognormal":
+        mu = math.log(latency) if latency else 0.0
+        sigma = jitter / latency if latency else 0.0
+
+        return lambda: random.lognormvariate(mu, sigma) if latency else 0.0
+
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+
+class WeatherServer:
+    """
+    OpenWeatherMap stand-in.
+    Counts responses by status and the number of distinct client connections
+    """
+
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            distribution: str = "fixed",
+            error_rate: float = 0.0,
+            rate_limit_rate: float = 0.0,
+            retry_after: int = 1,
+            variants: dict[str, float] | None = None,
+            api_key: str | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.api_key = api_key
+
+        # Weight of every payload variant
+        self.variants = variants or {"full": 1.0}
+
+        self.responses: Counter = Counter()
+        self.connections: set[int] = set()
+
+        self._latency = get_latency_sampler(distribution, latency, jitter)
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def requests(self) -> int:
+        return sum(self.responses.values())
+
+    def _respond(self, status: int, payload: dict, headers: dict | None = None) -> web.Response:
+        self.responses[status] += 1
+
+        return web.json_response(payload, status=status, headers=headers)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.connections.add(id(request.transport))
+
+        delay = self._latency()
+
+        if delay:
+            await asyncio.sleep(delay)
+
+        query = request.query
+
+        if self.api_key and query.get("appid") != self.api_key:
+            return self._respond(401, {"cod": 401, "message": "Invalid API key"})
+
+        if self.rate_limit_rate and random.random() < self.rate_limit_rate:
+            return self._respond(
+                429,
+                {"cod": 429, "message": "Too many requests"},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        if self.error_rate and random.random() < self.error_rate:
+            return self._respond(500, {"cod": 500, "message": "Internal error"})
+
+        variant = random.choices(list(self.variants), weights=list(self.variants.values()))[0]
+
+        if "q" in query:
+            name = query["q"].strip()
+            coord = CITIES.get(name.lower())
+
+            if coord is None:
+                return self._respond(404, {"cod": "404", "message": "city not found"})
+
+            return self._respond(200, get_payload(*coord, name=name.title(), variant=variant))
+
+        try:
+            lat, lon = float(query["lat"]), float(query["lon"])
+        except (KeyError, ValueError):
+            return self._respond(400, {"cod": "400", "message": "wrong latitude or longitude"})
+
+        return self._respond(200, get_payload(lat, lon, variant=variant))
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/data/2.5/weather", self.handle)
+
+        return app
+
+    async def start(self) -> str:
+        """
+        Start serving and return the base URL, port 0 picks a free port
+        """
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+
+        await web.TCPSite(self._runner, host=self.host, port=self.port).start()
+
+        self.port = self._runner.addresses[0][1]
+
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+            self._runner = None
+
+    async def __aenter__(self) -> "WeatherServer":
+        await self.start()
+
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.stop()
+
+
+def parse_variants(value: str) -> dict[str, float]:
+    """
+    Parse "full=0.9,no_wind=0.1" into variant weights
+    """
+    variants = {}
+
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+
+        if name not in PAYLOAD_VARIANTS:
+            raise argparse.ArgumentTypeError(f"Unknown payload variant: {name}")
+
+        variants[name] = float(weight or 1)
+
+    return variants
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.0, help="Response delay, s")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Spread of the response delay, s")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After of 429 responses, s")
+    parser.add_argument("--variants", type=parse_variants, default=None, help="e.g. full=0.9,no_wind=0.1")
+
+
+async def serve(server: WeatherServer) -> None:
+    await server.start()
+
+    print(f"Serving OpenWeatherMap stand-in on {server.url}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local OpenWeatherMap stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--api-key", default=None, help="Reject requests with another appid")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = WeatherServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        distribution=args.distribution,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        variants=args.variants,
+        api_key=args.api_key,
+    )
+
+    try:
+        asyncio.run(serve(server))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,28 +3,21 @@ import logging
 import os
 import sys
 
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-
-from app.handlers import account_router, place_router, main_router
+from app.bot import create_bot, create_dispatcher
+from app.runners import Supervisor, start_polling, start_webhook
+from app.services import workers_count
 
 
 async def main() -> None:
-    # Bot token can be obtained via https://t.me/BotFather
-    token = os.getenv("BOT_TOKEN")
-
-    # All handlers should be attached to the Router (or Dispatcher)
-    dp = Dispatcher()
-
-    # Initialize Bot instance with default bot properties which will be passed to all API calls
-    bot = Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-
-    # Router
-    dp.include_routers(account_router, place_router, main_router)
+    bot = create_bot()
+    dp = create_dispatcher()
 
     # And the run events dispatching
-    await dp.start_polling(bot)
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        await start_webhook(dp, bot)
+    else:
+        # Updates run concurrently across users and in order for each user
+        await start_polling(dp, bot)
 
 
 if __name__ == "__main__":
@@ -32,7 +25,13 @@ if __name__ == "__main__":
     if os.getenv("IS_DEBUG"):
         logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 
+    # Number of worker processes, updates are sharded between them by user
+    workers = workers_count()
+
     try:
-        asyncio.run(main())
+        if workers > 1:
+            Supervisor(workers=workers).run()
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("Program interrupted by user. Exiting gracefully.")
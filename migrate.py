@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+import sys
+
+from app.services import DBService
+
+
+async def main(path: str, check: bool, dry_run: bool) -> int:
+    db = DBService()
+    await db.connect(path)
+
+    try:
+        migrations = await db.migrate(dry_run=check or dry_run)
+    finally:
+        await db.close()
+
+    for migration in migrations:
+        print(f"{'Pending' if check or dry_run else 'Applied'}: {migration.version} {migration.name}")
+
+    if not migrations:
+        print("Database schema is up to date.")
+
+    # In check mode pending migrations are a failure
+    return 1 if check and migrations else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--path", default=DBService._DB_PATH, help="database file")
+    parser.add_argument("--dry-run", action="store_true", help="only list pending migrations")
+    parser.add_argument("--check", action="store_true", help="exit with code 1 if migrations are pending")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.path, check=args.check, dry_run=args.dry_run)))